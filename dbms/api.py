@@ -0,0 +1,377 @@
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import re
+import threading
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+from db import get_pool, close_pool
+from livesync import ChangeFeed
+from metrics import metrics
+from migrations import migrate
+from pool import PoolTimeout
+from repository import (UserRepository, NewsRepository, DuplicateUsername, PAGE_SIZE,
+                        PREVIEW_CHARS, save_news)
+
+# ====================================================
+#                   HTTP / JSON API
+# ====================================================
+# The same users and news model as NewsApp, over HTTP, stdlib only.
+# Each connection gets its own thread; at most API_WORKERS requests are
+# handled at once, and they share the process's connection pool and row
+# caches. Handlers that read through the caches first catch
+# up with change_log, so edits made by NewsApp or another server are seen
+# at once.
+#
+#   GET    /users?cursor=&limit=          GET    /news?cursor=&limit=&q=
+#   POST   /users                         POST   /news
+#   GET    /users/<id>                    GET    /news/<id>   (ETag, 304)
+#   PUT    /users/<id>                    PUT    /news/<id>
+#   DELETE /users/<id>                    DELETE /news/<id>
+#   GET    /users/<id>/news?cursor=&limit=
+#   GET    /metrics
+#
+# Lists return {"items": [...], "next": cursor or null}; pass "next" back
+# as ?cursor= for the following page.
+API_WORKERS = 16
+MAX_LIMIT = 500
+GZIP_MIN_BYTES = 1024       # smaller bodies are not worth compressing
+GZIP_LEVEL = 5
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ------------------- Encoding -------------------
+def to_json(value):
+    if isinstance(value, datetime):
+        return value.isoformat(" ")
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_cursor(key):
+    raw = json.dumps(key, default=to_json, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, *types):
+    # types: the expected type of each key field, e.g. (int,) for users
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise ApiError(400, "Invalid cursor.")
+    # cursors are client input: anything but the exact shape is a 400
+    if not isinstance(key, list) or len(key) != len(types) or \
+            any(type(value) is not kind for value, kind in zip(key, types)):
+        raise ApiError(400, "Invalid cursor.")
+    return key
+
+
+def news_cursor(cursor):
+    created_at, news_id = decode_cursor(cursor, str, int)
+    try:
+        return (datetime.fromisoformat(created_at), news_id)
+    except ValueError:
+        raise ApiError(400, "Invalid cursor.")
+
+
+def summary_json(row):
+    item = row._asdict()
+    preview = item.pop("preview") or ""
+    item["preview"] = preview[:PREVIEW_CHARS] + "..." if len(preview) > PREVIEW_CHARS else preview
+    return item
+
+
+def page_json(rows, key, limit, render=lambda row: row._asdict()):
+    more = len(rows) == limit
+    return {"items": [render(row) for row in rows],
+            "next": encode_cursor(key(rows[-1])) if rows and more else None}
+
+
+# ------------------- Handlers -------------------
+# Each takes (api, match, query, body) and returns (status, payload)
+class Api:
+    def __init__(self, pool):
+        self.users = UserRepository(pool)
+        self.news = NewsRepository(pool)
+        self.feed = ChangeFeed(pool, self.users, self.news)
+        self._feed_lock = threading.Lock()
+
+    def catch_up(self):
+        # one change_log range query; drops cached rows other clients changed
+        with self._feed_lock:
+            self.feed.catch_up()
+
+    # users
+    def list_users(self, match, query, body):
+        limit = limit_of(query)
+        after = decode_cursor(query["cursor"], int) if "cursor" in query else None
+        rows = self.users.page(after, limit)
+        return 200, page_json(rows, lambda user: (user.user_id,), limit)
+
+    def get_user(self, match, query, body):
+        user = self.users.get(int(match["id"]))
+        if user is None:
+            raise ApiError(404, "User not found.")
+        return 200, user._asdict()
+
+    def add_user(self, match, query, body):
+        fields = user_fields(body)
+        user_id = self.users.add(*fields)
+        return 201, self.users.get(user_id)._asdict()
+
+    def update_user(self, match, query, body):
+        user_id = int(match["id"])
+        if self.users.get(user_id) is None:
+            raise ApiError(404, "User not found.")
+        self.users.update(user_id, *user_fields(body))
+        return 200, self.users.get(user_id)._asdict()
+
+    def delete_user(self, match, query, body):
+        user_id = int(match["id"])
+        if self.users.get(user_id) is None:
+            raise ApiError(404, "User not found.")
+        self.users.delete(user_id)
+        return 204, None
+
+    def user_news(self, match, query, body):
+        user_id = int(match["id"])
+        limit = limit_of(query)
+        after = news_cursor(query["cursor"]) if "cursor" in query else None
+        rows = self.news.page(after, limit, user_id)
+        return 200, page_json(rows, lambda n: (n.created_at, n.news_id), limit, summary_json)
+
+    # news
+    def list_news(self, match, query, body):
+        limit = limit_of(query)
+        text = query.get("q", "").strip()
+        if text:
+            after = decode_cursor(query["cursor"], int) if "cursor" in query else None
+            if after and after[0] < 0:
+                raise ApiError(400, "Invalid cursor.")
+            rows = self.news.search_page(text, after, limit)
+            return 200, page_json(rows, lambda hit: (hit.position,), limit, summary_json)
+        after = news_cursor(query["cursor"]) if "cursor" in query else None
+        rows = self.news.page(after, limit)
+        return 200, page_json(rows, lambda n: (n.created_at, n.news_id), limit, summary_json)
+
+    def get_news(self, match, query, body):
+        # served from the row cache when warm; the handler adds the ETag
+        news = self.news.get(int(match["id"]))
+        if news is None:
+            raise ApiError(404, "News not found.")
+        return 200, news._asdict()
+
+    def add_news(self, match, query, body):
+        title, text, author = news_fields(body)
+        news = save_news(self.users, self.news, None, title, text, author)
+        if news is None:
+            raise ApiError(422, f"Author '{author}' not found.")
+        return 201, news._asdict()
+
+    def update_news(self, match, query, body):
+        news_id = int(match["id"])
+        if self.news.get(news_id) is None:
+            raise ApiError(404, "News not found.")
+        title, text, author = news_fields(body)
+        news = save_news(self.users, self.news, news_id, title, text, author)
+        if news is None:
+            raise ApiError(422, f"Author '{author}' not found.")
+        return 200, news._asdict()
+
+    def delete_news(self, match, query, body):
+        news_id = int(match["id"])
+        if self.news.get(news_id) is None:
+            raise ApiError(404, "News not found.")
+        self.news.delete(news_id)
+        return 204, None
+
+    def get_metrics(self, match, query, body):
+        return 200, metrics.snapshot()
+
+
+ROUTES = [
+    ("GET", r"/users", Api.list_users),
+    ("POST", r"/users", Api.add_user),
+    ("GET", r"/users/(?P<id>\d+)", Api.get_user),
+    ("PUT", r"/users/(?P<id>\d+)", Api.update_user),
+    ("DELETE", r"/users/(?P<id>\d+)", Api.delete_user),
+    ("GET", r"/users/(?P<id>\d+)/news", Api.user_news),
+    ("GET", r"/news", Api.list_news),
+    ("POST", r"/news", Api.add_news),
+    ("GET", r"/news/(?P<id>\d+)", Api.get_news),
+    ("PUT", r"/news/(?P<id>\d+)", Api.update_news),
+    ("DELETE", r"/news/(?P<id>\d+)", Api.delete_news),
+    ("GET", r"/metrics", Api.get_metrics),
+]
+ROUTES = [(method, re.compile(pattern + "/?$"), handler) for method, pattern, handler in ROUTES]
+ETAGGED = {Api.get_news}
+# read users or news through the row caches (save_news also resolves the author)
+CACHED = {Api.get_user, Api.update_user, Api.delete_user,
+          Api.get_news, Api.add_news, Api.update_news, Api.delete_news}
+
+
+# ------------------- Validation -------------------
+def limit_of(query):
+    try:
+        limit = int(query.get("limit", PAGE_SIZE))
+    except ValueError:
+        raise ApiError(400, "limit must be a number.")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def required(body, field):
+    value = body.get(field)
+    if value in (None, ""):
+        raise ApiError(400, f"'{field}' is required.")
+    return value
+
+
+def user_fields(body):
+    age = body.get("age")
+    if age not in (None, "") and not str(age).isdigit():
+        raise ApiError(400, "age must be a number.")
+    return (required(body, "username"), body.get("email"),
+            int(age) if age not in (None, "") else None, body.get("contact_number"))
+
+
+def news_fields(body):
+    return required(body, "title"), required(body, "body"), required(body, "username")
+
+
+# ------------------- Server -------------------
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"       # keep-alive for load tests
+    server_version = "NewsAPI/1.0"
+    timeout = 5                         # idle keep-alive connections are closed after this
+    disable_nagle_algorithm = True      # headers and body go out separately
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PUT(self):
+        self.dispatch("PUT")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def dispatch(self, method):
+        url = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            handler, match = self.route(method, url.path)
+            body = self.read_body()
+            if handler in CACHED:
+                self.server.api.catch_up()
+            with self.server.slots:
+                status, payload = handler(self.server.api, match.groupdict(), query, body)
+        except ApiError as e:
+            status, payload, handler = e.status, {"error": str(e)}, None
+        except DuplicateUsername as e:
+            status, payload, handler = 409, {"error": str(e)}, None
+        except PoolTimeout as e:
+            status, payload, handler = 503, {"error": str(e)}, None
+        except Exception as e:
+            self.log_error("%s %s failed: %r", method, self.path, e)
+            status, payload, handler = 500, {"error": "Internal server error."}, None
+        self.respond(status, payload, etag=handler in ETAGGED)
+
+    def route(self, method, path):
+        allowed = False
+        for route_method, pattern, handler in ROUTES:
+            match = pattern.match(path)
+            if match:
+                if route_method == method:
+                    return handler, match
+                allowed = True
+        raise ApiError(405 if allowed else 404, "Method not allowed." if allowed else "Not found.")
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            raise ApiError(400, "Body must be a JSON object.")
+        return body
+
+    def respond(self, status, payload, etag=False):
+        data = b"" if payload is None else json.dumps(payload, default=to_json).encode()
+        headers = {"Content-Type": "application/json"}
+
+        if etag and status == 200:
+            # weak: the same tag covers the gzip and identity encodings
+            tag = 'W/"' + hashlib.sha1(data).hexdigest()[:20] + '"'
+            headers["ETag"] = tag
+            headers["Cache-Control"] = "no-cache"
+            if tag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+                status, data = 304, b""
+
+        if len(data) >= GZIP_MIN_BYTES and "gzip" in self.headers.get("Accept-Encoding", ""):
+            data = gzip.compress(data, GZIP_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status not in (204, 304):        # these never carry a body
+            self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ApiServer(ThreadingHTTPServer):
+    # A thread per connection, so an idle keep-alive client only holds a
+    # sleeping thread, never a request slot; `workers` bounds the requests
+    # being handled (and so the connection pool demand) at any moment.
+    # Shutdown does not wait for idle connections.
+    daemon_threads = True
+    block_on_close = False
+    request_queue_size = 128
+
+    def __init__(self, address, workers=API_WORKERS, verbose=False):
+        super().__init__(address, ApiHandler)
+        self.api = Api(get_pool())
+        self.verbose = verbose
+        self.slots = threading.BoundedSemaphore(workers)
+
+
+# ====================================================
+#                  COMMAND LINE
+# ====================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the users and news model as a JSON API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=API_WORKERS)
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    migrate()
+    server = ApiServer((args.host, args.port), args.workers, args.verbose)
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        close_pool()
@@ -0,0 +1,140 @@
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+from db import get_pool
+from migrations import migrate
+from repository import ChangeLogRepository, SQL_USER_DELETE, execute
+
+# ====================================================
+#                 NEWS ARCHIVE ROLLOVER
+# ====================================================
+# Moves articles older than ARCHIVE_AFTER_DAYS from news to news_archive
+# (migration 6), oldest first, one batch per transaction, so the hot table
+# and its indexes only hold recent news. Articles keep their news_id and
+# stay readable, editable and searchable through NewsRepository. Run it
+# from cron or a scheduled task; an interrupted run just continues next time.
+#
+#   python archive.py                       # roll over
+#   python archive.py --purge-before 2020-01-01
+#
+# Purging deletes archived articles for good, also in batches, using the
+# archive's created_at index. Every run also drops change_log entries
+# older than CHANGE_LOG_DAYS; clients only need the last few seconds.
+#
+# delete_author() removes a prolific author the same way: their articles
+# in batches, then the user_info row, instead of one ON DELETE CASCADE
+# statement that would hold its locks (and undo log) for the whole run.
+ARCHIVE_AFTER_DAYS = int(os.environ.get("NEWS_ARCHIVE_AFTER_DAYS", "365"))
+CHANGE_LOG_DAYS = 7
+BATCH_SIZE = 1000
+BATCH_PAUSE = 0.01          # seconds between batches, for other queries to get in
+
+COLUMNS = "news_id, title, body, created_at, user_id"
+
+SQL_OLDEST_HOT = "SELECT news_id FROM news WHERE created_at < %s ORDER BY created_at LIMIT %s"
+SQL_OLDEST_ARCHIVED = """
+    SELECT news_id FROM news_archive WHERE created_at < %s ORDER BY created_at LIMIT %s
+"""
+SQL_AUTHOR_HOT = "SELECT news_id FROM news WHERE user_id=%s LIMIT %s"
+SQL_AUTHOR_ARCHIVED = "SELECT news_id FROM news_archive WHERE user_id=%s LIMIT %s"
+
+
+def id_list(count):
+    return ", ".join(["%s"] * count)
+
+
+def move_batch(cursor, ids):
+    # copy, then delete: the triggers keep news_fts/news_archive_fts and
+    # user_stats in step, and the article is never missing from both tiers
+    cursor.execute(f"INSERT INTO news_archive({COLUMNS}) SELECT {COLUMNS} FROM news "
+                   f"WHERE news_id IN ({id_list(len(ids))})", ids)
+    cursor.execute(f"DELETE FROM news WHERE news_id IN ({id_list(len(ids))})", ids)
+
+
+def purge_batch(cursor, ids):
+    cursor.execute(f"DELETE FROM news_archive WHERE news_id IN ({id_list(len(ids))})", ids)
+
+
+def delete_batch(cursor, ids):
+    cursor.execute(f"DELETE FROM news WHERE news_id IN ({id_list(len(ids))})", ids)
+
+
+def in_batches(select, apply, cutoff, batch_size, on_batch=None):
+    # Repeats select -> apply in its own transaction until nothing is left.
+    # The connection goes back to the pool between batches, so queries
+    # waiting for it (SQLite has a single one) are not held up for the run.
+    total = 0
+    while True:
+        with get_pool().connection() as db:
+            db.start_transaction()
+            cursor = db.cursor()
+            cursor.execute(select, (cutoff, batch_size))
+            ids = [row[0] for row in cursor.fetchall()]
+            if ids:
+                apply(cursor, ids)
+            db.commit()
+        if not ids:
+            return total
+        total += len(ids)
+        if on_batch:
+            on_batch(total)
+        time.sleep(BATCH_PAUSE)
+
+
+def rollover(days=ARCHIVE_AFTER_DAYS, batch_size=BATCH_SIZE, on_batch=None):
+    cutoff = datetime.now().replace(microsecond=0) - timedelta(days=days)
+    return in_batches(SQL_OLDEST_HOT, move_batch, cutoff, batch_size, on_batch)
+
+
+def purge(before, batch_size=BATCH_SIZE, on_batch=None):
+    return in_batches(SQL_OLDEST_ARCHIVED, purge_batch, before, batch_size, on_batch)
+
+
+def delete_author(user_id, batch_size=BATCH_SIZE, on_batch=None):
+    # Articles first, hot tier then archive; anything posted meanwhile goes
+    # with the user row (ON DELETE CASCADE). Returns the articles deleted.
+    hot = in_batches(SQL_AUTHOR_HOT, delete_batch, user_id, batch_size, on_batch)
+    archived = in_batches(SQL_AUTHOR_ARCHIVED, purge_batch, user_id, batch_size,
+                          on_batch and (lambda total: on_batch(hot + total)))
+    execute(get_pool(), SQL_USER_DELETE, (user_id,))
+    return hot + archived
+
+
+def prune_changes(days=CHANGE_LOG_DAYS):
+    cutoff = datetime.now().replace(microsecond=0) - timedelta(days=days)
+    return ChangeLogRepository(get_pool()).prune(cutoff)
+
+
+# ====================================================
+#                  COMMAND LINE
+# ====================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old news to the archive tier, purge it, or delete an author in batches.")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS,
+                        help="archive articles older than this many days")
+    parser.add_argument("--purge-before", type=datetime.fromisoformat,
+                        help="delete archived articles created before this date instead")
+    parser.add_argument("--delete-author", type=int, metavar="USER_ID",
+                        help="delete a user and their articles in batches instead")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    migrate()
+    started = time.perf_counter()
+
+    def report(total):
+        print(f"\r{total} articles", end="")
+
+    if args.delete_author:
+        count = delete_author(args.delete_author, args.batch_size, on_batch=report)
+        print(f"\nDeleted user {args.delete_author} and {count} articles "
+              f"in {time.perf_counter() - started:.1f}s.")
+    elif args.purge_before:
+        count = purge(args.purge_before, args.batch_size, on_batch=report)
+        print(f"\nPurged {count} archived articles in {time.perf_counter() - started:.1f}s.")
+    else:
+        count = rollover(args.days, args.batch_size, on_batch=report)
+        print(f"\nArchived {count} articles in {time.perf_counter() - started:.1f}s.")
+    print(f"Pruned {prune_changes()} change log entries.")
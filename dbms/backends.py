@@ -0,0 +1,184 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+from pool import ConnectionPool
+
+# ====================================================
+#                 STORAGE BACKENDS
+# ====================================================
+# A backend knows how to open connections for one engine and how to do the
+# few things that cannot be written as portable SQL (database creation,
+# catalog lookups, the migration lock). Repositories write MySQL-style
+# "%s" SQL; the SQLite connection wrapper translates it.
+
+
+# ------------------- MySQL -------------------
+class MySQLBackend:
+    name = "mysql"
+
+    def __init__(self, config, pool_size=5, idle_timeout=300, check_after=30):
+        self.config = config
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.check_after = check_after
+
+    def connect(self, **options):
+        import mysql.connector as MyConn
+
+        # Autocommit keeps plain reads from pinning a stale snapshot on a
+        # pooled connection; multi-statement writes open their own transaction.
+        # options: extra connector flags, e.g. allow_local_infile=True
+        return MyConn.connect(autocommit=True, **self.config, **options)
+
+    def make_pool(self):
+        return ConnectionPool(self.connect, size=self.pool_size,
+                              idle_timeout=self.idle_timeout,
+                              check_after=self.check_after, dialect=self.name)
+
+    def create_database(self):
+        import mysql.connector as MyConn
+
+        server = {k: v for k, v in self.config.items() if k != "database"}
+        db = MyConn.connect(**server)
+        cursor = db.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {self.config['database']}")
+        db.close()
+
+    def drop_database(self):
+        import mysql.connector as MyConn
+
+        server = {k: v for k, v in self.config.items() if k != "database"}
+        db = MyConn.connect(**server)
+        cursor = db.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS {self.config['database']}")
+        db.close()
+
+    def index_exists(self, cursor, table, name):
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        """, (table, name))
+        return cursor.fetchone()[0] > 0
+
+    @contextmanager
+    def migration_lock(self, cursor, name, timeout):
+        # MySQL DDL commits implicitly, so a named lock is all we can do
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (name, timeout))
+        if not cursor.fetchone()[0]:
+            raise RuntimeError("Timed out waiting for the migration lock.")
+        try:
+            yield
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (name,))
+            cursor.fetchone()
+
+
+# ------------------- SQLite -------------------
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",          # readers never block the writer
+    "PRAGMA synchronous=NORMAL",        # durable at checkpoints, fast commits in WAL
+    "PRAGMA foreign_keys=ON",           # needed for ON DELETE CASCADE
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",         # 64 MB page cache
+    "PRAGMA mmap_size=268435456",       # 256 MB memory-mapped reads
+]
+
+
+def _adapt_datetime(value):
+    return value.isoformat(" ")
+
+
+def _convert_datetime(value):
+    return datetime.fromisoformat(value.decode())
+
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_converter("DATETIME", _convert_datetime)
+
+
+class SQLiteCursor:
+    # Accepts the "%s" placeholders the repositories use
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(sql.replace("%s", "?"), params)
+        return self
+
+    def executemany(self, sql, rows):
+        self._cursor.executemany(sql.replace("%s", "?"), rows)
+        return self
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class SQLiteConnection:
+    # Mirrors the bits of the mysql.connector connection API the app uses
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, prepared=False, buffered=None):
+        # sqlite3 already caches compiled statements per connection
+        return SQLiteCursor(self._conn.cursor())
+
+    def start_transaction(self):
+        self._conn.execute("BEGIN")
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class SQLiteBackend:
+    name = "sqlite"
+
+    # One shared connection by default: SQLite serializes writers anyway,
+    # and a single warm connection keeps its page cache hot.
+    def __init__(self, path, pool_size=1):
+        self.path = path
+        self.pool_size = pool_size
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False,
+                               detect_types=sqlite3.PARSE_DECLTYPES,
+                               isolation_level=None)   # autocommit, like MySQL pool
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return SQLiteConnection(conn)
+
+    def make_pool(self):
+        # No server to time out on us: keep the connection for good
+        return ConnectionPool(self.connect, size=self.pool_size,
+                              idle_timeout=float("inf"), check_after=float("inf"),
+                              dialect=self.name)
+
+    def create_database(self):
+        pass        # the file is created on first connect
+
+    def drop_database(self):
+        # close the pool first; WAL mode keeps two side files next to the db
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def index_exists(self, cursor, table, name):
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='index' AND name=%s", (name,))
+        return cursor.fetchone()[0] > 0
+
+    @contextmanager
+    def migration_lock(self, cursor, name, timeout):
+        # SQLite DDL is transactional: one IMMEDIATE transaction locks out
+        # other writers and makes the whole migration run all-or-nothing
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("COMMIT")
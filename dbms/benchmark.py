@@ -0,0 +1,265 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import db
+import generate
+from backends import MySQLBackend, SQLiteBackend
+from cache import LRUCache
+from journal import DirectWrites
+from metrics import percentile
+from migrations import migrate
+from repository import (UserRepository, NewsRepository, PAGE_SIZE,
+                        USER_CACHE_SIZE, NEWS_CACHE_SIZE, NEWS_CACHE_BYTES, AUTHOR_CACHE_SIZE)
+
+try:
+    import resource             # Unix only; the report leaves out max RSS without it
+except ImportError:
+    resource = None
+
+# ====================================================
+#                 HOT PATH BENCHMARKS
+# ====================================================
+# Times the database work behind each NewsApp action, at several dataset
+# sizes, and writes p50/p95/p99 latency, throughput and peak memory to
+# JSON. Widget updates are not included (they need a display); the calls
+# are the ones the handlers submit to the DbExecutor, with the same
+# arguments and the same caches.
+#
+#   python benchmark.py --sizes 1000,10000,100000 --backend sqlite
+#   python benchmark.py --compare old.json          # flag regressions
+SIZES = [1000, 10000, 100000]
+ITERATIONS = 200
+WARMUP = 20
+MEMORY_RUNS = 20                # iterations traced for peak memory
+REGRESSION = 1.2                # p95 this much slower than the baseline...
+REGRESSION_MIN_MS = 0.1         # ...and by at least this much (timer noise)
+SEED = 42
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_data")
+RESULTS_PATH = os.path.join(DATA_DIR, "benchmark_results.json")     # next to the datasets, not in git
+
+
+# ------------------- Datasets -------------------
+def users_for(size):
+    return max(100, size // 100)
+
+
+def open_dataset(backend_name, size, seed=SEED):
+    # One database per size, generated once and reused while it still
+    # holds exactly `size` articles (benchmark writes are net zero)
+    if backend_name == "sqlite":
+        os.makedirs(DATA_DIR, exist_ok=True)
+        backend = SQLiteBackend(os.path.join(DATA_DIR, f"bench_{size}_{seed}.db"))
+    else:
+        backend = MySQLBackend(dict(db.DB_CONFIG, database=f"news_bench_{size}_{seed}"))
+    db.set_backend(backend)
+    migrate()
+
+    repo = NewsRepository(db.get_pool())
+    if repo.count() != size:
+        db.close_pool()
+        backend.drop_database()
+        migrate()
+        generate.generate(users_for(size), size, seed=seed)
+
+
+def fresh_repos(pool):
+    # Caches sized like the app's, but empty for every dataset
+    news_cache = LRUCache(max_entries=NEWS_CACHE_SIZE, max_bytes=NEWS_CACHE_BYTES)
+    users = UserRepository(pool, cache=LRUCache(max_entries=USER_CACHE_SIZE), news_cache=news_cache,
+                           author_cache=LRUCache(max_entries=AUTHOR_CACHE_SIZE, sizeof=lambda user_id: 64))
+    return users, NewsRepository(pool, cache=news_cache)
+
+
+# ------------------- Operations -------------------
+# Each operation is (name, setup, run): setup() is not timed and returns
+# the arguments for run(), which is.
+def operations(users, news, rng):
+    writes = DirectWrites(users, news)
+    user_ids = users.ids()
+    first_page = [row.news_id for row in news.page(None, PAGE_SIZE)]
+    added_news, added_users = [], []
+
+    def author_page_id():
+        # an article from a random author's panel, as double-clicked there
+        rows = news.page(None, PAGE_SIZE, rng.choice(user_ids))
+        return (rng.choice(rows).news_id,) if rows else (first_page[0],)
+
+    def selected_news():
+        news_id = rng.choice(first_page)
+        news.cache.clear()          # the click is the first read of that row
+        return (news_id,)
+
+    def add_news():
+        author = users.get(rng.choice(user_ids)).username
+        return (None, f"Benchmark {rng.random()}", "body " * 200, author)
+
+    def update_news():
+        news_id = rng.choice(added_news)
+        news.get(news_id)           # on_news_select ran before the update
+        author = users.get(rng.choice(user_ids)).username
+        return (news_id, f"Benchmark {rng.random()}", "updated " * 200, author)
+
+    def saved_news(*args):
+        saved = writes.save_news(*args)
+        if args[0] is None:
+            added_news.append(saved.news_id)
+        return saved
+
+    def added_user(*args):
+        added_users.append(users.add(*args))
+
+    def user_panel(user_id):
+        users.get(user_id)
+        return news.page(None, PAGE_SIZE, user_id)
+
+    def clear_user(user_id):
+        users.cache.clear()
+        return (user_id,)
+
+    return [
+        ("load_users", lambda: (None, PAGE_SIZE), users.page),
+        ("load_news", lambda: (None, PAGE_SIZE), news.page),
+        ("on_news_select", selected_news, news.get),
+        ("show_user_news_panel", lambda: clear_user(rng.choice(user_ids)), user_panel),
+        ("show_full_news", lambda: (news.cache.clear(), author_page_id())[1], news.get),
+        ("add_news", add_news, saved_news),
+        ("update_news", update_news, saved_news),
+        ("delete_news", lambda: (added_news.pop(),), news.delete),
+        ("add_user", lambda: (f"bench_{rng.random()}", "bench@example.com", 30, "0123456789"), added_user),
+        ("update_user", lambda: (rng.choice(added_users), f"bench_{rng.random()}",
+                                 "bench@example.com", 31, "0123456789"), users.update),
+        ("delete_user", lambda: (added_users.pop(),), users.delete),
+    ]
+
+
+# ------------------- Measurement -------------------
+def measure(setup, run, iterations, warmup):
+    for _ in range(warmup):
+        run(*setup())
+
+    timings = []
+    for _ in range(iterations):
+        args = setup()
+        started = time.perf_counter()
+        run(*args)
+        timings.append(time.perf_counter() - started)
+
+    # Memory in a separate, short pass: tracing slows Python down
+    peak = 0
+    tracemalloc.start()
+    for _ in range(min(MEMORY_RUNS, iterations)):
+        args = setup()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        run(*args)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "p50_ms": percentile(timings, 0.50) * 1000,
+        "p95_ms": percentile(timings, 0.95) * 1000,
+        "p99_ms": percentile(timings, 0.99) * 1000,
+        "mean_ms": statistics.fmean(timings) * 1000,
+        "throughput_per_s": iterations / sum(timings),
+        "peak_kb": peak / 1024,
+    }
+
+
+def run_benchmarks(backend_name, sizes, iterations=ITERATIONS, warmup=WARMUP, seed=SEED, on_result=None):
+    results = []
+    for size in sizes:
+        open_dataset(backend_name, size, seed)
+        users, news = fresh_repos(db.get_pool())
+        rng = random.Random(seed)
+        # writes add warmup + iterations rows before the deletes remove them
+        for name, setup, run in operations(users, news, rng):
+            result = dict(backend=backend_name, size=size, operation=name,
+                          **measure(setup, run, iterations, warmup))
+            results.append(result)
+            if on_result:
+                on_result(result)
+        db.close_pool()
+    return results
+
+
+# ------------------- Reports -------------------
+def metadata(backend_name):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    meta = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "backend": backend_name,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+    }
+    if resource is not None:
+        meta["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return meta
+
+
+def compare(baseline, results):
+    # [(key, old p95, new p95)] for operations that got slower than REGRESSION
+    old = {(r["backend"], r["size"], r["operation"]): r for r in baseline["results"]}
+    slower = []
+    for r in results:
+        key = (r["backend"], r["size"], r["operation"])
+        before = old[key]["p95_ms"] if key in old else None
+        if before is not None and r["p95_ms"] > max(before * REGRESSION, before + REGRESSION_MIN_MS):
+            slower.append((key, before, r["p95_ms"]))
+    return slower
+
+
+def print_result(r):
+    print(f"{r['backend']:7} {r['size']:>9} {r['operation']:22} "
+          f"p50 {r['p50_ms']:8.2f}  p95 {r['p95_ms']:8.2f}  p99 {r['p99_ms']:8.2f} ms  "
+          f"{r['throughput_per_s']:9.0f}/s  peak {r['peak_kb']:8.1f} KB")
+
+
+# ====================================================
+#                  COMMAND LINE
+# ====================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the database work behind NewsApp actions.")
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)),
+                        help="comma-separated news row counts")
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--compare", help="earlier results file; exit 1 if p95 regressed")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = run_benchmarks(args.backend, sizes, args.iterations, args.warmup, args.seed,
+                             on_result=print_result)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"meta": metadata(args.backend), "results": results}, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            slower = compare(json.load(f), results)
+        for (backend_name, size, name), before, after in slower:
+            print(f"REGRESSION {backend_name} {size} {name}: p95 {before:.2f} -> {after:.2f} ms")
+        if slower:
+            sys.exit(1)
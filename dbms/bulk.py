@@ -0,0 +1,230 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+
+from db import get_pool
+from migrations import migrate
+from repository import (UserRepository, NewsRepository, SQL_USER_INSERT,
+                        SQL_NEWS_INSERT_DATED, is_integrity_error)
+
+# ====================================================
+#              STREAMING IMPORT / EXPORT
+# ====================================================
+# Files are read and written one record at a time, so memory does not grow
+# with the file. Imports insert a batch per transaction (executemany, which
+# mysql.connector turns into one multi-row INSERT) and record how far they
+# got in import_progress within the same transaction: an interrupted import
+# re-run with the same file resumes after the last committed batch.
+#
+# users: username, email, age, contact_number
+# news:  title, body, created_at, username    (username = author)
+BATCH_SIZE = 1000
+
+USER_FIELDS = ["user_id", "username", "email", "age", "contact_number"]
+NEWS_FIELDS = ["news_id", "title", "body", "created_at", "user_id", "username"]
+
+
+class BatchRejected(Exception):
+    pass
+
+
+SQL_PROGRESS_GET = "SELECT records FROM import_progress WHERE source=%s"
+SQL_PROGRESS_ADD = "INSERT INTO import_progress(source, records) VALUES (%s, 0)"
+SQL_PROGRESS_SET = """
+    UPDATE import_progress SET records=%s, updated_at=CURRENT_TIMESTAMP
+    WHERE source=%s
+"""
+
+
+# ------------------- Readers -------------------
+def file_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in (".csv", ".jsonl"):
+        raise ValueError(f"Unsupported file type '{ext}' (use .csv or .jsonl).")
+    return ext[1:]
+
+
+def read_records(path):
+    # Yields one dict per record
+    if file_format(path) == "csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def batches(records, size):
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+def text(record, field):
+    value = record.get(field)
+    return None if value in (None, "") else str(value)
+
+
+def parse_date(value, default):
+    if value in (None, ""):
+        return default
+    return datetime.fromisoformat(str(value))
+
+
+# ------------------- Row builders -------------------
+# Turn a batch of records into insert rows plus a count of skipped records
+def user_rows(batch, users):
+    rows = []
+    for record in batch:
+        age = text(record, "age")
+        rows.append((text(record, "username"), text(record, "email"),
+                     int(age) if age else None, text(record, "contact_number")))
+    return rows, 0
+
+
+def news_rows(batch, users):
+    # Authors for the whole batch in one lookup (mostly cache hits),
+    # done before the write transaction takes its connection
+    ids = users.resolve_ids(filter(None, (text(r, "username") for r in batch)))
+    now = datetime.now().replace(microsecond=0)
+
+    rows = []
+    skipped = 0
+    for record in batch:
+        user_id = ids.get(text(record, "username"))
+        if user_id is None:
+            skipped += 1        # unknown author
+            continue
+        rows.append((text(record, "title"), text(record, "body"),
+                     parse_date(record.get("created_at"), now), user_id))
+    return rows, skipped
+
+
+IMPORTS = {
+    "users": (SQL_USER_INSERT, user_rows),
+    "news": (SQL_NEWS_INSERT_DATED, news_rows),
+}
+
+
+# ------------------- Import -------------------
+def load_progress(pool, source, restart=False):
+    with pool.connection() as db:
+        cursor = db.cursor()
+        cursor.execute(SQL_PROGRESS_GET, (source,))
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute(SQL_PROGRESS_ADD, (source,))
+            return 0
+        if restart:
+            cursor.execute(SQL_PROGRESS_SET, (0, source))
+            return 0
+        return row[0]
+
+
+def import_file(kind, path, batch_size=BATCH_SIZE, restart=False, on_batch=None):
+    # on_batch(done, imported, skipped) is called after every committed batch.
+    # Returns (records read in total, imported now, skipped now).
+    sql, build = IMPORTS[kind]
+    pool = get_pool()
+    users = UserRepository(pool)
+    source = f"{kind}:{os.path.abspath(path)}"
+
+    done = load_progress(pool, source, restart)
+    imported = skipped = 0
+    records = islice(read_records(path), done, None)     # resume point
+
+    for batch in batches(records, batch_size):
+        rows, rejected = build(batch, users)
+        try:
+            with pool.connection() as db:
+                db.start_transaction()
+                cursor = db.cursor()
+                if rows:
+                    cursor.executemany(sql, rows)
+                cursor.execute(SQL_PROGRESS_SET, (done + len(batch), source))
+                db.commit()
+        except Exception as e:
+            if is_integrity_error(e):     # e.g. a username that already exists
+                raise BatchRejected(f"Records {done + 1}-{done + len(batch)} rejected: {e}") from e
+            raise
+
+        done += len(batch)
+        imported += len(rows)
+        skipped += rejected
+        if on_batch:
+            on_batch(done, imported, skipped)
+
+    return done, imported, skipped
+
+
+# ------------------- Export -------------------
+def export_file(kind, path, batch_size=BATCH_SIZE):
+    pool = get_pool()
+    if kind == "users":
+        rows, fields = UserRepository(pool).export(batch_size), USER_FIELDS
+    else:
+        rows, fields = NewsRepository(pool).export(batch_size), NEWS_FIELDS
+
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as out:
+        if file_format(path) == "csv":
+            writer = csv.writer(out)
+            writer.writerow(fields)
+            for row in rows:
+                writer.writerow([export_value(v) for v in row])
+                count += 1
+        else:
+            for row in rows:
+                record = {f: export_value(v) for f, v in zip(fields, row)}
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+    return count
+
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat(" ")
+    return value
+
+
+# ====================================================
+#                  COMMAND LINE
+# ====================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream users or news between the database and CSV/JSONL files.")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("kind", choices=["users", "news"])
+    parser.add_argument("path", help="a .csv or .jsonl file")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="records per transaction / fetch")
+    parser.add_argument("--restart", action="store_true", help="ignore saved progress and import from the start")
+    args = parser.parse_args()
+
+    migrate()
+    started = time.perf_counter()
+
+    def report(done, imported, skipped):
+        rate = imported / max(time.perf_counter() - started, 1e-9)
+        print(f"\r{done} read, {imported} imported, {skipped} skipped ({rate:,.0f} rows/s)", end="")
+
+    try:
+        if args.action == "import":
+            done, imported, skipped = import_file(args.kind, args.path, args.batch_size,
+                                                  args.restart, on_batch=report)
+            print(f"\nDone: {imported} imported, {skipped} skipped (unknown author), "
+                  f"{done} records read in total.")
+        else:
+            count = export_file(args.kind, args.path, args.batch_size)
+            elapsed = time.perf_counter() - started
+            print(f"Exported {count} {args.kind} in {elapsed:.1f}s.")
+    except (ValueError, BatchRejected) as e:
+        print(f"\n{e}\nFix the file and run again to resume after the last committed batch.")
+        sys.exit(1)
@@ -0,0 +1,134 @@
+import sys
+import threading
+from collections import OrderedDict, deque
+
+
+# ====================================================
+#                  LRU ROW CACHE
+# ====================================================
+# Bounded by entry count and, optionally, by an approximate byte budget.
+# Shared between the Tk thread and the database workers, hence the lock.
+#
+# A load that started before an invalidation of its key (or of a predicate
+# its value matches) is not stored, see put(). Invalidations are stamped
+# per key, so one row's edit does not throw away the loads of all others;
+# the stamps are bounded, and when old ones are dropped, loads older than
+# them are refused as a whole (the floor).
+STAMPS_KEPT = 1024          # invalidated keys remembered
+WIDE_KEPT = 64              # invalidate_where predicates remembered
+
+
+class LRUCache:
+    def __init__(self, max_entries=1000, max_bytes=None, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or row_size
+
+        self._data = OrderedDict()      # key -> (value, size), oldest first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._generation = 0            # bumped by every invalidation
+        self._stamps = OrderedDict()    # key -> generation it was last invalidated at
+        self._wide = deque()            # (generation, predicate) of invalidate_where
+        self._floor = 0                 # loads started before this are refused
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def put(self, key, value, since=None):
+        # since: generation read before loading value; if the key (or a
+        # predicate the value matches) was invalidated meanwhile, the value
+        # may be stale and is not stored
+        size = self.sizeof(value)
+        with self._lock:
+            if since is not None and self._stale(key, value, since):
+                return
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if self.max_bytes is not None and size > self.max_bytes:
+                return                  # would evict everything else; skip
+            self._data[key] = (value, size)
+            self._bytes += size
+            self._evict()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            self._stamps[key] = self._generation
+            self._stamps.move_to_end(key)
+            if len(self._stamps) > STAMPS_KEPT:
+                self._floor = max(self._floor, self._stamps.popitem(last=False)[1])
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+    def invalidate_where(self, predicate):
+        with self._lock:
+            self._generation += 1
+            self._wide.append((self._generation, predicate))
+            if len(self._wide) > WIDE_KEPT:
+                self._floor = max(self._floor, self._wide.popleft()[0])
+            stale = [k for k, (v, _) in self._data.items() if predicate(v)]
+            for k in stale:
+                self._bytes -= self._data.pop(k)[1]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._floor = self._generation
+            self._stamps.clear()
+            self._wide.clear()
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _stale(self, key, value, since):
+        if since < self._floor or self._stamps.get(key, 0) > since:
+            return True
+        return any(generation > since and predicate(value) for generation, predicate in self._wide)
+
+    def _evict(self):
+        while self._data and (
+                len(self._data) > self.max_entries or
+                (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            _, (_, size) = self._data.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+
+def row_size(row):
+    # Rough payload size of a row tuple: text length plus a word per field
+    size = sys.getsizeof(row)
+    for value in row:
+        if isinstance(value, str):
+            size += len(value)
+        else:
+            size += 8
+    return size
@@ -0,0 +1,85 @@
+import os
+import threading
+
+from backends import MySQLBackend, SQLiteBackend
+from metrics import instrument_pool, configure_slow_log
+
+# ------------------- Settings -------------------
+# NEWS_DB_BACKEND=sqlite runs the whole app on an embedded database file
+# (NEWS_DB_PATH), no server needed; the default is the MySQL server below.
+DB_BACKEND = os.environ.get("NEWS_DB_BACKEND", "mysql")
+
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "",
+    "port": 3306,
+    "database": "news_management",
+}
+
+SQLITE_PATH = os.environ.get(
+    "NEWS_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "news_management.db"))
+
+POOL_SIZE = 5
+POOL_IDLE_TIMEOUT = 300     # seconds before an idle connection is closed
+POOL_CHECK_AFTER = 30       # idle seconds before a connection is pinged
+
+# Per-statement timings for the Diagnostics tab; NEWS_METRICS=0 turns it off
+METRICS_ENABLED = os.environ.get("NEWS_METRICS", "1") != "0"
+
+_backend = None
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# ------------------- Backend -------------------
+def make_backend(name):
+    if name == "mysql":
+        return MySQLBackend(DB_CONFIG, pool_size=POOL_SIZE,
+                            idle_timeout=POOL_IDLE_TIMEOUT, check_after=POOL_CHECK_AFTER)
+    if name == "sqlite":
+        return SQLiteBackend(SQLITE_PATH)
+    raise ValueError(f"Unknown database backend '{name}' (expected mysql or sqlite).")
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _pool_lock:
+            if _backend is None:
+                _backend = make_backend(DB_BACKEND)
+    return _backend
+
+
+def set_backend(backend):
+    # Switch engines (e.g. from a script); closes the current pool first
+    global _backend
+    close_pool()
+    with _pool_lock:
+        _backend = backend
+
+
+# ------------------- Connections -------------------
+def connect_db():
+    return get_backend().connect()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        backend = get_backend()
+        with _pool_lock:
+            if _pool is None:
+                _pool = backend.make_pool()
+                if METRICS_ENABLED:
+                    configure_slow_log()
+                    instrument_pool(_pool)
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -0,0 +1,235 @@
+import argparse
+import re
+import sys
+from datetime import datetime
+
+import archive
+import bulk
+import journal
+import repository
+from db import get_pool
+
+# ====================================================
+#                 QUERY PLAN CHECKER
+# ====================================================
+# Runs EXPLAIN (EXPLAIN QUERY PLAN on SQLite) for every SQL_* statement in
+# the MODULES below, and for the IN (...) statements repository.py builds
+# per list length, and fails if any plan falls back to a full table scan
+# or a filesort. Every statement must have an entry below, so a new query
+# cannot ship without being checked.
+# Run it against a realistically sized database: on a handful of rows the
+# optimizer rightly prefers a scan and the check is meaningless.
+NOW = datetime(2025, 1, 1)
+MODULES = [repository, archive, bulk, journal]
+IN_LIST = 3                 # list length the IN (...) builders are checked at
+IDS = tuple(range(1, IN_LIST + 1))
+
+SAMPLE_PARAMS = {
+    # statement name           parameters (None = not checked)
+    "SQL_USER_COUNT":             (),
+    "SQL_USER_FIRST_PAGE":        (repository.PAGE_SIZE,),
+    "SQL_USER_PAGE_AFTER":        (1, repository.PAGE_SIZE),
+    "SQL_USER_PAGE_BEFORE":       (1000, repository.PAGE_SIZE),
+    "SQL_USER_BY_ID":             (1,),
+    "SQL_USER_SUMMARY_BY_ID":     (1,),
+    "SQL_USER_ID_BY_NAME":        ("Alice",),
+    "SQL_USER_IDS":               (),
+    "SQL_USER_NAME_PREFIX":       ("Al%", 20),
+    "SQL_USER_INSERT":            None,
+    "SQL_USER_UPDATE":            ("Alice", "", 1, "", 1),
+    "SQL_USER_DELETE":            (1,),
+    "SQL_USER_EXPORT":            (),
+
+    "SQL_NEWS_COUNT":             (),
+    "SQL_NEWS_FIRST_PAGE":        (repository.PAGE_SIZE,),
+    "SQL_NEWS_PAGE_AFTER":        (NOW, NOW, 1, repository.PAGE_SIZE),
+    "SQL_NEWS_PAGE_AFTER_ROWS":   (NOW, 1, repository.PAGE_SIZE),
+    "SQL_NEWS_PAGE_BEFORE":       (NOW, NOW, 1, repository.PAGE_SIZE),
+    "SQL_NEWS_PAGE_BEFORE_ROWS":  (NOW, 1, repository.PAGE_SIZE),
+    "SQL_NEWS_USER_FIRST_PAGE":   (1, repository.PAGE_SIZE),
+    "SQL_NEWS_USER_PAGE_AFTER":   (1, NOW, NOW, 1, repository.PAGE_SIZE),
+    "SQL_NEWS_USER_PAGE_AFTER_ROWS": (1, NOW, 1, repository.PAGE_SIZE),
+    "SQL_NEWS_USER_PAGE_BEFORE":  (1, NOW, NOW, 1, repository.PAGE_SIZE),
+    "SQL_NEWS_USER_PAGE_BEFORE_ROWS": (1, NOW, 1, repository.PAGE_SIZE),
+    "SQL_NEWS_SEARCH":            ("+solar*", "+solar*", repository.PAGE_SIZE) * 2 + (repository.PAGE_SIZE, 0),
+    "SQL_NEWS_SEARCH_FTS5":       ('"solar"*', repository.PAGE_SIZE) * 2 + (repository.PAGE_SIZE, 0),
+    "SQL_NEWS_BY_ID":             (1,),
+    "SQL_NEWS_INSERT":            None,
+    "SQL_NEWS_INSERT_DATED":      None,
+    "SQL_NEWS_UPDATE":            ("t", "b", 1, 1),
+    "SQL_NEWS_DELETE":            (1,),
+    "SQL_NEWS_EXPORT":            (),
+
+    "SQL_ARCHIVE_NEWEST":         (),
+    "SQL_ARCHIVE_USER_NEWEST":    (1,),
+    "SQL_ARCHIVE_FIRST_PAGE":     (repository.PAGE_SIZE,),
+    "SQL_ARCHIVE_PAGE_AFTER":     (NOW, NOW, 1, repository.PAGE_SIZE),
+    "SQL_ARCHIVE_PAGE_AFTER_ROWS": (NOW, 1, repository.PAGE_SIZE),
+    "SQL_ARCHIVE_PAGE_BEFORE":    (NOW, NOW, 1, repository.PAGE_SIZE),
+    "SQL_ARCHIVE_PAGE_BEFORE_ROWS": (NOW, 1, repository.PAGE_SIZE),
+    "SQL_ARCHIVE_USER_FIRST_PAGE":  (1, repository.PAGE_SIZE),
+    "SQL_ARCHIVE_USER_PAGE_AFTER":  (1, NOW, NOW, 1, repository.PAGE_SIZE),
+    "SQL_ARCHIVE_USER_PAGE_AFTER_ROWS": (1, NOW, 1, repository.PAGE_SIZE),
+    "SQL_ARCHIVE_USER_PAGE_BEFORE": (1, NOW, NOW, 1, repository.PAGE_SIZE),
+    "SQL_ARCHIVE_USER_PAGE_BEFORE_ROWS": (1, NOW, 1, repository.PAGE_SIZE),
+    "SQL_ARCHIVE_BY_ID":          (1,),
+    "SQL_ARCHIVE_UPDATE":         ("t", "b", 1, 1),
+    "SQL_ARCHIVE_DELETE":         (1,),
+    "SQL_ARCHIVE_EXPORT":         (),
+
+    "SQL_CHANGES_LATEST":         (),
+    "SQL_CHANGES_SINCE":          (1, 500),
+    "SQL_CHANGES_PRUNE":          (NOW,),
+
+    "user_ids_by_names_sql":      ("Alice", "Bob", "Carol"),
+    "user_summaries_sql":         IDS,
+    "users_delete_sql":           IDS,
+    "news_summaries_sql[news]":   IDS,
+    "news_summaries_sql[news_archive]": IDS,
+    "news_delete_sql[news]":      IDS,
+    "news_delete_sql[news_archive]": IDS,
+    "news_reassign_sql[news]":    (1,) + IDS,
+    "news_reassign_sql[news_archive]": (1,) + IDS,
+
+    # archive.py
+    "SQL_OLDEST_HOT":             (NOW, archive.BATCH_SIZE),
+    "SQL_OLDEST_ARCHIVED":        (NOW, archive.BATCH_SIZE),
+    "SQL_AUTHOR_HOT":             (1, archive.BATCH_SIZE),
+    "SQL_AUTHOR_ARCHIVED":        (1, archive.BATCH_SIZE),
+
+    # bulk.py
+    "SQL_PROGRESS_GET":           ("news.csv",),
+    "SQL_PROGRESS_ADD":           None,
+    "SQL_PROGRESS_SET":           (1, "news.csv"),
+
+    # journal.py
+    "SQL_CURRENT_USER":           (1,),
+    "SQL_CURRENT_NEWS[news]":     (1,),
+    "SQL_CURRENT_NEWS[news_archive]": (1,),
+}
+
+# Statements that are allowed to scan, with the reason
+ALLOWED = {
+    "SQL_NEWS_SEARCH": "relevance ordering sorts only the full-text matches",
+    "SQL_NEWS_SEARCH_FTS5": "relevance ordering sorts only the full-text matches",
+    "SQL_USER_EXPORT": "bulk export reads every row by design",
+    "SQL_NEWS_EXPORT": "bulk export reads every row by design",
+    "SQL_ARCHIVE_EXPORT": "bulk export reads every row by design",
+}
+
+# Statements that only exist on one backend
+DIALECT = {
+    "SQL_NEWS_SEARCH": "mysql",
+    "SQL_NEWS_SEARCH_FTS5": "sqlite",
+}
+# Keyset pages: spelled-out comparison on MySQL, row values on SQLite
+for name in repository.__dict__:
+    if name.startswith("SQL_") and "_PAGE_" in name and name.endswith("_ROWS"):
+        DIALECT[name] = "sqlite"
+        DIALECT[name[:-len("_ROWS")]] = "mysql"
+
+
+def statements(dialect=None):
+    # dialect None = every statement, whichever backend it belongs to.
+    # A module's imports of another module's statements are seen once.
+    found = {}
+    for module in MODULES:
+        for name in dir(module):
+            if name.startswith("SQL_") and name not in found:
+                sql = getattr(module, name)
+                if "{table}" in sql:
+                    # one statement per news tier (journal.SQL_CURRENT_NEWS)
+                    for table in ("news", "news_archive"):
+                        found[f"{name}[{table}]"] = sql.format(table=table)
+                else:
+                    found[name] = sql
+
+    found["user_ids_by_names_sql"] = repository.user_ids_by_names_sql(IN_LIST)
+    found["user_summaries_sql"] = repository.user_summaries_sql(IN_LIST)
+    found["users_delete_sql"] = repository.users_delete_sql(IN_LIST)
+    for build in (repository.news_summaries_sql, repository.news_delete_sql, repository.news_reassign_sql):
+        for table in ("news", "news_archive"):
+            found[f"{build.__name__}[{table}]"] = build(table, IN_LIST)
+
+    return {name: sql for name, sql in found.items()
+            if dialect is None or DIALECT.get(name, dialect) == dialect}
+
+
+def problems_in(plan, dialect="mysql", filtered=True):
+    found = []
+    if dialect == "sqlite":
+        for row in plan:
+            detail = row["detail"]
+            # Any SCAN (bare, or of a whole index, covering or not) reads
+            # every row; that is only fine when the statement keeps them all.
+            # A statement that filters must SEARCH, i.e. seek an index range.
+            # Full-text MATCH lookups plan as a SCAN of the virtual table.
+            scan = re.match(r"SCAN (\w+)", detail)
+            if scan and filtered and "VIRTUAL TABLE" not in detail and detail != "SCAN CONSTANT ROW":
+                found.append(f"full scan of {scan.group(1)} ({detail})")
+            if detail.startswith("USE TEMP B-TREE FOR") and "ORDER BY" in detail:
+                found.append(f"filesort ({detail})")
+        return found
+
+    for row in plan:
+        table, access, extra = row.get("table"), row.get("type"), row.get("Extra") or ""
+        if access == "ALL":
+            found.append(f"full scan of {table}")
+        if "Using filesort" in extra:
+            found.append(f"filesort on {table}")
+    return found
+
+
+def explain(cursor, sql, params, dialect="mysql"):
+    prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+    cursor.execute(prefix + sql, params)
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def check(verbose=False):
+    failures = []
+    missing = sorted(set(statements()) - set(SAMPLE_PARAMS))
+    for name in missing:
+        failures.append((name, ["no sample parameters in explain_check.SAMPLE_PARAMS"]))
+
+    pool = get_pool()
+    with pool.connection() as db:
+        cursor = db.cursor()
+        for name, sql in sorted(statements(pool.dialect).items()):
+            params = SAMPLE_PARAMS.get(name)
+            if params is None:
+                continue
+
+            plan = explain(cursor, sql, params, pool.dialect)
+            problems = [] if name in ALLOWED else problems_in(plan, pool.dialect, "WHERE" in sql)
+            if problems:
+                failures.append((name, problems))
+
+            if verbose or problems:
+                status = "FAIL" if problems else "ok"
+                print(f"[{status}] {name}")
+                for row in plan:
+                    if pool.dialect == "sqlite":
+                        print(f"    {row['detail']}")
+                    else:
+                        print(f"    {row.get('table')}: type={row.get('type')} "
+                              f"key={row.get('key')} rows={row.get('rows')} extra={row.get('Extra')}")
+
+    return failures
+
+
+# ====================================================
+#                  COMMAND LINE
+# ====================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EXPLAIN every application query and flag full scans or filesorts.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every plan, not only failures")
+    args = parser.parse_args()
+
+    failures = check(verbose=args.verbose)
+    for name, problems in failures:
+        print(f"{name}: {'; '.join(problems)}")
+    if failures:
+        sys.exit(1)
+    print("All query plans use indexes.")
@@ -0,0 +1,257 @@
+import argparse
+import itertools
+import math
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from db import get_backend, get_pool
+from migrations import migrate, rebuild_user_stats
+from repository import SQL_USER_INSERT, SQL_NEWS_INSERT_DATED
+
+# ====================================================
+#              SYNTHETIC DATA GENERATOR
+# ====================================================
+# Fills user_info and news with realistic-looking data for load tests and
+# benchmarks. The same seed on an empty database gives the same rows.
+#
+#   authors    -> Zipf-like activity: a few users write most of the news
+#   body size  -> log-normal, median ~900 characters, long tail of features
+#   created_at -> spread over SPAN_DAYS, denser towards the present
+BATCH_SIZE = 5000
+SPAN_DAYS = 3 * 365
+ZIPF_EXPONENT = 1.1
+BODY_MEDIAN = 900
+BODY_SIGMA = 0.8
+BODY_MIN, BODY_MAX = 80, 30000
+CORPUS_CHARS = 1 << 20          # bodies are slices of one generated text
+
+FIRST_NAMES = ["Alice", "Bob", "Charlie", "David", "Eva", "Farah", "Gita", "Hamid",
+               "Ines", "Jon", "Kiri", "Liam", "Mei", "Nadia", "Omar", "Priya",
+               "Quinn", "Rosa", "Sami", "Tane", "Uma", "Victor", "Wiremu", "Yara"]
+LAST_NAMES = ["Smith", "Ngata", "Khan", "Garcia", "Chen", "Okafor", "Muller",
+              "Rossi", "Silva", "Tanaka", "Walker", "Haddad", "Kowalski", "Nair"]
+WORDS = """
+    government council election minister policy budget report city region
+    market economy trade energy solar wind water climate storm flood drought
+    health hospital vaccine study research university school student teacher
+    science species forest ocean river farm harvest export price inflation
+    technology software network data privacy security startup investment
+    sport team match season player coach final record crowd stadium
+    culture music festival film artist museum library history heritage
+    transport road rail airport bridge housing rent construction workers
+    police court judge law inquiry community village local national global
+    announced confirmed reported expected rising falling new major first
+    after before during despite following against across amid toward
+""".split()
+
+
+# ------------------- Row generators -------------------
+def users(rng, count, first_id):
+    for i in range(first_id, first_id + count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield (f"{first}{last}{i}", f"{first.lower()}.{last.lower()}{i}@example.com",
+               rng.randint(18, 80), f"0{rng.randint(100000000, 999999999)}")
+
+
+def author_weights(rng, user_ids):
+    # Cumulative Zipf weights over the authors in a shuffled order, so the
+    # busiest authors are not simply the oldest accounts
+    ranked = list(user_ids)
+    rng.shuffle(ranked)
+    cumulative = list(itertools.accumulate(1 / (rank ** ZIPF_EXPONENT)
+                                           for rank in range(1, len(ranked) + 1)))
+    return ranked, cumulative
+
+
+def make_corpus(rng):
+    parts, size = [], 0
+    while size < CORPUS_CHARS:
+        sentence = " ".join(rng.choices(WORDS, k=rng.randint(6, 18))).capitalize() + ". "
+        parts.append(sentence)
+        size += len(sentence)
+    return "".join(parts)
+
+
+def news(rng, count, user_ids, end=None):
+    ranked, cumulative = author_weights(rng, user_ids)
+    corpus = make_corpus(rng)
+    end = end or datetime(2025, 12, 31, 23, 59, 59)
+    span = SPAN_DAYS * 86400
+    mu = math.log(BODY_MEDIAN)
+
+    for _ in range(count):
+        length = min(BODY_MAX, max(BODY_MIN, int(rng.lognormvariate(mu, BODY_SIGMA))))
+        start = corpus.index(" ", rng.randrange(0, len(corpus) - length - 100)) + 1
+        body = corpus[start:start + length].strip()
+        title = " ".join(rng.choices(WORDS, k=rng.randint(4, 10))).capitalize()
+        # sqrt skews timestamps towards the end of the span (growing activity)
+        created_at = end - timedelta(seconds=int(span * (1 - math.sqrt(rng.random()))))
+        author = rng.choices(ranked, cum_weights=cumulative)[0]
+        yield (title, body, created_at, author)
+
+
+def batches(rows, size):
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+# ------------------- Loaders -------------------
+def insert_rows(sql, rows, batch_size=BATCH_SIZE, on_batch=None):
+    # One multi-row INSERT (executemany) and one transaction per batch
+    total = 0
+    with get_pool().connection() as db:
+        cursor = db.cursor()
+        for batch in batches(rows, batch_size):
+            db.start_transaction()
+            cursor.executemany(sql, batch)
+            db.commit()
+            total += len(batch)
+            if on_batch:
+                on_batch(total)
+    return total
+
+
+def load_data_rows(table, columns, rows, batch_size=BATCH_SIZE * 20, on_batch=None):
+    # MySQL only: LOAD DATA LOCAL INFILE from a temporary tab-separated file
+    # per batch. Needs local_infile=ON on the server.
+    db = get_backend().connect(allow_local_infile=True)
+    cursor = db.cursor()
+    total = 0
+    try:
+        for batch in batches(rows, batch_size):
+            with tempfile.NamedTemporaryFile("w", suffix=".tsv", delete=False, encoding="utf-8") as f:
+                for row in batch:
+                    f.write("\t".join(tsv_value(v) for v in row) + "\n")
+            try:
+                cursor.execute(f"""
+                    LOAD DATA LOCAL INFILE %s INTO TABLE {table}
+                    CHARACTER SET utf8mb4
+                    FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n'
+                    ({columns})
+                """, (f.name,))
+            finally:
+                os.remove(f.name)
+            total += len(batch)
+            if on_batch:
+                on_batch(total)
+    finally:
+        db.close()
+    return total
+
+
+def tsv_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, datetime):
+        return value.isoformat(" ")
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+DEFERRED_TRIGGERS = ["news_fts_insert", "news_stats_insert", "news_changes_insert"]
+
+
+@contextmanager
+def triggers_deferred(enabled):
+    # SQLite only: keeping news_fts and user_stats in sync row by row costs
+    # several times the insert itself, so for big loads drop the insert
+    # triggers and rebuild both once at the end (the triggers are restored
+    # even if the load fails). Instead of a change_log entry per row,
+    # running clients get one 'R' (reload) entry.
+    if not enabled:
+        yield
+        return
+    with get_pool().connection() as db:
+        cursor = db.cursor()
+        triggers = []
+        for name in DEFERRED_TRIGGERS:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type='trigger' AND name=%s", (name,))
+            triggers.append(cursor.fetchone()[0])
+            cursor.execute(f"DROP TRIGGER {name}")
+    try:
+        yield
+    finally:
+        with get_pool().connection() as db:
+            cursor = db.cursor()
+            db.start_transaction()
+            for trigger in triggers:
+                cursor.execute(trigger)
+            cursor.execute("INSERT INTO news_fts(news_fts) VALUES ('rebuild')")
+            rebuild_user_stats("news", "news_archive")(cursor)
+            cursor.execute("INSERT INTO change_log(table_name, row_id, action) VALUES ('news', 0, 'R')")
+            db.commit()
+
+
+def next_user_id():
+    with get_pool().connection() as db:
+        cursor = db.cursor()
+        cursor.execute("SELECT COALESCE(MAX(user_id), 0) + 1 FROM user_info")
+        return cursor.fetchone()[0]
+
+
+def all_user_ids():
+    with get_pool().connection() as db:
+        cursor = db.cursor()
+        cursor.execute("SELECT user_id FROM user_info ORDER BY user_id")
+        return [row[0] for row in cursor.fetchall()]
+
+
+def news_count():
+    with get_pool().connection() as db:
+        cursor = db.cursor()
+        cursor.execute("SELECT COUNT(*) FROM news")
+        return cursor.fetchone()[0]
+
+
+# ------------------- Entry point -------------------
+def generate(user_count, news_total, seed=42, load_data=False, on_batch=None):
+    rng = random.Random(seed)
+    if load_data and get_backend().name != "mysql":
+        raise ValueError("LOAD DATA is only available on the MySQL backend.")
+
+    def load(table, columns, sql, rows):
+        if load_data:
+            return load_data_rows(table, columns, rows, on_batch=on_batch)
+        return insert_rows(sql, rows, on_batch=on_batch)
+
+    if user_count:
+        load("user_info", "username, email, age, contact_number", SQL_USER_INSERT,
+             users(rng, user_count, next_user_id()))
+    if news_total:
+        user_ids = all_user_ids()
+        if not user_ids:
+            raise ValueError("Generate some users before news.")
+        # a rebuild re-reads every row, so only worth it when the load dominates
+        defer = get_backend().name == "sqlite" and news_total >= news_count()
+        with triggers_deferred(defer):
+            load("news", "title, body, created_at, user_id", SQL_NEWS_INSERT_DATED,
+                 news(rng, news_total, user_ids))
+
+
+# ====================================================
+#                  COMMAND LINE
+# ====================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Populate the database with seeded synthetic users and news.")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--news", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--load-data", action="store_true",
+                        help="use LOAD DATA LOCAL INFILE (MySQL) instead of multi-row INSERTs")
+    args = parser.parse_args()
+
+    migrate()
+    started = time.perf_counter()
+
+    def report(total):
+        rate = total / max(time.perf_counter() - started, 1e-9)
+        print(f"\r{total} rows ({rate:,.0f} rows/s)", end="")
+
+    generate(args.users, args.news, args.seed, args.load_data, on_batch=report)
+    print(f"\nDone in {time.perf_counter() - started:.1f}s.")
@@ -0,0 +1,430 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from collections import namedtuple
+from datetime import datetime
+
+from bulk import SQL_PROGRESS_GET, SQL_PROGRESS_ADD, SQL_PROGRESS_SET
+from livesync import Changes
+from repository import (User, News, SQL_USER_INSERT, SQL_USER_UPDATE, SQL_USER_DELETE,
+                        SQL_USER_ID_BY_NAME, SQL_NEWS_INSERT_DATED, SQL_NEWS_UPDATE,
+                        SQL_NEWS_DELETE, SQL_ARCHIVE_UPDATE, SQL_ARCHIVE_DELETE,
+                        is_integrity_error, save_news, move_news,
+                        delete_users, delete_news, reassign_news)
+
+# ------------------- Settings -------------------
+WRITE_BEHIND = os.environ.get("NEWS_WRITE_BEHIND", "0") == "1"
+JOURNAL_PATH = os.environ.get(
+    "NEWS_JOURNAL_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "news_journal.db"))
+FLUSH_BATCH = 200           # operations per primary transaction
+FLUSH_MS = 500              # delay between a local save and the flush
+RETRY_MAX_MS = 30000        # back-off ceiling while the primary is unreachable
+
+
+# ====================================================
+#                   DIRECT WRITES
+# ====================================================
+# NewsApp saves through one of two writers with the same methods. This one
+# writes straight to the primary, on the DbExecutor (immediate = False).
+# base is the row as the editor loaded it; only the journal uses it.
+class DirectWrites:
+    immediate = False
+
+    def __init__(self, users, news):
+        self.users = users
+        self.news = news
+
+    def add_user(self, username, email, age, contact_number):
+        return self.users.add(username, email, age, contact_number)
+
+    def update_user(self, user, base=None):
+        # the list row also shows the statistics
+        self.users.update(*user)
+        return self.users.summary(user.user_id)
+
+    def delete_user(self, user_id, base=None):
+        self.users.delete(user_id)
+
+    def save_news(self, news_id, title, body, author, base=None):
+        # None means the author does not exist
+        return save_news(self.users, self.news, news_id, title, body, author)
+
+    def delete_news(self, news_id, base=None):
+        self.news.delete(news_id)
+
+    # Selections: one transaction each
+    def delete_many_users(self, user_ids):
+        self.users.delete_many(user_ids)
+
+    def delete_many_news(self, news_ids):
+        self.news.delete_many(news_ids)
+
+    def move_news(self, news_ids, author):
+        # the author's id, None if the author does not exist
+        return move_news(self.users, self.news, news_ids, author)
+
+    def latest(self, row):
+        return row
+
+    def close(self):
+        pass
+
+
+# ====================================================
+#                WRITE-BEHIND JOURNAL
+# ====================================================
+# Saves go to a local SQLite file (fsync'd, so they survive a crash) and
+# return at once; flush() later replays them against the primary, up to
+# FLUSH_BATCH per transaction. Rows added locally get a temporary negative
+# id (-seq) until the flush learns the real one; an article saved under an
+# author who is only in the journal so far shows that author's temporary id.
+#
+# Conflicts: an update or delete carries the row as the editor loaded it,
+# and is skipped (and reported) if the primary row has changed since or is
+# gone; so is an article whose author no longer exists, or a duplicate
+# username. Operations on a selection (deletes, moving articles to another
+# author) are applied as they stand. Each operation runs under a savepoint,
+# so a conflict skips only that operation. Anything else (lost connection,
+# lock timeout) rolls the batch back and it is retried as a whole.
+#
+# The last applied sequence number is stored on the primary in
+# import_progress, in the same transaction as the batch, so a crash after
+# the commit cannot apply a batch twice.
+JOURNAL_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS pending(
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        op TEXT NOT NULL,
+        target INT,
+        args TEXT NOT NULL,
+        base TEXT,
+        attempts INT NOT NULL DEFAULT 0,
+        last_error TEXT
+    )
+    """,
+    "CREATE TABLE IF NOT EXISTS temp_ids(temp_id INTEGER PRIMARY KEY, real_id INT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY, value TEXT)",
+]
+
+# The columns an editor can change, to compare with the row it loaded
+SQL_CURRENT_USER = "SELECT username, email, age, contact_number FROM user_info WHERE user_id=%s"
+SQL_CURRENT_NEWS = """
+    SELECT news.title, news.body, user_info.username
+    FROM {table} news LEFT JOIN user_info ON news.user_id = user_info.user_id
+    WHERE news.news_id=%s
+"""
+
+Operation = namedtuple("Operation", "seq op target args base")
+
+# What a flush did, for the Tk side:
+#   user_ids / news_ids -> {temp id: real id} of rows added
+#   dropped             -> [("user" or "news", temp id)] adds that were rejected
+#   changes             -> livesync.Changes with the current rows touched
+#   conflicts           -> messages for the operations that were skipped
+#   pending             -> operations still in the journal
+FlushResult = namedtuple("FlushResult", "user_ids news_ids dropped changes conflicts pending")
+
+
+class Conflict(Exception):
+    pass
+
+
+class WriteJournal:
+    immediate = True
+
+    def __init__(self, pool, users, news, path=JOURNAL_PATH):
+        self.pool = pool
+        self.users = users
+        self.news = news
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        for sql in JOURNAL_SCHEMA:
+            self._db.execute(sql)
+        self.source = f"journal:{self._client_id()}"
+        # lock clause for reading the row an operation will change
+        self._for_update = " FOR UPDATE" if pool.dialect == "mysql" else ""
+
+    def _client_id(self):
+        row = self._db.execute("SELECT value FROM meta WHERE key='client_id'").fetchone()
+        if row:
+            return row[0]
+        client_id = str(uuid.uuid4())
+        self._db.execute("INSERT INTO meta(key, value) VALUES ('client_id', ?)", (client_id,))
+        return client_id
+
+    def close(self):
+        self._db.close()
+
+    # ------------------- Saving (Tk thread) -------------------
+    def _append(self, op, target, args, base=None):
+        with self._lock:
+            if op.startswith(("update", "delete")):
+                # a second edit of a row whose first edit is still queued
+                # starts from that edit, not from the row the form loaded
+                queued = self._queued_update(op.split("_")[1], target)
+                base = base if queued is None else queued
+            cursor = self._db.execute(
+                "INSERT INTO pending(op, target, args, base) VALUES (?, ?, ?, ?)",
+                (op, target, json.dumps(args), None if base is None else json.dumps(base)))
+            return cursor.lastrowid
+
+    def _queued_update(self, kind, target):
+        # new values of the last queued edit of a row, if any
+        row = self._db.execute(
+            "SELECT args FROM pending WHERE target=? AND op=? ORDER BY seq DESC LIMIT 1",
+            (target, f"update_{kind}")).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def add_user(self, username, email, age, contact_number):
+        return -self._append("add_user", None, [username, email, age, contact_number])
+
+    def update_user(self, user, base=None):
+        self._append("update_user", user.user_id, list(user[1:]), user_base(base))
+        return user
+
+    def delete_user(self, user_id, base=None):
+        self._append("delete_user", user_id, [], user_base(base))
+
+    def save_news(self, news_id, title, body, author, base=None):
+        # the author is checked when the journal is flushed
+        user_id = self._author_id_now(author)
+        if news_id is None:
+            created_at = datetime.now().replace(microsecond=0)
+            seq = self._append("add_news", None, [title, body, author, created_at.isoformat(" ")])
+            return News(-seq, title, body, created_at, user_id, author)
+        self._append("update_news", news_id, [title, body, author], news_base(base))
+        created_at = base.created_at if base else None
+        return News(news_id, title, body, created_at, user_id, author)
+
+    def delete_news(self, news_id, base=None):
+        self._append("delete_news", news_id, [], news_base(base))
+
+    def delete_many_users(self, user_ids):
+        self._append("deletemany_user", None, [user_ids])
+
+    def delete_many_news(self, news_ids):
+        self._append("deletemany_news", None, [news_ids])
+
+    def move_news(self, news_ids, author):
+        # the author is checked when the journal is flushed; 0 = not known yet
+        self._append("move_news", None, [news_ids, author])
+        return self._author_id_now(author) or 0
+
+    def _author_id_now(self, author):
+        # The author's id as far as this client knows without asking the
+        # primary: cached, or (newest first) that of a user the journal
+        # adds or renames to this name, possibly temporary. None if unknown.
+        user_id = self.users.author_ids.get(author)
+        if user_id is not None:
+            return user_id
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, op, target, args FROM pending WHERE op IN ('add_user', 'update_user') "
+                "ORDER BY seq DESC")
+            for seq, op, target, args in rows:
+                if json.loads(args)[0] == author:
+                    return -seq if op == "add_user" else target
+        return None
+
+    def latest(self, row):
+        # The row with any queued edit applied, for filling the forms
+        kind, key = ("user", row.user_id) if isinstance(row, User) else ("news", row.news_id)
+        with self._lock:
+            args = self._queued_update(kind, key)
+        if args is None:
+            return row
+        if kind == "user":
+            return User(key, *args)
+        title, body, author = args
+        return row._replace(title=title, body=body, username=author)
+
+    def pending(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+
+    # ------------------- Flushing (worker thread) -------------------
+    def flush(self, limit=FLUSH_BATCH):
+        with self._lock:
+            ops = [Operation(*row) for row in self._db.execute(
+                "SELECT seq, op, target, args, base FROM pending ORDER BY seq LIMIT ?", (limit,))]
+            ids = dict(self._db.execute("SELECT temp_id, real_id FROM temp_ids"))
+        if not ops:
+            return None
+
+        added = {}                  # temp id -> real id, this batch
+        touched = {"user": {}, "news": {}}      # id -> inserted
+        dropped, conflicts = [], []
+        try:
+            with self.pool.connection() as db:
+                db.start_transaction()
+                cursor = db.cursor()
+                applied = self._applied(cursor)
+                for op in ops:
+                    if op.seq <= applied:
+                        continue    # committed before a crash, journal not yet trimmed
+                    cursor.execute("SAVEPOINT journal_op")
+                    try:
+                        self._apply(cursor, op, ids, added, touched)
+                        cursor.execute("RELEASE SAVEPOINT journal_op")
+                    except Exception as e:
+                        if not isinstance(e, Conflict) and not is_integrity_error(e):
+                            raise
+                        cursor.execute("ROLLBACK TO SAVEPOINT journal_op")
+                        conflicts.append(describe(op, e))
+                        if op.op.startswith("add"):
+                            dropped.append((op.op[4:], -op.seq))
+                            continue
+                        # show the primary's version again
+                        for row_id in targets(op):
+                            touched[op.op.split("_")[1]].setdefault(ids.get(row_id, row_id), False)
+                cursor.execute(SQL_PROGRESS_SET, (ops[-1].seq, self.source))
+                db.commit()
+        except Exception as e:
+            with self._lock:
+                self._db.execute(
+                    f"UPDATE pending SET attempts = attempts + 1, last_error = ? "
+                    f"WHERE seq IN ({','.join('?' * len(ops))})", [str(e)] + [op.seq for op in ops])
+            raise
+
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute("DELETE FROM pending WHERE seq <= ?", (ops[-1].seq,))
+            # Once nothing is queued, earlier mappings have no users left: the
+            # Tk side swapped their rows to the real ids before this flush
+            # was scheduled. This batch's are kept until the next flush.
+            if self._db.execute("SELECT 1 FROM pending LIMIT 1").fetchone() is None:
+                self._db.execute("DELETE FROM temp_ids")
+            self._db.executemany("INSERT OR REPLACE INTO temp_ids(temp_id, real_id) VALUES (?, ?)",
+                                 added.items())
+            self._db.execute("COMMIT")
+        return self._result(added, touched, dropped, conflicts, ops)
+
+    def _applied(self, cursor):
+        cursor.execute(SQL_PROGRESS_GET, (self.source,))
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute(SQL_PROGRESS_ADD, (self.source,))
+            return 0
+        return row[0]
+
+    def _apply(self, cursor, op, ids, added, touched):
+        args = json.loads(op.args)
+        base = json.loads(op.base) if op.base else None
+        target = ids.get(op.target, op.target)
+
+        if op.op == "add_user":
+            cursor.execute(SQL_USER_INSERT, args)
+            added[-op.seq] = ids[-op.seq] = cursor.lastrowid
+            touched["user"][cursor.lastrowid] = True
+        elif op.op == "add_news":
+            title, body, author, created_at = args
+            user_id = self._author_id(cursor, author)
+            cursor.execute(SQL_NEWS_INSERT_DATED, (title, body, datetime.fromisoformat(created_at), user_id))
+            added[-op.seq] = ids[-op.seq] = cursor.lastrowid
+            touched["news"][cursor.lastrowid] = True
+        elif op.op in ("deletemany_user", "deletemany_news", "move_news"):
+            kind = op.op.split("_")[1]
+            row_ids = [ids.get(row_id, row_id) for row_id in args[0]]
+            if op.op == "deletemany_user":
+                delete_users(cursor, row_ids)
+            elif op.op == "deletemany_news":
+                delete_news(cursor, row_ids)
+            else:
+                reassign_news(cursor, row_ids, self._author_id(cursor, args[1]))
+            if kind == "user":
+                self.users.invalidate(*row_ids)
+            for row_id in row_ids:
+                if kind == "news":
+                    self.news.cache.invalidate(row_id)
+                touched[kind].setdefault(row_id, False)
+        elif op.op in ("update_user", "delete_user"):
+            self._check(cursor, SQL_CURRENT_USER, target, base, "user")
+            if op.op == "update_user":
+                cursor.execute(SQL_USER_UPDATE, args + [target])
+            else:
+                cursor.execute(SQL_USER_DELETE, (target,))
+            self.users.invalidate(target)
+            touched["user"].setdefault(target, False)
+        else:
+            # the article may have been archived since it was loaded
+            tier = "news"
+            if not self._check(cursor, SQL_CURRENT_NEWS.format(table="news"),
+                               target, base, "article", missing_ok=True):
+                tier = "archive"
+                self._check(cursor, SQL_CURRENT_NEWS.format(table="news_archive"),
+                            target, base, "article")
+            if op.op == "update_news":
+                title, body, author = args
+                sql = SQL_NEWS_UPDATE if tier == "news" else SQL_ARCHIVE_UPDATE
+                cursor.execute(sql, (title, body, self._author_id(cursor, author), target))
+            else:
+                cursor.execute(SQL_NEWS_DELETE if tier == "news" else SQL_ARCHIVE_DELETE, (target,))
+            self.news.cache.invalidate(target)
+            touched["news"].setdefault(target, False)
+
+    def _check(self, cursor, sql, row_id, base, what, missing_ok=False):
+        # True if the row exists and still matches what the editor saw
+        cursor.execute(sql + self._for_update, (row_id,))
+        current = cursor.fetchone()
+        if current is None:
+            if missing_ok:
+                return False
+            raise Conflict(f"the {what} was deleted by someone else")
+        if base is not None and list(current) != base:
+            raise Conflict(f"the {what} was changed by someone else")
+        return True
+
+    def _author_id(self, cursor, author):
+        cursor.execute(SQL_USER_ID_BY_NAME, (author,))
+        row = cursor.fetchone()
+        if row is None:
+            raise Conflict(f"author '{author}' not found")
+        return row[0]
+
+    def _result(self, added, touched, dropped, conflicts, ops):
+        kinds = {op.seq: op.op.split("_")[1] for op in ops}
+        user_ids = {temp: real for temp, real in added.items() if kinds[-temp] == "user"}
+        news_ids = {temp: real for temp, real in added.items() if kinds[-temp] == "news"}
+        users = self.users.summaries(touched["user"]) if touched["user"] else {}
+        news = self.news.summaries(touched["news"]) if touched["news"] else {}
+        changes = Changes(False,
+                          {i: (users.get(i), inserted) for i, inserted in touched["user"].items()},
+                          {i: (news.get(i), inserted) for i, inserted in touched["news"].items()})
+        return FlushResult(user_ids, news_ids, dropped, changes, conflicts, self.pending())
+
+
+# ------------------- Helpers -------------------
+def user_base(user):
+    return None if user is None else [user.username, user.email, user.age, user.contact_number]
+
+
+def news_base(news):
+    return None if news is None else [news.title, news.body, news.username]
+
+
+def targets(op):
+    # ids of the existing rows an operation changes
+    if op.target is not None:
+        return [op.target]
+    return json.loads(op.args)[0] if op.op in ("deletemany_user", "deletemany_news", "move_news") else []
+
+
+def describe(op, error):
+    what = {"add_user": "New user", "update_user": "Edit of user", "delete_user": "Deletion of user",
+            "add_news": "New article", "update_news": "Edit of article",
+            "delete_news": "Deletion of article", "deletemany_user": "Deletion of users",
+            "deletemany_news": "Deletion of articles", "move_news": "New author for articles"}[op.op]
+    if op.op.startswith(("add", "update")):
+        name = json.loads(op.args)[0]
+    elif op.target is None:
+        row_ids = targets(op)
+        name = ", ".join(f"#{row_id}" for row_id in row_ids[:5]) + (", ..." if len(row_ids) > 5 else "")
+    else:
+        name = f"#{op.target}"
+    reason = str(error) if isinstance(error, Conflict) else "the username is already taken"
+    return f"{what} '{name}' not saved: {reason}"
@@ -0,0 +1,116 @@
+import time
+from collections import namedtuple
+
+from repository import ChangeLogRepository
+
+SYNC_POLL_MS = 2000
+CHANGES_PER_POLL = 500      # more than this at once: reload instead of patching
+GAP_WAIT = 10.0             # seconds to wait for a missing sequence number
+
+
+# ====================================================
+#                LIVE SYNC (CHANGE FEED)
+# ====================================================
+# Follows change_log (migration 7) so each NewsApp sees other clients'
+# edits. A poll is one primary-key range query for the entries after the
+# last one seen, plus one IN (...) query for the rows they name; the Tk
+# side then patches just those rows.
+#
+# MySQL hands out sequence numbers at insert time but transactions can
+# commit out of order, so a number may appear after a higher one was
+# read. Missing numbers are waited for (GAP_WAIT) before the watermark
+# moves past them; numbers of rolled-back transactions never appear.
+#
+# poll() returns Changes:
+#   reload -> too much changed, reload the lists
+#   users  -> {user_id: (UserSummary or None if deleted, inserted)}
+#   news   -> {news_id: (NewsSummary or None if deleted, inserted)}
+Changes = namedtuple("Changes", "reload users news")
+
+
+class ChangeFeed:
+    def __init__(self, pool, users, news, limit=CHANGES_PER_POLL):
+        self.log = ChangeLogRepository(pool)
+        self.users = users
+        self.news = news
+        self.limit = limit
+        self.seen = None            # every entry <= seen has been handled
+        self._handled = set()       # handled entries above seen
+        self._gaps = {}             # missing seq -> when it was first missed
+
+    # Worker thread only
+    def start(self):
+        # changes before now are already in the initial load
+        self.seen = self.log.latest()
+        self._handled.clear()
+        self._gaps.clear()
+
+    def poll(self):
+        if self.seen is None:
+            self.start()
+        entries = self.log.since(self.seen, self.limit)
+        fresh = [c for c in entries if c.seq not in self._handled]
+        if len(fresh) >= self.limit or any(c.action == "R" for c in fresh):
+            self.start()
+            return Changes(True, {}, {})
+
+        self._advance(entries)
+        return self._load(fresh)
+
+    def catch_up(self):
+        # Like poll() for a process that only reads through the row caches
+        # (the HTTP API): drops what other clients changed, loads nothing
+        if self.seen is None:
+            self.start()
+        entries = self.log.since(self.seen, self.limit)
+        fresh = [c for c in entries if c.seq not in self._handled]
+        if len(fresh) >= self.limit or any(c.action == "R" for c in fresh):
+            self.start()
+            self.users.cache.clear()
+            self.users.author_ids.clear()
+            self.news.cache.clear()
+            return
+        self._advance(entries)
+        self._invalidate(fresh)
+
+    def _advance(self, entries):
+        now = time.monotonic()
+        expected = self.seen + 1
+        for change in entries:
+            for missing in range(expected, change.seq):
+                self._gaps.setdefault(missing, now)
+            expected = change.seq + 1
+            self._handled.add(change.seq)
+            self._gaps.pop(change.seq, None)
+
+        while True:
+            following = self.seen + 1
+            if following in self._handled:
+                self._handled.discard(following)
+            elif following in self._gaps and now - self._gaps[following] > GAP_WAIT:
+                del self._gaps[following]
+            else:
+                break
+            self.seen = following
+
+    def _load(self, changes):
+        users, news = {}, {}
+        for change in changes:
+            rows = users if change.table_name == "user_info" else news
+            rows[change.row_id] = rows.get(change.row_id, False) or change.action == "I"
+        self._invalidate(changes)
+
+        found_users = self.users.summaries(users) if users else {}
+        found_news = self.news.summaries(news) if news else {}
+        return Changes(False,
+                       {user_id: (found_users.get(user_id), inserted) for user_id, inserted in users.items()},
+                       {news_id: (found_news.get(news_id), inserted) for news_id, inserted in news.items()})
+
+    def _invalidate(self, changes):
+        # 'S' only moved the user's counts; cached rows are still right
+        users = [c.row_id for c in changes if c.action in "UD" and c.table_name == "user_info"]
+        if users:
+            self.users.invalidate(*users)       # one pass over the caches for all of them
+        for change in changes:
+            if change.action in "UD" and change.table_name != "user_info":
+                self.news.cache.invalidate(change.row_id)
@@ -0,0 +1,315 @@
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# ------------------- Settings -------------------
+SLOW_QUERY_MS = float(os.environ.get("NEWS_SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG = os.environ.get("NEWS_SLOW_QUERY_LOG", "")     # file path, "" = off
+RECENT = 1000           # timings kept per metric for percentiles
+SLOW_KEPT = 200         # slow statements kept for the Diagnostics tab
+
+# Silent until configure_slow_log() gives it a file (the Diagnostics tab
+# keeps the recent slow statements either way); without a handler of its
+# own it would fall through to logging's stderr last resort.
+slow_log = logging.getLogger("news.slow_query")
+slow_log.addHandler(logging.NullHandler())
+slow_log.propagate = False
+
+
+# ====================================================
+#                     METRICS
+# ====================================================
+# Counters and recent timings for SQL statements ("sql"), pool acquires
+# ("pool") and Tk actions measured end to end ("ui"). Written from worker
+# threads and the Tk thread, read by the Diagnostics tab.
+class Stat:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.errors = 0
+        self.recent = deque(maxlen=RECENT)
+
+    def add(self, seconds, rows=0, nbytes=0, error=False):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.rows += rows
+        self.bytes += nbytes
+        self.errors += error
+        self.recent.append(seconds)
+
+    def snapshot(self):
+        recent = sorted(self.recent)
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": percentile(recent, 0.50) * 1000,
+            "p95_ms": percentile(recent, 0.95) * 1000,
+            "max_ms": self.max * 1000,
+            "total_ms": self.total * 1000,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "errors": self.errors,
+        }
+
+
+class Metrics:
+    def __init__(self, slow_ms=SLOW_QUERY_MS):
+        self.slow_ms = slow_ms
+        self._stats = {}                # (kind, name) -> Stat
+        self._slow = deque(maxlen=SLOW_KEPT)
+        self._lock = threading.Lock()
+        self._started = time.time()
+
+    def record(self, kind, name, seconds, rows=0, nbytes=0, error=False):
+        with self._lock:
+            stat = self._stats.get((kind, name))
+            if stat is None:
+                stat = self._stats[(kind, name)] = Stat()
+            stat.add(seconds, rows, nbytes, error)
+
+    def statement(self, sql, seconds, rows, nbytes, error=False):
+        name = statement_name(sql)
+        self.record("sql", name, seconds, rows, nbytes, error)
+        if seconds * 1000 >= self.slow_ms:
+            entry = {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "statement": name,
+                     "ms": round(seconds * 1000, 2), "rows": rows, "sql": " ".join(sql.split())}
+            with self._lock:
+                self._slow.append(entry)
+            slow_log.warning("%(ms).1f ms  %(rows)s rows  %(statement)s  %(sql)s", entry)
+
+    def snapshot(self):
+        from repository import cache_stats
+
+        with self._lock:
+            stats = [dict(kind=kind, name=name, **stat.snapshot())
+                     for (kind, name), stat in sorted(self._stats.items())]
+            slow = list(self._slow)
+        return {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "uptime_s": round(time.time() - self._started, 1),
+            "slow_query_ms": self.slow_ms,
+            "stats": stats,
+            "slow_queries": slow,
+            "caches": cache_stats(),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+            self._started = time.time()
+
+    def export(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+
+metrics = Metrics()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def configure_slow_log(path=SLOW_QUERY_LOG):
+    if path and not any(isinstance(h, logging.FileHandler) for h in slow_log.handlers):
+        handler = logging.FileHandler(path, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        slow_log.addHandler(handler)
+
+
+# ------------------- Statement names -------------------
+# Report repository statements by constant name (SQL_NEWS_BY_ID) rather
+# than by text; anything else by its first words
+_names = None
+
+
+def statement_name(sql):
+    global _names
+    if _names is None:
+        import repository
+        _names = {getattr(repository, name): name
+                  for name in dir(repository) if name.startswith("SQL_")}
+    name = _names.get(sql)
+    if name is None:
+        name = re.sub(r"\s+", " ", sql).strip()[:60]
+    return name
+
+
+def payload_size(row):
+    size = 0
+    for value in row:
+        if isinstance(value, (str, bytes, bytearray)):
+            size += len(value)
+        elif value is not None:
+            size += 8
+    return size
+
+
+# ====================================================
+#             INSTRUMENTED CONNECTIONS
+# ====================================================
+# A statement is timed from execute() until its result set is exhausted
+# (or the cursor moves on), so unbuffered fetches are included.
+class InstrumentedCursor:
+    def __init__(self, cursor, registry):
+        self._cursor = cursor
+        self._registry = registry
+        self._open = None           # [sql, seconds, rows, bytes] of the running statement
+
+    def execute(self, sql, *args, **kwargs):
+        return self._run(self._cursor.execute, sql, *args, **kwargs)
+
+    def executemany(self, sql, *args, **kwargs):
+        return self._run(self._cursor.executemany, sql, *args, **kwargs)
+
+    def _run(self, method, sql, *args, **kwargs):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            method(sql, *args, **kwargs)
+        except Exception:
+            self._registry.statement(sql, time.perf_counter() - started, 0, 0, error=True)
+            raise
+        self._open = [sql, time.perf_counter() - started, 0, 0]
+        if self._cursor.description is None:
+            # no result set (INSERT/UPDATE/DELETE): rows = affected rows
+            self._open[2] = max(self._cursor.rowcount, 0)
+            self._finish()
+        return self
+
+    def _fetched(self, started, rows):
+        if self._open is not None:
+            self._open[1] += time.perf_counter() - started
+            self._open[2] += len(rows)
+            self._open[3] += sum(payload_size(row) for row in rows)
+
+    def _finish(self):
+        if self._open is not None:
+            sql, seconds, rows, nbytes = self._open
+            self._open = None
+            self._registry.statement(sql, seconds, rows, nbytes)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        if row is None:
+            self._fetched(started, ())
+            self._finish()
+        else:
+            self._fetched(started, (row,))
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        self._fetched(started, rows)
+        if not rows or (size is not None and len(rows) < size):
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(started, rows)
+        self._finish()
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self):
+        self._finish()
+        return self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    def __init__(self, conn, registry):
+        self._conn = conn
+        self._registry = registry
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self._registry)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def instrument_pool(pool, registry=metrics):
+    # Wrap every connection the pool opens and time every acquire
+    factory = pool.factory
+    pool.factory = lambda: InstrumentedConnection(factory(), registry)
+    pool.on_acquire = lambda seconds: registry.record("pool", "acquire", seconds)
+    return pool
+
+
+# ====================================================
+#                  UI ACTION TIMING
+# ====================================================
+# An action starts when a Tk handler is called and ends when the handler
+# and every DbExecutor callback it led to have run, i.e. when the result
+# is on screen. Tk-thread only.
+class Action:
+    def __init__(self, name, registry):
+        self.name = name
+        self.registry = registry
+        self.started = time.perf_counter()
+        self.pending = 0
+
+    def begin(self):
+        self.pending += 1
+
+    def done(self):
+        self.pending -= 1
+        if self.pending == 0:
+            self.registry.record("ui", self.name, time.perf_counter() - self.started)
+
+
+_current = None
+
+
+def current_action():
+    return _current
+
+
+@contextmanager
+def acting(action):
+    global _current
+    previous, _current = _current, action
+    try:
+        yield
+    finally:
+        _current = previous
+
+
+def timed(handler):
+    # Decorator for NewsApp event handlers
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        action = Action(handler.__name__, metrics)
+        action.begin()
+        try:
+            with acting(action):
+                return handler(*args, **kwargs)
+        finally:
+            action.done()
+    return wrapper
@@ -0,0 +1,549 @@
+import argparse
+
+from db import get_backend, get_pool
+
+# ------------------- Step helpers -------------------
+def add_index(table, name, columns, kind="INDEX"):
+    # MySQL has no CREATE INDEX IF NOT EXISTS, so check the catalog first
+    def step(cursor, backend):
+        if backend.index_exists(cursor, table, name):
+            return
+        cursor.execute(f"CREATE {kind} {name} ON {table} ({columns})")
+    return step
+
+
+def rebuild_user_stats(*tables):
+    # Recompute user_stats from the given news tables in one grouped pass
+    # each (idx_news_user_created and its archive twin)
+    grouped = " UNION ALL ".join(
+        f"SELECT user_id, COUNT(*) AS n, MAX(created_at) AS last FROM {table} "
+        f"WHERE user_id IS NOT NULL GROUP BY user_id" for table in tables)
+
+    def step(cursor, backend=None):
+        cursor.execute("DELETE FROM user_stats")
+        cursor.execute(f"""
+            INSERT INTO user_stats(user_id, news_count, last_posted)
+            SELECT user_id, SUM(n), MAX(last) FROM ({grouped}) tiers GROUP BY user_id
+        """)
+    return step
+
+
+# Latest post of {row}.user_id over both tiers: one index probe each
+LAST_POSTED = """(SELECT MAX(last) FROM (
+    SELECT MAX(created_at) AS last FROM news WHERE user_id = {row}.user_id
+    UNION ALL
+    SELECT MAX(created_at) FROM news_archive WHERE user_id = {row}.user_id) tiers)"""
+
+
+def stats_triggers(table):
+    # user_stats triggers for one news tier, dropped first so a later
+    # migration can redefine them
+    mysql_add = """
+        INSERT INTO user_stats(user_id, news_count, last_posted)
+        VALUES (NEW.user_id, 1, NEW.created_at)
+        ON DUPLICATE KEY UPDATE news_count = news_count + 1,
+            last_posted = IF(NEW.created_at IS NULL OR last_posted >= NEW.created_at,
+                             last_posted, NEW.created_at);
+    """
+    mysql_remove = f"""
+        UPDATE user_stats SET news_count = news_count - 1,
+            last_posted = {LAST_POSTED.format(row="OLD")}
+        WHERE user_id = OLD.user_id;
+    """
+    sqlite_add = """
+        INSERT INTO user_stats(user_id, news_count, last_posted)
+        SELECT new.user_id, 1, new.created_at WHERE new.user_id IS NOT NULL
+        ON CONFLICT(user_id) DO UPDATE SET news_count = news_count + 1,
+            last_posted = CASE WHEN new.created_at IS NULL OR last_posted >= new.created_at
+                               THEN last_posted ELSE new.created_at END;
+    """
+    sqlite_remove = f"""
+        UPDATE user_stats SET news_count = news_count - 1,
+            last_posted = {LAST_POSTED.format(row="old")}
+        WHERE user_id = old.user_id;
+    """
+    return {
+        "mysql": [
+            f"DROP TRIGGER IF EXISTS {table}_stats_insert",
+            f"""
+            CREATE TRIGGER {table}_stats_insert AFTER INSERT ON {table} FOR EACH ROW
+            BEGIN
+                IF NEW.user_id IS NOT NULL THEN {mysql_add} END IF;
+            END
+            """,
+            f"DROP TRIGGER IF EXISTS {table}_stats_delete",
+            f"""
+            CREATE TRIGGER {table}_stats_delete AFTER DELETE ON {table} FOR EACH ROW
+            BEGIN {mysql_remove} END
+            """,
+            f"DROP TRIGGER IF EXISTS {table}_stats_update",
+            f"""
+            CREATE TRIGGER {table}_stats_update AFTER UPDATE ON {table} FOR EACH ROW
+            BEGIN
+                IF NOT (NEW.user_id <=> OLD.user_id AND NEW.created_at <=> OLD.created_at) THEN
+                    {mysql_remove}
+                    IF NEW.user_id IS NOT NULL THEN {mysql_add} END IF;
+                END IF;
+            END
+            """,
+        ],
+        "sqlite": [
+            f"DROP TRIGGER IF EXISTS {table}_stats_insert",
+            f"""
+            CREATE TRIGGER {table}_stats_insert AFTER INSERT ON {table}
+            WHEN new.user_id IS NOT NULL BEGIN {sqlite_add} END
+            """,
+            f"DROP TRIGGER IF EXISTS {table}_stats_delete",
+            f"""
+            CREATE TRIGGER {table}_stats_delete AFTER DELETE ON {table}
+            WHEN old.user_id IS NOT NULL BEGIN {sqlite_remove} END
+            """,
+            f"DROP TRIGGER IF EXISTS {table}_stats_update",
+            f"""
+            CREATE TRIGGER {table}_stats_update AFTER UPDATE OF user_id, created_at ON {table}
+            WHEN old.user_id IS NOT new.user_id OR old.created_at IS NOT new.created_at BEGIN
+                {sqlite_remove} {sqlite_add}
+            END
+            """,
+        ],
+    }
+
+
+def require_unique(table, column):
+    # Fail with a readable message instead of a bare duplicate-key error
+    def step(cursor, backend):
+        cursor.execute(f"""
+            SELECT {column}, COUNT(*) FROM {table}
+            WHERE {column} IS NOT NULL
+            GROUP BY {column} HAVING COUNT(*) > 1 LIMIT 5
+        """)
+        duplicates = cursor.fetchall()
+        if duplicates:
+            names = ", ".join(str(row[0]) for row in duplicates)
+            raise RuntimeError(
+                f"Cannot add a unique index on {table}.{column}; "
+                f"resolve duplicate values first: {names}")
+    return step
+
+
+def change_triggers(table, logged_as, key, actions):
+    # change_log triggers: actions maps INSERT/UPDATE/DELETE on table to
+    # the action letter logged for (logged_as, key of the row)
+    steps = {"mysql": [], "sqlite": []}
+    for event, action in actions.items():
+        row = "OLD" if event == "DELETE" else "NEW"
+        name = f"{table}_changes_{event.lower()}"
+        insert = (f"INSERT INTO change_log(table_name, row_id, action) "
+                  f"VALUES ('{logged_as}', {row}.{key}, '{action}')")
+        for dialect in steps:
+            steps[dialect].append(f"DROP TRIGGER IF EXISTS {name}")
+        steps["mysql"].append(f"CREATE TRIGGER {name} AFTER {event} ON {table} FOR EACH ROW {insert}")
+        steps["sqlite"].append(f"CREATE TRIGGER {name} AFTER {event} ON {table} BEGIN {insert}; END")
+    return steps
+
+
+ROW_CHANGES = {"INSERT": "I", "UPDATE": "U", "DELETE": "D"}
+
+
+# ====================================================
+#                    MIGRATIONS
+# ====================================================
+# Ordered list of (version, description, steps). A step is a SQL string, a
+# callable taking (cursor, backend), or a dict of backend name -> step for
+# engine-specific DDL. Every step must be safe to re-run, since MySQL DDL
+# commits implicitly and a migration can stop half way.
+# Never edit a migration once released -- append a new one instead.
+MIGRATIONS = [
+    (1, "create user_info and news tables", [{
+        "mysql": """
+        CREATE TABLE IF NOT EXISTS user_info(
+            user_id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(50),
+            email VARCHAR(50),
+            age INT,
+            contact_number VARCHAR(20)
+        )
+        """,
+        # NOCASE matches MySQL's default collation for unique and LIKE lookups
+        "sqlite": """
+        CREATE TABLE IF NOT EXISTS user_info(
+            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username VARCHAR(50) COLLATE NOCASE,
+            email VARCHAR(50),
+            age INT,
+            contact_number VARCHAR(20)
+        )
+        """,
+    }, {
+        "mysql": """
+        CREATE TABLE IF NOT EXISTS news(
+            news_id INT AUTO_INCREMENT PRIMARY KEY,
+            title VARCHAR(200),
+            body TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            user_id INT,
+            FOREIGN KEY (user_id) REFERENCES user_info(user_id) ON DELETE CASCADE
+        )
+        """,
+        "sqlite": """
+        CREATE TABLE IF NOT EXISTS news(
+            news_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title VARCHAR(200),
+            body TEXT,
+            created_at DATETIME DEFAULT (datetime('now', 'localtime')),
+            user_id INT,
+            FOREIGN KEY (user_id) REFERENCES user_info(user_id) ON DELETE CASCADE
+        )
+        """,
+    }]),
+
+    # Indexes for the queries the app actually runs (see explain_check.py):
+    #   news list, newest first        -> (created_at, news_id)
+    #   one author's news, newest first -> (user_id, created_at, news_id),
+    #                                      also serves the user_id foreign key
+    #   author lookup by name           -> unique username
+    (2, "index news ordering and unique usernames", [
+        add_index("news", "idx_news_created", "created_at, news_id"),
+        add_index("news", "idx_news_user_created", "user_id, created_at, news_id"),
+        require_unique("user_info", "username"),
+        add_index("user_info", "uq_user_username", "username", kind="UNIQUE INDEX"),
+    ]),
+
+    # SQLite has no FULLTEXT index; an external-content FTS5 table indexes
+    # the same columns without storing a second copy, kept in sync by triggers
+    (3, "full-text index on news title and body", [{
+        "mysql": add_index("news", "ft_news_title_body", "title, body", kind="FULLTEXT INDEX"),
+        "sqlite": [
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS news_fts
+            USING fts5(title, body, content='news', content_rowid='news_id')
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS news_fts_insert AFTER INSERT ON news BEGIN
+                INSERT INTO news_fts(rowid, title, body) VALUES (new.news_id, new.title, new.body);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS news_fts_delete AFTER DELETE ON news BEGIN
+                INSERT INTO news_fts(news_fts, rowid, title, body)
+                VALUES ('delete', old.news_id, old.title, old.body);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS news_fts_update AFTER UPDATE OF title, body ON news BEGIN
+                INSERT INTO news_fts(news_fts, rowid, title, body)
+                VALUES ('delete', old.news_id, old.title, old.body);
+                INSERT INTO news_fts(rowid, title, body) VALUES (new.news_id, new.title, new.body);
+            END
+            """,
+            "INSERT INTO news_fts(news_fts) VALUES ('rebuild')",
+        ],
+    }]),
+
+    # Committed-record counts of bulk imports (bulk.py), updated in the same
+    # transaction as each batch so an interrupted import resumes exactly
+    (4, "bulk import progress", [
+        """
+        CREATE TABLE IF NOT EXISTS import_progress(
+            source VARCHAR(255) PRIMARY KEY,
+            records INT NOT NULL DEFAULT 0,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+
+    # Article count and last post per author, kept current by triggers so
+    # every writer (app, API, bulk import) updates it. The user list joins
+    # one row per user instead of grouping over news. Deleting an article
+    # recomputes last_posted with a single idx_news_user_created lookup.
+    # (MySQL does not fire triggers for cascaded deletes, but user_stats
+    # cascades from user_info itself.)
+    (5, "materialized per-author statistics", [
+        """
+        CREATE TABLE IF NOT EXISTS user_stats(
+            user_id INT PRIMARY KEY,
+            news_count INT NOT NULL DEFAULT 0,
+            last_posted DATETIME,
+            FOREIGN KEY (user_id) REFERENCES user_info(user_id) ON DELETE CASCADE
+        )
+        """,
+        {
+            "mysql": [
+                "DROP TRIGGER IF EXISTS news_stats_insert",
+                """
+                CREATE TRIGGER news_stats_insert AFTER INSERT ON news FOR EACH ROW
+                BEGIN
+                    IF NEW.user_id IS NOT NULL THEN
+                        INSERT INTO user_stats(user_id, news_count, last_posted)
+                        VALUES (NEW.user_id, 1, NEW.created_at)
+                        ON DUPLICATE KEY UPDATE news_count = news_count + 1,
+                            last_posted = IF(NEW.created_at IS NULL OR last_posted >= NEW.created_at,
+                                             last_posted, NEW.created_at);
+                    END IF;
+                END
+                """,
+                "DROP TRIGGER IF EXISTS news_stats_delete",
+                """
+                CREATE TRIGGER news_stats_delete AFTER DELETE ON news FOR EACH ROW
+                    UPDATE user_stats SET news_count = news_count - 1,
+                        last_posted = (SELECT MAX(created_at) FROM news WHERE user_id = OLD.user_id)
+                    WHERE user_id = OLD.user_id
+                """,
+                "DROP TRIGGER IF EXISTS news_stats_update",
+                """
+                CREATE TRIGGER news_stats_update AFTER UPDATE ON news FOR EACH ROW
+                BEGIN
+                    IF NOT (NEW.user_id <=> OLD.user_id AND NEW.created_at <=> OLD.created_at) THEN
+                        UPDATE user_stats SET news_count = news_count - 1,
+                            last_posted = (SELECT MAX(created_at) FROM news WHERE user_id = OLD.user_id)
+                        WHERE user_id = OLD.user_id;
+                        IF NEW.user_id IS NOT NULL THEN
+                            INSERT INTO user_stats(user_id, news_count, last_posted)
+                            VALUES (NEW.user_id, 1, NEW.created_at)
+                            ON DUPLICATE KEY UPDATE news_count = news_count + 1,
+                                last_posted = IF(NEW.created_at IS NULL OR last_posted >= NEW.created_at,
+                                                 last_posted, NEW.created_at);
+                        END IF;
+                    END IF;
+                END
+                """,
+            ],
+            "sqlite": [
+                """
+                CREATE TRIGGER IF NOT EXISTS news_stats_insert AFTER INSERT ON news
+                WHEN new.user_id IS NOT NULL BEGIN
+                    INSERT INTO user_stats(user_id, news_count, last_posted)
+                    VALUES (new.user_id, 1, new.created_at)
+                    ON CONFLICT(user_id) DO UPDATE SET news_count = news_count + 1,
+                        last_posted = CASE WHEN new.created_at IS NULL OR last_posted >= new.created_at
+                                           THEN last_posted ELSE new.created_at END;
+                END
+                """,
+                """
+                CREATE TRIGGER IF NOT EXISTS news_stats_delete AFTER DELETE ON news
+                WHEN old.user_id IS NOT NULL BEGIN
+                    UPDATE user_stats SET news_count = news_count - 1,
+                        last_posted = (SELECT MAX(created_at) FROM news WHERE user_id = old.user_id)
+                    WHERE user_id = old.user_id;
+                END
+                """,
+                """
+                CREATE TRIGGER IF NOT EXISTS news_stats_update AFTER UPDATE OF user_id, created_at ON news
+                WHEN old.user_id IS NOT new.user_id OR old.created_at IS NOT new.created_at BEGIN
+                    UPDATE user_stats SET news_count = news_count - 1,
+                        last_posted = (SELECT MAX(created_at) FROM news WHERE user_id = old.user_id)
+                    WHERE user_id = old.user_id;
+                    INSERT INTO user_stats(user_id, news_count, last_posted)
+                    SELECT new.user_id, 1, new.created_at WHERE new.user_id IS NOT NULL
+                    ON CONFLICT(user_id) DO UPDATE SET news_count = news_count + 1,
+                        last_posted = CASE WHEN new.created_at IS NULL OR last_posted >= new.created_at
+                                           THEN last_posted ELSE new.created_at END;
+                END
+                """,
+            ],
+        },
+        # Backfill after the triggers exist, so no write is missed
+        rebuild_user_stats("news"),
+    ]),
+
+    # Articles older than the rollover cutoff move to news_archive (see
+    # archive.py), so the hot table and its indexes stay small. Native MySQL
+    # partitioning is not an option: partitioned InnoDB tables can have
+    # neither foreign keys nor FULLTEXT indexes. The archive keeps the
+    # original news_ids, is compressed on MySQL, has its own full-text
+    # index, and counts towards user_stats. news_all is the unified view
+    # for reports and ad-hoc queries; the app reads the tiers directly.
+    (6, "news archive tier", [
+        {
+            "mysql": """
+            CREATE TABLE IF NOT EXISTS news_archive(
+                news_id INT PRIMARY KEY,
+                title VARCHAR(200),
+                body TEXT,
+                created_at DATETIME,
+                user_id INT,
+                FOREIGN KEY (user_id) REFERENCES user_info(user_id) ON DELETE CASCADE
+            ) ROW_FORMAT=COMPRESSED
+            """,
+            "sqlite": """
+            CREATE TABLE IF NOT EXISTS news_archive(
+                news_id INTEGER PRIMARY KEY,
+                title VARCHAR(200),
+                body TEXT,
+                created_at DATETIME,
+                user_id INT,
+                FOREIGN KEY (user_id) REFERENCES user_info(user_id) ON DELETE CASCADE
+            )
+            """,
+        },
+        add_index("news_archive", "idx_archive_created", "created_at, news_id"),
+        add_index("news_archive", "idx_archive_user_created", "user_id, created_at, news_id"),
+        {
+            "mysql": add_index("news_archive", "ft_archive_title_body", "title, body",
+                               kind="FULLTEXT INDEX"),
+            "sqlite": [
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS news_archive_fts
+                USING fts5(title, body, content='news_archive', content_rowid='news_id')
+                """,
+                """
+                CREATE TRIGGER IF NOT EXISTS news_archive_fts_insert AFTER INSERT ON news_archive BEGIN
+                    INSERT INTO news_archive_fts(rowid, title, body) VALUES (new.news_id, new.title, new.body);
+                END
+                """,
+                """
+                CREATE TRIGGER IF NOT EXISTS news_archive_fts_delete AFTER DELETE ON news_archive BEGIN
+                    INSERT INTO news_archive_fts(news_archive_fts, rowid, title, body)
+                    VALUES ('delete', old.news_id, old.title, old.body);
+                END
+                """,
+                """
+                CREATE TRIGGER IF NOT EXISTS news_archive_fts_update AFTER UPDATE OF title, body ON news_archive BEGIN
+                    INSERT INTO news_archive_fts(news_archive_fts, rowid, title, body)
+                    VALUES ('delete', old.news_id, old.title, old.body);
+                    INSERT INTO news_archive_fts(rowid, title, body) VALUES (new.news_id, new.title, new.body);
+                END
+                """,
+            ],
+        },
+        # last_posted is now recomputed over both tiers
+        stats_triggers("news"),
+        stats_triggers("news_archive"),
+        {
+            "mysql": "CREATE OR REPLACE VIEW news_all AS "
+                     "SELECT news_id, title, body, created_at, user_id FROM news "
+                     "UNION ALL SELECT news_id, title, body, created_at, user_id FROM news_archive",
+            "sqlite": "CREATE VIEW IF NOT EXISTS news_all AS "
+                      "SELECT news_id, title, body, created_at, user_id FROM news "
+                      "UNION ALL SELECT news_id, title, body, created_at, user_id FROM news_archive",
+        },
+    ]),
+
+    # Every insert, update and delete of a user or article appends a row to
+    # change_log, so running clients can poll for other clients' edits by
+    # sequence number (see livesync.py). Archive moves log as news changes
+    # and user_stats changes as 'S' (only the user's counts moved).
+    # archive.py prunes entries older than CHANGE_LOG_DAYS.
+    (7, "change log for live sync", [
+        {
+            "mysql": """
+            CREATE TABLE IF NOT EXISTS change_log(
+                seq BIGINT AUTO_INCREMENT PRIMARY KEY,
+                table_name VARCHAR(20) NOT NULL,
+                row_id INT NOT NULL,
+                action CHAR(1) NOT NULL,
+                changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            "sqlite": """
+            CREATE TABLE IF NOT EXISTS change_log(
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name VARCHAR(20) NOT NULL,
+                row_id INT NOT NULL,
+                action CHAR(1) NOT NULL,
+                changed_at DATETIME DEFAULT (datetime('now', 'localtime'))
+            )
+            """,
+        },
+        add_index("change_log", "idx_change_log_changed", "changed_at"),
+        change_triggers("user_info", "user_info", "user_id", ROW_CHANGES),
+        change_triggers("news", "news", "news_id", ROW_CHANGES),
+        change_triggers("news_archive", "news", "news_id", ROW_CHANGES),
+        change_triggers("user_stats", "user_info", "user_id", {"INSERT": "S", "UPDATE": "S"}),
+    ]),
+]
+
+LOCK_NAME = "news_management_migrate"
+LOCK_TIMEOUT = 30
+
+
+# ------------------- Bootstrap -------------------
+def ensure_version_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version(
+            version INT PRIMARY KEY,
+            description VARCHAR(200),
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def current_version(cursor):
+    cursor.execute("SELECT MAX(version) FROM schema_version")
+    row = cursor.fetchone()
+    return row[0] or 0
+
+
+def pending_migrations(version):
+    return [m for m in sorted(MIGRATIONS, key=lambda m: m[0]) if m[0] > version]
+
+
+# ------------------- Runner -------------------
+def run_step(cursor, backend, step):
+    if isinstance(step, dict):
+        step = step[backend.name]
+    if isinstance(step, list):
+        for part in step:
+            run_step(cursor, backend, part)
+    elif callable(step):
+        step(cursor, backend)
+    else:
+        cursor.execute(step)
+
+
+def migrate(verbose=False):
+    backend = get_backend()
+    backend.create_database()
+
+    with get_pool().connection() as db:
+        cursor = db.cursor()
+        ensure_version_table(cursor)
+
+        # Serialize concurrent app starts so each migration runs once.
+        # Connections are in autocommit mode, so every statement inside
+        # commits by itself on MySQL; SQLite commits the run as a whole.
+        with backend.migration_lock(cursor, LOCK_NAME, LOCK_TIMEOUT):
+            applied = []
+            for version, description, steps in pending_migrations(current_version(cursor)):
+                if verbose:
+                    print(f"Applying migration {version}: {description}")
+                for step in steps:
+                    run_step(cursor, backend, step)
+                cursor.execute(
+                    "INSERT INTO schema_version(version, description) VALUES (%s,%s)",
+                    (version, description)
+                )
+                applied.append(version)
+
+    return applied
+
+
+def status():
+    get_backend().create_database()
+
+    with get_pool().connection() as db:
+        cursor = db.cursor()
+        ensure_version_table(cursor)
+        version = current_version(cursor)
+
+    return version, pending_migrations(version)
+
+
+# ====================================================
+#                  COMMAND LINE
+# ====================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply database schema migrations.")
+    parser.add_argument("--status", action="store_true",
+                        help="show the current schema version and pending migrations")
+    args = parser.parse_args()
+
+    if args.status:
+        version, pending = status()
+        print(f"Schema version: {version}")
+        for v, description, _ in pending:
+            print(f"  pending {v}: {description}")
+    else:
+        applied = migrate(verbose=True)
+        if not applied:
+            print("Schema is up to date.")
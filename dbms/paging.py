@@ -0,0 +1,289 @@
+from collections import deque
+
+from repository import PAGE_SIZE
+from rowstore import RowStore
+
+MAX_PAGES = 5           # rows kept in the widget = PAGE_SIZE * MAX_PAGES
+PREFETCH_AT = 0.15      # fetch more when this close (as a fraction) to either end
+
+
+# ====================================================
+#              VIRTUALIZED (PAGED) TREEVIEW
+# ====================================================
+# Keeps a sliding window of keyset pages in a Treeview. Scrolling near the
+# bottom fetches the page after the last row, scrolling near the top fetches
+# the page before the first row, and pages falling out of the window are
+# dropped, so memory and per-fetch latency depend on the page size only.
+#
+# fetch_after(key, limit)  -> rows following key in display order (key None = first page)
+# fetch_before(key, limit) -> rows preceding key, in display order
+# key(row)                 -> keyset cursor of a row
+# render(row)              -> (iid, values) for the Treeview
+# tags(row)                -> optional Treeview tags, e.g. to find rows by author
+# columns, fields(row)     -> optional [(tree column, RowStore kind)] and the row's
+#                             values for them; makes the headings sort on click
+#
+# Sorting and filtering work on the loaded rows, in memory (rowstore.py):
+# the Treeview items are only moved or detached, never re-inserted. While
+# either is on, scrolling down loads pages only until the window is full
+# and none are dropped or loaded above, so the view stays one contiguous run.
+class PagedTreeview:
+    def __init__(self, executor, tree, fetch_after, fetch_before, key, render,
+                 tags=None, page_size=PAGE_SIZE, max_pages=MAX_PAGES, columns=None, fields=None):
+        self.executor = executor
+        self.tree = tree
+        self.fetch_after = fetch_after
+        self.fetch_before = fetch_before
+        self.key = key
+        self.render = render
+        self.tags = tags
+        self.page_size = page_size
+        self.max_pages = max_pages
+
+        self._pages = deque()       # each page: list of iids, in display order
+        self._keys = {}             # iid -> keyset cursor
+        self._at_start = True
+        self._at_end = False
+        self._loading = False
+        self._generation = 0
+        self._future = None
+
+        self.store = RowStore(columns) if columns else None
+        self.fields = fields
+        self._sort = None           # (column, descending)
+        self._filter = ""
+        self._titles = {}
+        for column, _ in columns or ():
+            self._titles[column] = tree.heading(column, "text")
+            tree.heading(column, command=lambda column=column: self.sort_by(column))
+
+        # Chain in front of the scrollbar so we see every view change
+        self._scroll_set = tree.tk.splitlist(tree.cget("yscrollcommand"))
+        tree.configure(yscrollcommand=self._on_yscroll)
+
+    # ------------------- Public -------------------
+    def set_source(self, fetch_after, fetch_before, key):
+        # Point the window at a different ordering (e.g. search results);
+        # takes effect on the next reload()
+        self.fetch_after = fetch_after
+        self.fetch_before = fetch_before
+        self.key = key
+
+    def reload(self):
+        self._generation += 1
+        if self._future is not None:
+            self._future.cancel()       # drop a superseded fetch if not started
+        self._pages.clear()
+        self._at_start = True
+        self._at_end = False
+        self._loading = False
+        self.tree.delete(*self._keys)       # includes rows hidden by a filter
+        self._keys.clear()
+        if self.store is not None:
+            self.store.clear()
+        self._load_next()
+
+    def key_of(self, iid):
+        return self._keys.get(iid)
+
+    # ------------------- Sort / filter -------------------
+    def sort_by(self, column):
+        # each click: ascending, descending, back to the database order
+        if self._sort is None or self._sort[0] != column:
+            self._sort = (column, False)
+        elif not self._sort[1]:
+            self._sort = (column, True)
+        else:
+            self._sort = None
+        for name, title in self._titles.items():
+            arrow = "" if not self._sort or self._sort[0] != name else " ▼" if self._sort[1] else " ▲"
+            self.tree.heading(name, text=title + arrow)
+        self._arrange()
+
+    def filter(self, text):
+        self._filter = text.strip()
+        self._arrange()
+
+    @property
+    def arranged(self):
+        return self._sort is not None or bool(self._filter)
+
+    def _arrange(self):
+        order = [iid for page in self._pages for iid in page]
+        if self._sort:
+            order = self.store.sort(order, *self._sort)
+        if self._filter:
+            shown = self.store.matching(self._filter)
+            for iid in order:
+                if iid not in shown:
+                    self.tree.detach(iid)
+            order = [iid for iid in order if iid in shown]
+        for index, iid in enumerate(order):
+            self.tree.move(iid, "", index)      # also re-attaches filtered-out rows
+
+    # ------------------- Single-row patches -------------------
+    # Used after local writes so one changed row costs O(1) widget work
+    # instead of a reload. Rows outside the loaded window are ignored; they
+    # are fetched with the right values when the user scrolls to them.
+    # Under a sort or filter a patched row keeps its place until the next
+    # click or filter change.
+    def add_first(self, row):
+        if self._at_start:
+            self._add(row, 0)
+
+    def add_last(self, row):
+        if self._at_end:
+            self._add(row, "end")
+
+    def update(self, row):
+        iid, values = self.render(row)
+        if not self.tree.exists(iid):
+            return
+        self.tree.item(iid, values=values, tags=self._tags_of(row))
+        self._remember(iid, row)
+
+    def set(self, iid, column, value):
+        # one cell, e.g. an author's new name on each of their rows
+        if not self.tree.exists(iid):
+            return
+        self.tree.set(iid, column, "" if value is None else value)
+        if self.store is not None and column in self.store.kinds:
+            self.store.set(iid, column, value)
+
+    def remove(self, iid):
+        if not self.tree.exists(iid):
+            return
+        self.tree.delete(iid)
+        del self._keys[iid]
+        if self.store is not None:
+            self.store.discard(iid)
+        for page in self._pages:
+            if iid in page:
+                page.remove(iid)
+                if not page:
+                    self._pages.remove(page)
+                break
+
+    def _add(self, row, index):
+        iid, values = self.render(row)
+        if self.tree.exists(iid):
+            return self.update(row)
+
+        self.tree.insert("", index, iid=iid, values=values, tags=self._tags_of(row))
+        self._remember(iid, row)
+        if not self._pages:
+            self._pages.append([iid])
+        elif index == 0:
+            self._pages[0].insert(0, iid)
+        else:
+            self._pages[-1].append(iid)
+
+    def _remember(self, iid, row):
+        self._keys[iid] = self.key(row)
+        if self.store is not None:
+            self.store.put(iid, self.fields(row))
+
+    # ------------------- Scrolling -------------------
+    def _on_yscroll(self, first, last):
+        if self._scroll_set:
+            self.tree.tk.call(*self._scroll_set, first, last)
+
+        if self._loading:
+            return
+        if float(last) >= 1.0 - PREFETCH_AT and not self._at_end and not self._full():
+            self._load_next()
+        elif float(first) <= PREFETCH_AT and not self._at_start and not self.arranged:
+            self._load_previous()
+
+    def _full(self):
+        return self.arranged and len(self._pages) >= self.max_pages
+
+    def _load_next(self):
+        after = self._keys[self._pages[-1][-1]] if self._pages else None
+        self._fetch(self.fetch_after, after, self._append)
+
+    def _load_previous(self):
+        self._fetch(self.fetch_before, self._keys[self._pages[0][0]], self._prepend)
+
+    def _fetch(self, fn, key, apply):
+        self._loading = True
+        generation = self._generation
+
+        def done(rows):
+            if generation != self._generation:
+                return          # a reload happened meanwhile
+            self._loading = False
+            apply(rows)
+
+        def failed(error):
+            if generation == self._generation:
+                self._loading = False
+            raise error
+
+        self._future = self.executor.submit(fn, key, self.page_size, on_done=done, on_error=failed)
+
+    # ------------------- Window -------------------
+    def _append(self, rows):
+        if len(rows) < self.page_size:
+            self._at_end = True
+        if not rows:
+            return
+
+        anchor = self._anchor()
+        page = self._insert(rows, "end")
+        if page:
+            self._pages.append(page)
+        if self.arranged:
+            return self._arrange()
+        if len(self._pages) > self.max_pages:
+            self._drop(self._pages.popleft())
+            self._at_start = False
+        self._restore(anchor)
+
+    def _prepend(self, rows):
+        if len(rows) < self.page_size:
+            self._at_start = True
+        if not rows:
+            return
+
+        anchor = self._anchor()
+        page = self._insert(reversed(rows), 0)
+        page.reverse()
+        if page:
+            self._pages.appendleft(page)
+        if self.arranged:
+            return self._arrange()
+        if len(self._pages) > self.max_pages:
+            self._drop(self._pages.pop())
+            self._at_end = False
+        self._restore(anchor)
+
+    def _insert(self, rows, index):
+        page = []
+        for row in rows:
+            iid, values = self.render(row)
+            if self.tree.exists(iid):
+                continue        # already shown, e.g. added locally meanwhile
+            self.tree.insert("", index, iid=iid, values=values, tags=self._tags_of(row))
+            self._remember(iid, row)
+            page.append(iid)
+        return page
+
+    def _drop(self, page):
+        self.tree.delete(*page)
+        for iid in page:
+            del self._keys[iid]
+            if self.store is not None:
+                self.store.discard(iid)
+
+    def _tags_of(self, row):
+        return self.tags(row) if self.tags else ()
+
+    def _anchor(self):
+        # top-most visible row, used to keep the view still while pages shift
+        return self.tree.identify_row(5) or None
+
+    def _restore(self, anchor):
+        if anchor and self.tree.exists(anchor):
+            total = len(self.tree.get_children())
+            self.tree.yview_moveto(self.tree.index(anchor) / total)
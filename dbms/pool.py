@@ -0,0 +1,164 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# ====================================================
+#                 CONNECTION POOL
+# ====================================================
+class ConnectionPool:
+    # factory      -> callable returning a new DB-API connection
+    # size         -> max number of open connections
+    # idle_timeout -> seconds after which an idle connection is closed
+    # check_after  -> idle seconds after which a connection is pinged
+    #                 before being handed out (warm ones are used as is)
+    # dialect      -> SQL flavour of the connections ("mysql" or "sqlite")
+    def __init__(self, factory, size=5, idle_timeout=300, check_after=30,
+                 acquire_timeout=10, dialect="mysql"):
+        self.factory = factory
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.check_after = check_after
+        self.acquire_timeout = acquire_timeout
+        self.dialect = dialect
+        self.on_acquire = None        # optional hook, called with the seconds waited
+
+        self._idle = deque()          # (conn, returned_at), newest on the right
+        self._open = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+    # ------------------- Borrow / Return -------------------
+    def acquire(self):
+        started = time.monotonic()
+        conn = self._acquire()
+        if self.on_acquire:
+            self.on_acquire(time.monotonic() - started)
+        return conn
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.acquire_timeout
+
+        while True:
+            conn = None
+            idle_for = 0
+            create = False
+
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed.")
+
+                self._close_expired()
+
+                if self._idle:
+                    # LIFO: the most recently used connection is the warmest
+                    conn, returned_at = self._idle.pop()
+                    idle_for = time.monotonic() - returned_at
+                elif self._open < self.size:
+                    self._open += 1
+                    create = True
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout("No database connection available.")
+                    self._cond.wait(remaining)
+                    continue
+
+            if create:
+                try:
+                    return self.factory()
+                except Exception:
+                    self._forget()
+                    raise
+
+            if idle_for < self.check_after or self._is_alive(conn):
+                return conn
+
+            # Stale connection: drop it and reconnect
+            self._discard(conn)
+
+    def release(self, conn, broken=False):
+        if not broken:
+            try:
+                # Never hand out a connection with a half-open transaction
+                if getattr(conn, "in_transaction", False):
+                    conn.rollback()
+            except Exception:
+                broken = True
+
+        if broken:
+            return self._discard(conn)
+
+        with self._cond:
+            if self._closed:
+                self._open -= 1
+                _close_quietly(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                # Connection died mid-call; the next borrower gets a fresh one
+                self.release(conn, broken=True)
+                raise
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                self._open -= 1
+                _close_quietly(conn)
+            self._cond.notify_all()
+
+    # ------------------- Internals -------------------
+    def _close_expired(self):
+        # Oldest connections sit on the left
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            conn, _ = self._idle.popleft()
+            self._open -= 1
+            _close_quietly(conn)
+
+    def _is_alive(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        _close_quietly(conn)
+        self._forget()
+
+    def _forget(self):
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
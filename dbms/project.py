@@ -1,106 +1,110 @@
-import mysql.connector as MyConn
+import time
+STARTED = time.perf_counter()       # time-to-first-paint counts from here
+
+import argparse
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
 
-# ------------------- Database Connection -------------------
-def connect_db():
-    # First create DB/tables if not exists
-    db = MyConn.connect(host="localhost", user="root", password="", port=3306)
-    cursor = db.cursor()
-    cursor.execute("CREATE DATABASE IF NOT EXISTS news_management")
-    cursor.execute("USE news_management")
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_info(
-            user_id INT AUTO_INCREMENT PRIMARY KEY,
-            username VARCHAR(50),
-            email VARCHAR(50),
-            age INT,
-            contact_number VARCHAR(20)
-        )
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS news(
-            news_id INT AUTO_INCREMENT PRIMARY KEY,
-            title VARCHAR(200),
-            body TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            user_id INT,
-            FOREIGN KEY (user_id) REFERENCES user_info(user_id) ON DELETE CASCADE
-        )
-    """)
-
-    db.commit()
-    db.close()
-
-    # Return connection directly to the DB
-    return MyConn.connect(host="localhost", user="root", password="", port=3306, database="news_management")
-
+from db import get_pool, close_pool
+from migrations import migrate
+from repository import (User, UserSummary, SearchHit, UserRepository, NewsRepository,
+                        PREVIEW_CHARS, summary_of)
+from worker import DbExecutor, show_db_error
+from paging import PagedTreeview
+from metrics import metrics, timed
+from livesync import ChangeFeed, SYNC_POLL_MS
+from journal import DirectWrites, WriteJournal, WRITE_BEHIND, FLUSH_MS, RETRY_MAX_MS
+from archive import delete_author, BATCH_SIZE
 
 # ------------------- Sample Users -------------------
 def insert_sample_data():
-    db = connect_db()
-    cursor = db.cursor()
+    users = UserRepository(get_pool())
 
-    cursor.execute("SELECT COUNT(*) FROM user_info")
-    if cursor.fetchone()[0] == 0:
-        users = [
+    if users.count() == 0:
+        users.add_many([
             ("Alice", "alice@example.com", 25, "0123456789"),
             ("Bob", "bob@example.com", 30, "0123456790"),
             ("Charlie", "charlie@example.com", 28, "0123456791"),
             ("David", "david@example.com", 32, "0123456792"),
             ("Eva", "eva@example.com", 27, "0123456793")
-        ]
-        cursor.executemany("""
-            INSERT INTO user_info(username,email,age,contact_number)
-            VALUES (%s,%s,%s,%s)
-        """, users)
-        db.commit()
-
-    db.close()
+        ])
 
 
 # ------------------- Sample News -------------------
 def insert_sample_news():
-    db = connect_db()
-    cursor = db.cursor()
+    news = NewsRepository(get_pool())
+    if news.count() != 0:
+        return
 
-    cursor.execute("SELECT COUNT(*) FROM news")
-    if cursor.fetchone()[0] == 0:
-        cursor.execute("SELECT user_id FROM user_info ORDER BY user_id")
-        ids = [x[0] for x in cursor.fetchall()]
+    ids = UserRepository(get_pool()).ids()
+    if not ids:
+        return
+
+    data = [
+        ("New Species Discovered",
+         "Scientists found a new species of frog deep inside the Amazon rainforest. This discovery could lead to more environmental studies.",
+         "2025-11-03 09:00:00"),
+
+        ("Breakthrough in AI Art",
+         "AI-generated illustrations are improving with advanced models, enabling highly realistic and creative outputs.",
+         "2025-11-06 12:30:00"),
+
+        ("Solar Water Purification",
+         "A solar-powered water purification device is now helping rural villages access clean drinking water.",
+         "2025-11-10 14:15:00")
+    ]
+
+    rows = []
+    for i, (t, b, d) in enumerate(data):
+        rows.append((t, b, d, ids[i % len(ids)]))
+
+    news.add_many(rows)
+
+SEARCH_DEBOUNCE_MS = 300
+DIAGNOSTICS_REFRESH_MS = 2000
+DELETE_PROGRESS_MS = 250
 
-        if not ids:
-            db.close()
-            return
 
-        data = [
-            ("New Species Discovered",
-             "Scientists found a new species of frog deep inside the Amazon rainforest. This discovery could lead to more environmental studies.",
-             "2025-11-03 09:00:00"),
+# ------------------- Row formatting -------------------
+def format_date(created):
+    return created.strftime("%Y-%m-%d %H:%M:%S") if isinstance(created, datetime) else str(created)
 
-            ("Breakthrough in AI Art",
-             "AI-generated illustrations are improving with advanced models, enabling highly realistic and creative outputs.",
-             "2025-11-06 12:30:00"),
 
-            ("Solar Water Purification",
-             "A solar-powered water purification device is now helping rural villages access clean drinking water.",
-             "2025-11-10 14:15:00")
-        ]
+def user_values(user):
+    last_posted = format_date(user.last_posted) if user.last_posted else ""
+    return (user.username, user.email, user.age, user.contact_number, user.news_count, last_posted)
 
-        rows = []
-        for i, (t, b, d) in enumerate(data):
-            rows.append((t, b, d, ids[i % len(ids)]))
 
-        cursor.executemany("""
-            INSERT INTO news(title, body, created_at, user_id)
-            VALUES (%s,%s,%s,%s)
-        """, rows)
-        db.commit()
+# Sort/filter columns of the lists (rowstore.py) and each row's values for them
+USER_LIST_COLUMNS = [("username", "text"), ("email", "text"), ("age", "int"),
+                     ("contact", "text"), ("news", "int"), ("last_posted", "time")]
+NEWS_LIST_COLUMNS = [("title", "text"), ("body", "text"), ("date", "time"), ("user", "name")]
+
+
+def user_fields(user):
+    return (user.username, user.email, user.age, user.contact_number, user.news_count, user.last_posted)
+
+
+def news_fields(news):
+    return (news.title, news.preview, news.created_at, news.username)
+
+
+def preview_of(body):
+    body = body or ""
+    return body[:PREVIEW_CHARS] + "..." if len(body) > PREVIEW_CHARS else body
+
+
+def news_key(news):
+    # keyset cursor for news pages, see NewsRepository.page
+    return (news.created_at, news.news_id)
+
+
+def author_tags(user_id):
+    # news rows are found by author through a "user<id>" tag; no tag while
+    # the author's id is not known yet (write-behind journal)
+    return (f"user{user_id}",) if user_id else ()
 
-    db.close()
 
 def create_scrollable_treeview(parent, columns, height=20):
     container = tk.Frame(parent, bg="#1e1e1e")
@@ -154,34 +158,124 @@ def create_scrollable_text(parent, width, height):
 # ====================================================
 #                 MAIN APPLICATION
 # ====================================================
+# ------------------- Startup -------------------
+# Runs on a worker thread while the window is already up
+def prepare_database(sample_data=False):
+    migrate()
+    if sample_data:
+        insert_sample_data()
+        insert_sample_news()
+
+
 class NewsApp:
-    def __init__(self, root):
+    def __init__(self, root, sample_data=False, write_behind=False):
         self.root = root
         self.root.title("📰 News Management System")
         self.root.geometry("1420x780")
         self.root.configure(bg="#1e1e1e")
 
+        self.user_repo = UserRepository(get_pool())
+        self.news_repo = NewsRepository(get_pool())
+        # Saves go straight to the database, or to the local journal first
+        if write_behind:
+            self.writes = WriteJournal(get_pool(), self.user_repo, self.news_repo)
+        else:
+            self.writes = DirectWrites(self.user_repo, self.news_repo)
+        self.user_base = None           # rows as loaded into the forms
+        self.news_base = None
+
         ttk.Style().theme_use("clam")
 
         header = tk.Label(root, text="📰 NEWS BLOG MANAGEMENT SYSTEM",
                           bg="#1e1e1e", fg="white", font=("Segoe UI", 20, "bold"))
         header.pack(pady=10)
 
+        # Busy indicator, shown while database work is in flight
+        self.busy_bar = ttk.Progressbar(root, mode="indeterminate", length=200)
+        self.db = DbExecutor(root, on_busy=self.set_busy)
+
+        # Write-behind status: changes saved locally but not yet in the database
+        self.journal_status = tk.Label(root, text="", bg="#1e1e1e", fg="#d7ba7d",
+                                       font=("Segoe UI", 10))
+        if self.writes.immediate:
+            self.journal_status.place(x=20, y=22)
+        self.flush_job = None
+        self.flushing = False
+        self.flush_delay = FLUSH_MS
+
         self.notebook = ttk.Notebook(root)
         self.notebook.pack(fill="both", expand=True)
 
         self.tab_users = tk.Frame(self.notebook, bg="#1e1e1e")
         self.tab_news = tk.Frame(self.notebook, bg="#1e1e1e")
+        self.tab_diagnostics = tk.Frame(self.notebook, bg="#1e1e1e")
         self.notebook.add(self.tab_users, text="Users")
         self.notebook.add(self.tab_news, text="News")
+        self.notebook.add(self.tab_diagnostics, text="Diagnostics")
 
         self.create_users_tab()
-        self.create_news_tab()
-
-        # Load initial data
+        self.news_pager = None          # the News tab is built when first shown
+        self.create_diagnostics_tab()
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+
+        self.feed = ChangeFeed(get_pool(), self.user_repo, self.news_repo)
+        self.deletions = {}             # user_id -> [articles deleted, articles to delete]
+        self.deletion_job = None
+
+        # Window first: the schema check, optional sample data and the
+        # initial loads all run in the background. Anything the user starts
+        # meanwhile is held until the schema is ready.
+        self.ready = False
+        self.tab_users.bind("<Map>", self.on_first_map)
+        self.db.submit(prepare_database, sample_data, on_done=self.database_ready,
+                       on_error=self.database_failed)
+        self.db.hold()
+
+    def on_first_map(self, event):
+        self.tab_users.unbind("<Map>")
+        # idle callbacks run once Tk has drawn the newly mapped window
+        self.root.after_idle(self.first_paint)
+
+    def first_paint(self):
+        seconds = time.perf_counter() - STARTED
+        metrics.record("startup", "first_paint", seconds)
+        print(f"First paint after {seconds * 1000:.0f} ms")
+
+    def database_ready(self, _):
+        metrics.record("startup", "database_ready", time.perf_counter() - STARTED)
+        self.ready = True
+        self.db.release()
+        # Follow other clients' edits from the current end of the change log
+        self.db.submit(self.feed.start, quiet=True, on_done=lambda _: self.schedule_sync())
         self.load_users()
-        self.load_news()
-        self.load_user_combo()
+        if self.news_pager:
+            self.load_news()
+        # changes left in the journal by the last session
+        if self.writes.immediate:
+            self.show_pending()
+            self.schedule_flush(0)
+
+    def database_failed(self, error):
+        # held work runs (and reports its own errors) rather than waiting forever
+        self.db.release()
+        show_db_error(error)
+
+    def on_tab_changed(self, event):
+        if self.notebook.select() == str(self.tab_news) and self.news_pager is None:
+            self.create_news_tab()
+            if self.ready:
+                self.load_news()
+        self.refresh_diagnostics()
+
+    def set_busy(self, busy):
+        if busy:
+            self.busy_bar.place(relx=1.0, x=-20, y=22, anchor="ne")
+            self.busy_bar.start(15)
+            self.root.config(cursor="watch")
+        else:
+            self.busy_bar.stop()
+            self.busy_bar.place_forget()
+            self.root.config(cursor="")
 
     # ====================================================
     #                  USERS TAB
@@ -251,23 +345,45 @@ class NewsApp:
         )
         table_frame.place(x=400, y=20, width=1000, height=720)
 
+        # Quick filter over the loaded rows: in memory, no query
+        filter_bar = tk.Frame(table_frame, bg="#1e1e1e")
+        filter_bar.pack(fill="x", padx=5, pady=5)
+        tk.Label(filter_bar, text="Filter:", bg="#1e1e1e", fg="white").pack(side="left")
+        self.u_filter_var = tk.StringVar()
+        tk.Entry(filter_bar, textvariable=self.u_filter_var, bg="#2b2b2b", fg="white",
+                 insertbackground="white").pack(side="left", fill="x", expand=True, padx=5)
+        self.u_filter_var.trace_add("write", lambda *args: self.user_pager.filter(self.u_filter_var.get()))
+
         self.user_list = create_scrollable_treeview(
             table_frame,
-            columns=("username", "email", "age", "contact"),
+            columns=("username", "email", "age", "contact", "news", "last_posted"),
             height=28
         )
 
         for col, title, w in [
-            ("username", "Username", 200),
-            ("email", "Email", 250),
-            ("age", "Age", 80),
-            ("contact", "Contact", 150),
+            ("username", "Username", 180),
+            ("email", "Email", 230),
+            ("age", "Age", 60),
+            ("contact", "Contact", 130),
+            ("news", "News", 70),
+            ("last_posted", "Last Posted", 160),
         ]:
             self.user_list.heading(col, text=title)
             self.user_list.column(col, width=w)
 
         self.user_list.bind("<<TreeviewSelect>>", self.on_user_select)
 
+        self.user_pager = PagedTreeview(
+            self.db, self.user_list,
+            fetch_after=self.user_repo.page,
+            fetch_before=self.user_repo.page_before,
+            key=lambda user: (user.user_id,),
+            # store user_id as iid (hidden)
+            render=lambda user: (str(user.user_id), user_values(user)),
+            # headings sort the loaded rows
+            columns=USER_LIST_COLUMNS, fields=user_fields
+        )
+
         # Build hidden panel for user news
         self.create_user_news_panel(frame)
 
@@ -331,7 +447,18 @@ class NewsApp:
         # On click show full content
         self.user_news_list.bind("<<TreeviewSelect>>", self.show_full_news)
 
+        self.panel_user_id = None
+        self.user_news_pager = PagedTreeview(
+            self.db, self.user_news_list,
+            fetch_after=lambda key, limit: self.news_repo.page(key, limit, self.panel_user_id),
+            fetch_before=lambda key, limit: self.news_repo.page_before(key, limit, self.panel_user_id),
+            key=news_key,
+            render=lambda news: (str(news.news_id),
+                                 (news.title, preview_of(news.preview), format_date(news.created_at)))
+        )
+
 
+    @timed
     def show_user_news_panel(self):
         selected = self.user_list.selection()
         if not selected:
@@ -343,42 +470,13 @@ class NewsApp:
         except ValueError:
             return messagebox.showerror("Error", "Invalid user selection.")
 
-        # FETCH NEWS
-        db = connect_db()
-        cursor = db.cursor()
-
-        cursor.execute("""
-            SELECT news_id, title, body, created_at
-            FROM news
-            WHERE user_id=%s
-            ORDER BY created_at DESC
-        """, (user_id,))
-        rows = cursor.fetchall()
-
-        # FETCH USERNAME
-        cursor.execute("SELECT username FROM user_info WHERE user_id=%s", (user_id,))
-        username_row = cursor.fetchone()
-        username = username_row[0] if username_row else "User"
-
-        db.close()
-
-        # Update label
-        self.user_news_label.config(text=f"News posted by {username}")
-
-        # Clear old rows
-        for item in self.user_news_list.get_children():
-            self.user_news_list.delete(item)
-
-        # Insert data
-        for news_id, title, body, created_at in rows:
-            preview = (body[:150] + "...") if len(body) > 150 else body
-            created_str = created_at.strftime("%Y-%m-%d %H:%M:%S")
-
-            self.user_news_list.insert(
-                "", "end",
-                values=(title, preview, created_str),
-                iid=str(news_id)
-            )
+        # Update label once the name is known; rows page in as they arrive
+        self.user_news_label.config(text="News posted by ...")
+        self.db.submit(self.user_repo.get, user_id, on_done=lambda user: self.user_news_label.config(
+            text=f"News posted by {user.username if user else 'User'}"))
+
+        self.panel_user_id = user_id
+        self.user_news_pager.reload()
 
         # Clear full viewer
         self.full_news_view.delete("1.0", tk.END)
@@ -389,6 +487,7 @@ class NewsApp:
     def hide_user_news_panel(self):
         self.user_news_panel.place_forget()
 
+    @timed
     def show_full_news(self, event):
         selection = self.user_news_list.selection()
         if not selection:
@@ -400,28 +499,24 @@ class NewsApp:
             return
 
         # Retrieve full news
-        db = connect_db()
-        cursor = db.cursor()
-        cursor.execute(
-            "SELECT title, body, created_at FROM news WHERE news_id=%s",(news_id,)
-        )
-        row = cursor.fetchone()
-        db.close()
+        self.db.submit(self.news_repo.get, news_id, on_done=self._fill_full_news)
 
-        if not row:
+    def _fill_full_news(self, news):
+        # Ignore late results for a row that is no longer selected
+        if not news or self.user_news_list.selection() != (str(news.news_id),):
             return
 
-        title, body, created_at = row
-        created_str = created_at.strftime("%Y-%m-%d %H:%M:%S")
+        created_str = format_date(news.created_at)
 
         # Display full news
         self.full_news_view.delete("1.0", tk.END)
         self.full_news_view.insert(
             tk.END,
-            f"Title: {title}\nDate: {created_str}\n\n{body}"
+            f"Title: {news.title}\nDate: {created_str}\n\n{news.body}"
         )
 
     # ---------------------- User CRUD ----------------------
+    @timed
     def add_user(self):
         username = self.u_username.get().strip()
         if not username:
@@ -432,24 +527,66 @@ class NewsApp:
         except:
             return messagebox.showwarning("Invalid", "Age must be a number.")
 
-        db = connect_db()
-        cursor = db.cursor()
-        cursor.execute("""
-            INSERT INTO user_info(username,email,age,contact_number)
-            VALUES (%s,%s,%s,%s)
-        """, (username, self.u_email.get().strip(), age, self.u_contact.get().strip()))
-        db.commit()
-        db.close()
+        user = User(None, username, self.u_email.get().strip(), age, self.u_contact.get().strip())
+        self.write(self.writes.add_user, *user[1:],
+                   on_done=lambda user_id: self._user_added(
+                       UserSummary(user_id, *user[1:], news_count=0, last_posted=None)))
+
+    # Local writes patch just the affected rows instead of reloading
+    def _user_added(self, user):
+        self.user_pager.add_last(user)
+        self._after_user_write("User added.")
+
+    def _user_updated(self, user):
+        if isinstance(user, UserSummary):
+            self.user_pager.update(user)
+        else:
+            # queued in the journal: the statistics columns are unchanged
+            for column, value in zip(("username", "email", "age", "contact"), user[1:]):
+                self.user_pager.set(str(user.user_id), column, value)
+        self.rename_author(user)
+        self._after_user_write("User updated.")
+
+    def rename_author(self, user):
+        if self.news_pager is None:
+            return
+        for iid in self.news_list.tag_has(f"user{user.user_id}"):
+            self.news_pager.set(iid, "user", user.username)
+
+    def refresh_author_stats(self, *user_ids):
+        # News writes change their authors' counts (kept by the user_stats
+        # triggers); re-read just those rows if they are on screen
+        for user_id in set(user_ids):
+            if user_id is not None and self.user_list.exists(str(user_id)):
+                self.db.submit(self.user_repo.summary, user_id, on_done=self._author_refreshed)
+
+    def _author_refreshed(self, user):
+        if user is not None:
+            self.user_pager.update(user)
+
+    def _user_deleted(self, user_id):
+        self.remove_user_rows(user_id)
+        self._after_user_write("User deleted.")
+
+    def remove_user_rows(self, user_id):
+        self.user_pager.remove(str(user_id))
+        if self.news_pager is None:
+            return
+        # their news went with them (ON DELETE CASCADE)
+        for iid in self.news_list.tag_has(f"user{user_id}"):
+            self.news_pager.remove(iid)
 
+    def _after_user_write(self, message):
         self.clear_user_form()
-        self.load_users()
-        self.load_user_combo()
-        messagebox.showinfo("Success", "User added.")
+        messagebox.showinfo("Success", message)
 
+    @timed
     def update_user(self):
         selected = self.user_list.selection()
         if not selected:
             return messagebox.showwarning("Select", "Select a user.")
+        if len(selected) > 1:
+            return messagebox.showwarning("Select", "Select a single user to update.")
 
         selected_iid = selected[0]
         try:
@@ -462,25 +599,18 @@ class NewsApp:
         except:
             return messagebox.showwarning("Invalid", "Age must be a number.")
 
-        db = connect_db()
-        cursor = db.cursor()
-        cursor.execute("""
-            UPDATE user_info SET username=%s,email=%s,age=%s,contact_number=%s
-            WHERE user_id=%s
-        """, (self.u_username.get().strip(), self.u_email.get().strip(),
-              age, self.u_contact.get().strip(), user_id))
-        db.commit()
-        db.close()
-
-        self.clear_user_form()
-        self.load_users()
-        self.load_user_combo()
-        messagebox.showinfo("Success", "User updated.")
+        user = User(user_id, self.u_username.get().strip(), self.u_email.get().strip(),
+                    age, self.u_contact.get().strip())
+        self.write(self.writes.update_user, user, self.base_of(self.user_base, user_id),
+                   on_done=self._user_updated)
 
+    @timed
     def delete_user(self):
         selected = self.user_list.selection()
         if not selected:
             return messagebox.showwarning("Select", "Select a user.")
+        if len(selected) > 1:
+            return self.delete_users(selected)
 
         selected_iid = selected[0]
         try:
@@ -488,34 +618,97 @@ class NewsApp:
         except:
             return messagebox.showerror("Error", "Invalid user selection.")
 
+        if user_id in self.deletions:
+            return messagebox.showinfo("Delete", "This user is already being deleted.")
         if not messagebox.askyesno("Confirm", "Delete this user?"):
             return
 
-        db = connect_db()
-        cursor = db.cursor()
-        cursor.execute("DELETE FROM user_info WHERE user_id=%s", (user_id,))
-        db.commit()
-        db.close()
+        # prolific authors are deleted in batches, in the background
+        articles = self.articles_of(selected_iid)
+        if articles > BATCH_SIZE:
+            return self.start_author_deletion(user_id, articles)
 
-        self.clear_user_form()
-        self.load_users()
-        self.load_user_combo()
-        messagebox.showinfo("Success", "User deleted.")
+        self.write(self.writes.delete_user, user_id, self.base_of(self.user_base, user_id),
+                   on_done=lambda _: self._user_deleted(user_id))
 
+    def delete_users(self, selected):
+        # Prolific authors go through the batched background deletion, as
+        # when deleted alone; the rest in one transaction, then one pass
+        # over the lists
+        selected = [iid for iid in selected if int(iid) not in self.deletions]
+        if not selected:
+            return messagebox.showinfo("Delete", "These users are already being deleted.")
+        if not messagebox.askyesno("Confirm", f"Delete {len(selected)} users and all their news?"):
+            return
+
+        user_ids = []
+        for iid in selected:
+            articles = self.articles_of(iid)
+            if articles > BATCH_SIZE:
+                self.start_author_deletion(int(iid), articles)
+            else:
+                user_ids.append(int(iid))
+        if user_ids:
+            self.write(self.writes.delete_many_users, user_ids,
+                       on_done=lambda _: self._users_deleted(user_ids))
+
+    def articles_of(self, iid):
+        # the news count shown in the users list ("deleting ..." while a
+        # batched deletion runs)
+        count = str(self.user_list.set(iid, "news"))
+        return int(count) if count.isdigit() else 0
+
+    def _users_deleted(self, user_ids):
+        for user_id in user_ids:
+            self.remove_user_rows(user_id)
+        self._after_user_write(f"{len(user_ids)} users deleted.")
+
+    # ------------------- Deleting a prolific author -------------------
+    # archive.delete_author removes the articles one short transaction per
+    # batch, so other editors are not blocked; the user's row shows the
+    # progress until the user itself is deleted. This goes straight to the
+    # database in write-behind mode too: a journal flush is one transaction
+    # per batch of operations, which is the long cascade this avoids. Queued
+    # journal edits of the author then report a conflict when flushed.
+    def start_author_deletion(self, user_id, articles):
+        progress = self.deletions[user_id] = [0, articles]
+
+        def report(done):
+            progress[0] = done          # worker thread: no widgets here
+
+        self.db.submit(self._delete_author, user_id, report, quiet=True,
+                       on_done=lambda count: self._author_deleted(user_id, count),
+                       on_error=lambda error: self._author_deletion_failed(user_id, error))
+        self.clear_user_form()
+        if self.deletion_job is None:
+            self.show_deletions()
+
+    def _delete_author(self, user_id, report):
+        count = delete_author(user_id, on_batch=report)
+        self.user_repo.invalidate(user_id)
+        return count
+
+    def show_deletions(self):
+        for user_id, (done, total) in self.deletions.items():
+            if self.user_list.exists(str(user_id)):
+                self.user_list.set(str(user_id), "news", f"deleting {done}/{total}")
+        self.deletion_job = self.root.after(DELETE_PROGRESS_MS, self.show_deletions) \
+            if self.deletions else None
+
+    def _author_deleted(self, user_id, count):
+        del self.deletions[user_id]
+        self.remove_user_rows(user_id)
+        messagebox.showinfo("Success", f"User deleted, with {count} articles.")
+
+    def _author_deletion_failed(self, user_id, error):
+        # what was deleted stays deleted; show the remaining count again
+        del self.deletions[user_id]
+        self.refresh_author_stats(user_id)
+        show_db_error(error)
+
+    @timed
     def load_users(self):
-        for i in self.user_list.get_children():
-            self.user_list.delete(i)
-
-        db = connect_db()
-        cursor = db.cursor()
-        cursor.execute("SELECT user_id, username, email, age, contact_number FROM user_info")
-        for row in cursor.fetchall():
-            # row = (user_id, username, email, age, contact_number)
-            user_id = row[0]
-            values = (row[1], row[2], row[3], row[4])
-            # store user_id as iid (hidden)
-            self.user_list.insert("", "end", values=values, iid=str(user_id))
-        db.close()
+        self.user_pager.reload()
 
     def clear_user_form(self):
         self.u_username.delete(0, tk.END)
@@ -523,10 +716,16 @@ class NewsApp:
         self.u_age.delete(0, tk.END)
         self.u_contact.delete(0, tk.END)
 
+    @timed
     def on_user_select(self, event):
         selected = self.user_list.selection()
         if not selected:
             return
+        if len(selected) > 1:
+            # a selection can be deleted together, but only edited one by one
+            self.btn_u_update.config(state="disabled")
+            self.btn_u_delete.config(state="normal")
+            return
 
         selected_iid = selected[0]
         try:
@@ -535,16 +734,15 @@ class NewsApp:
             return
 
         # fetch the full user record from DB (safer than relying on values)
-        db = connect_db()
-        cursor = db.cursor()
-        cursor.execute("SELECT username, email, age, contact_number FROM user_info WHERE user_id=%s", (user_id,))
-        row = cursor.fetchone()
-        db.close()
+        self.db.submit(self.user_repo.get, user_id, on_done=self._fill_user_form)
 
-        if not row:
+    def _fill_user_form(self, user):
+        # Ignore late results for a row that is no longer selected
+        if not user or self.user_list.selection() != (str(user.user_id),):
             return
 
-        username, email, age, contact = row
+        self.user_base = user
+        _, username, email, age, contact = self.writes.latest(user)
         self.u_username.delete(0, tk.END)
         self.u_username.insert(0, username)
         self.u_email.delete(0, tk.END)
@@ -574,8 +772,11 @@ class NewsApp:
         self.n_title.place(x=80, y=20)
 
         tk.Label(form, text="Author:", bg="#1e1e1e", fg="white").place(x=850, y=20)
-        self.n_author = ttk.Combobox(form, width=30, state="readonly")
+        # Type-ahead: matches for the typed prefix are fetched as you type
+        self.n_author = ttk.Combobox(form, width=30)
         self.n_author.place(x=920, y=20)
+        self.n_author.bind("<KeyRelease>", self.on_author_typed)
+        self.author_job = None
 
         tk.Label(form, text="Body:", bg="#1e1e1e", fg="white").place(x=20, y=70)
         self.n_body = tk.Text(form, width=160, height=6, bg="#2b2b2b", fg="white")
@@ -589,18 +790,32 @@ class NewsApp:
                   command=self.delete_news).place(x=450, y=180)
         tk.Button(form, text="Clean Form", bg="#555", fg="white", width=12,
                   command=self.clear_news_form).place(x=550, y=180)
+        # moves every selected article to the author above
+        tk.Button(form, text="Set Author", bg="#333", fg="white", width=12,
+                  command=self.move_news).place(x=650, y=180)
     
 
         # NEWS TABLE (ID hidden; stored in iid)
         table_frame = tk.LabelFrame(frame, text="All News", bg="#1e1e1e", fg="white",font=("Arial", 12, "bold"))
         table_frame.place(x=20, y=270, width=900, height=480)
-        self.news_list = ttk.Treeview(
+
+        # SEARCH BOX (search-as-you-type over title and body)
+        search_bar = tk.Frame(table_frame, bg="#1e1e1e")
+        search_bar.pack(fill="x", padx=5, pady=5)
+        tk.Label(search_bar, text="Search:", bg="#1e1e1e", fg="white").pack(side="left")
+        self.n_search_var = tk.StringVar()
+        self.n_search = tk.Entry(search_bar, textvariable=self.n_search_var,
+                                 bg="#2b2b2b", fg="white", insertbackground="white")
+        self.n_search.pack(side="left", fill="x", expand=True, padx=5)
+        self.n_search_var.trace_add("write", self.on_search_changed)
+        self.search_job = None
+        self.search_text = ""
+
+        self.news_list = create_scrollable_treeview(
             table_frame,
             columns=("title", "body", "date", "user"),
-            show="headings",
             height=20
         )
-        self.news_list.pack(fill="both", expand=True)
 
         names = ["Title", "Body Preview", "Created", "User"]
         for col, label, w in zip(("title", "body", "date", "user"),names,(220, 350, 150, 120)):
@@ -609,6 +824,19 @@ class NewsApp:
 
         self.news_list.bind("<<TreeviewSelect>>", self.on_news_select)
 
+        self.news_pager = PagedTreeview(
+            self.db, self.news_list,
+            fetch_after=self.news_repo.page,
+            fetch_before=self.news_repo.page_before,
+            key=news_key,
+            tags=lambda news: author_tags(news.user_id),
+            # store news_id in iid (hidden)
+            render=lambda news: (str(news.news_id),
+                                 (news.title, preview_of(news.preview),
+                                  format_date(news.created_at), news.username or "")),
+            columns=NEWS_LIST_COLUMNS, fields=news_fields
+        )
+
         # NEWS PREVIEW PANEL (right side)
         preview_frame = tk.LabelFrame(frame, text="Full News Preview", bg="#433A3A",
                                       fg="white", font=("Segoe UI",12))
@@ -617,9 +845,10 @@ class NewsApp:
         self.full_preview = tk.Text(preview_frame, bg="#2C2B2B", fg="white", wrap="word", font=("Segoe UI",10))
         self.full_preview.pack(fill="both", expand=True)
 
+    @timed
     def on_news_select(self, event):
         selected = self.news_list.selection()
-        if not selected:
+        if len(selected) != 1:
             return
 
         news_iid = selected[0]
@@ -629,22 +858,17 @@ class NewsApp:
             return
 
         # fetch full content from DB
-        db = connect_db()
-        cursor = db.cursor()
-        cursor.execute("""
-            SELECT news.title, news.body, news.created_at,user_info.username
-            FROM news
-            LEFT JOIN user_info ON news.user_id = user_info.user_id
-            WHERE news_id=%s
-        """, (news_id,))
-        row = cursor.fetchone()
-        db.close()
-
-        if not row:
+        self.db.submit(self.news_repo.get, news_id, on_done=self._fill_news_form)
+
+    def _fill_news_form(self, news):
+        # Ignore late results for a row that is no longer selected
+        if not news or self.news_list.selection() != (str(news.news_id),):
             return
 
-        title, body, created,username = row
-        created_str = created.strftime("%Y-%m-%d %H:%M:%S") if isinstance(created, datetime) else str(created)
+        self.news_base = news
+        news = self.writes.latest(news)
+        title, body, created, username = news.title, news.body, news.created_at, news.username
+        created_str = format_date(created)
         username = username if username else "Unknown"
         self.full_preview.delete("1.0", tk.END)
         self.full_preview.insert(tk.END, f"Author :{username}\nTitle: {title}\nCreated At: {created_str}\n\n{body}")
@@ -654,22 +878,39 @@ class NewsApp:
         self.n_title.insert(0, title)
         self.n_body.delete("1.0", tk.END)
         self.n_body.insert("1.0", body)
-        self.n_author.set(username)
-
-        # get author username
-        db = connect_db()
-        cursor = db.cursor()
-        cursor.execute("""
-            SELECT user_info.username
-            FROM news LEFT JOIN user_info ON news.user_id = user_info.user_id
-            WHERE news.news_id=%s
-        """, (news_id,))
-        ur = cursor.fetchone()
-        db.close()
-        username = ur[0] if ur and ur[0] else ""
-        self.n_author.set(username)
+        # author comes from the same row; "Unknown" is display-only
+        self.n_author.set(news.username or "")
+        self.user_repo.remember_author(news.username, news.user_id)
+
+    # --------------------- News Search ---------------------
+    def on_search_changed(self, *args):
+        # debounce: only search once typing pauses
+        if self.search_job:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(SEARCH_DEBOUNCE_MS, self.run_search)
+
+    @timed
+    def run_search(self):
+        self.search_job = None
+        text = self.n_search_var.get().strip()
+        if text == self.search_text:
+            return
+        self.search_text = text
+
+        if text:
+            self.news_pager.set_source(
+                fetch_after=lambda key, limit: self.news_repo.search_page(text, key, limit),
+                fetch_before=lambda key, limit: self.news_repo.search_page_before(text, key, limit),
+                key=lambda hit: (hit.position,)
+            )
+        else:
+            self.news_pager.set_source(self.news_repo.page, self.news_repo.page_before, news_key)
+
+        # reload() cancels or discards the fetch of any older search
+        self.news_pager.reload()
 
     # --------------------- News CRUD ---------------------
+    @timed
     def add_news(self):
         title = self.n_title.get().strip()
         author = self.n_author.get().strip()
@@ -678,30 +919,16 @@ class NewsApp:
         if not title or not author or not body:
             return messagebox.showwarning("Input", "Fill all fields.")
 
-        db = connect_db()
-        cursor = db.cursor()
-
-        cursor.execute("SELECT user_id FROM user_info WHERE username=%s", (author,))
-        user = cursor.fetchone()
-        if not user:
-            db.close()
-            return messagebox.showerror("Error", "Author not found.")
-
-        cursor.execute("""
-            INSERT INTO news(title,body,user_id)
-            VALUES (%s,%s,%s)
-        """, (title, body, user[0]))
-        db.commit()
-        db.close()
-
-        self.clear_news_form()
-        self.load_news()
-        messagebox.showinfo("Success", "News added.")
+        self.write(self.writes.save_news, None, title, body, author,
+                   on_done=lambda news: self._news_saved(news, "News added."))
 
+    @timed
     def update_news(self):
         selected = self.news_list.selection()
         if not selected:
             return messagebox.showwarning("Select", "Select news.")
+        if len(selected) > 1:
+            return messagebox.showwarning("Select", "Select a single article to update.")
 
         selected_iid = selected[0]
         try:
@@ -716,35 +943,51 @@ class NewsApp:
         if not title or not author or not body:
             return messagebox.showwarning("Input", "Fill all fields.")
 
-        db = connect_db()
-        cursor = db.cursor()
+        old_author = self.author_of(selected_iid)
+        self.write(self.writes.save_news, news_id, title, body, author,
+                   self.base_of(self.news_base, news_id),
+                   on_done=lambda news: self._news_saved(news, "News updated.", old_author))
 
-        # get user_id of author
-        cursor.execute("SELECT user_id FROM user_info WHERE username=%s", (author,))
-        user = cursor.fetchone()
-        if not user:
-            db.close()
+    def _news_saved(self, news, message, old_author=None):
+        if news is None:
             return messagebox.showerror("Error", "Author not found.")
 
-        user_id = user[0]
-
-        # 🔥 Correct SQL UPDATE statement
-        cursor.execute("""
-            UPDATE news 
-            SET title=%s, body=%s, user_id=%s 
-            WHERE news_id=%s
-        """, (title, body, user_id, news_id))
-        db.commit()
-        db.close()
+        self.show_news_row(summary_of(news))
+        self.refresh_author_stats(news.user_id, old_author)
+        self._after_news_write(message)
+
+    def show_news_row(self, row, inserted=True):
+        iid = str(row.news_id)
+        if self.news_list.exists(iid):
+            if self.search_text:
+                # keep the row's rank so paging through results still works
+                row = SearchHit(*row, self.news_pager.key_of(iid)[0])
+            self.news_pager.update(row)
+        elif inserted and not self.search_text:
+            # new rows go on top only if they are the newest (imports can be backdated)
+            top = self.news_list.get_children()[:1]
+            if not top or news_key(row) >= self.news_pager.key_of(top[0]):
+                self.news_pager.add_first(row)
+
+    def author_of(self, iid):
+        # user_id from the row's "user<id>" tag (negative while only in the
+        # journal); None if the row has no such tag
+        for tag in map(str, self.news_list.item(iid, "tags")):
+            if tag.startswith("user") and tag[4:].lstrip("-").isdigit():
+                return int(tag[4:])
+        return None
+
+    def _after_news_write(self, message):
         self.clear_news_form()
-        self.load_news()
-        messagebox.showinfo("Success", "News updated.")
+        messagebox.showinfo("Success", message)
 
-    
+    @timed
     def delete_news(self):
         selected = self.news_list.selection()
         if not selected:
             return messagebox.showwarning("Select", "Select news.")
+        if len(selected) > 1:
+            return self.delete_many_news(selected)
 
         selected_iid = selected[0]
         try:
@@ -755,64 +998,296 @@ class NewsApp:
         if not messagebox.askyesno("Confirm", "Delete this news?"):
             return
 
-        db = connect_db()
-        cursor = db.cursor()
-        cursor.execute("DELETE FROM news WHERE news_id=%s", (news_id,))
-        db.commit()
-        db.close()
+        author = self.author_of(selected_iid)
+        self.write(self.writes.delete_news, news_id, self.base_of(self.news_base, news_id),
+                   on_done=lambda _: self._news_deleted(selected_iid, author))
+
+    def _news_deleted(self, iid, author):
+        self.news_pager.remove(iid)
+        self.refresh_author_stats(author)
+        self._after_news_write("News deleted.")
+
+    # ------------------- Selections -------------------
+    # One transaction per selection (set-based IN (...) statements), then
+    # the affected rows are patched in place
+    def delete_many_news(self, selected):
+        news_ids = [int(iid) for iid in selected]
+        if not messagebox.askyesno("Confirm", f"Delete {len(news_ids)} articles?"):
+            return
 
-        self.clear_news_form()
-        self.load_news()
-        messagebox.showinfo("Success", "News deleted.")
+        authors = {self.author_of(iid) for iid in selected}
+        self.write(self.writes.delete_many_news, news_ids,
+                   on_done=lambda _: self._many_news_deleted(selected, authors))
 
-    def load_news(self):
-        for i in self.news_list.get_children():
-            self.news_list.delete(i)
-
-        db = connect_db()
-        cursor = db.cursor()
-        cursor.execute("""
-            SELECT news.news_id, news.title, news.body, news.created_at, user_info.username
-            FROM news LEFT JOIN user_info
-            ON news.user_id = user_info.user_id
-            ORDER BY created_at DESC
-        """)
-
-        for row in cursor.fetchall():
-            # row = (news_id, title, body, created_at, username)
-            news_id = row[0]
-            title = row[1]
-            body = row[2] or ""
-            created = row[3]
-            username = row[4] or ""
-            preview = body[:150] + "..." if len(body) > 150 else body
-            created_str = created.strftime("%Y-%m-%d %H:%M:%S") if isinstance(created, datetime) else str(created)
+    def _many_news_deleted(self, iids, authors):
+        for iid in iids:
+            self.news_pager.remove(iid)
+        self.refresh_author_stats(*authors)
+        self._after_news_write(f"{len(iids)} articles deleted.")
 
-            # store news_id in iid (hidden)
-            self.news_list.insert("", "end", values=(title, preview, created_str, username), iid=str(news_id))
+    @timed
+    def move_news(self):
+        selected = self.news_list.selection()
+        if not selected:
+            return messagebox.showwarning("Select", "Select news.")
+        author = self.n_author.get().strip()
+        if not author:
+            return messagebox.showwarning("Input", "Enter the new author.")
 
-        db.close()
+        news_ids = [int(iid) for iid in selected]
+        old_authors = {self.author_of(iid) for iid in selected}
+        self.write(self.writes.move_news, news_ids, author,
+                   on_done=lambda user_id: self._news_moved(selected, author, user_id, old_authors))
+
+    def _news_moved(self, iids, author, user_id, old_authors):
+        if user_id is None:
+            return messagebox.showerror("Error", "Author not found.")
+
+        # only the author changed; the rows keep their place in the list
+        for iid in iids:
+            if self.news_list.exists(iid):
+                self.news_pager.set(iid, "user", author)
+                self.news_list.item(iid, tags=author_tags(user_id))
+        self.refresh_author_stats(user_id, *old_authors)
+        self._after_news_write(f"{len(iids)} articles moved to {author}.")
+
+    @timed
+    def load_news(self):
+        self.news_pager.reload()
 
     def clear_news_form(self):
         self.n_title.delete(0, tk.END)
         self.n_body.delete("1.0", tk.END)
         self.n_author.set("")
 
-    def load_user_combo(self):
-        db = connect_db()
-        cursor = db.cursor()
-        cursor.execute("SELECT username FROM user_info ORDER BY username ASC")
-        users = [x[0] for x in cursor.fetchall()]
-        self.n_author["values"] = users
-        db.close()
+    def on_author_typed(self, event):
+        if event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+            return
+        if self.author_job:
+            self.root.after_cancel(self.author_job)
+        self.author_job = self.root.after(SEARCH_DEBOUNCE_MS, self.load_author_matches)
+
+    @timed
+    def load_author_matches(self):
+        self.author_job = None
+        prefix = self.n_author.get().strip()
+
+        def show(names):
+            # drop answers for a prefix the user has typed past
+            if self.n_author.get().strip() == prefix:
+                self.n_author["values"] = names
+
+        self.db.submit(self.user_repo.match_names, prefix, on_done=show)
+
+    # ====================================================
+    #                  DIAGNOSTICS TAB
+    # ====================================================
+    def create_diagnostics_tab(self):
+        frame = tk.Frame(self.tab_diagnostics, bg="#1e1e1e")
+        frame.pack(fill="both", expand=True, padx=15, pady=15)
+
+        bar = tk.Frame(frame, bg="#1e1e1e")
+        bar.pack(fill="x")
+        for text, command in [("Refresh", self.refresh_diagnostics),
+                              ("Reset", self.reset_diagnostics),
+                              ("Export...", self.export_diagnostics)]:
+            tk.Button(bar, text=text, bg="#575843", fg="white", width=10,
+                      font=("Segoe UI", 11), command=command).pack(side="left", padx=(0, 10))
+
+        self.diag_summary = tk.Label(bar, text="", bg="#1e1e1e", fg="white",
+                                     font=("Segoe UI", 10), justify="left")
+        self.diag_summary.pack(side="left", padx=10)
+
+        # Statements, pool acquires and UI actions, slowest in total first
+        table_frame = tk.LabelFrame(frame, text="Timings", bg="#1e1e1e", fg="white",
+                                    font=("Segoe UI", 14, "bold"))
+        table_frame.pack(fill="both", expand=True, pady=10)
+
+        columns = [("kind", "Kind", 50), ("name", "Statement / Action", 330),
+                   ("count", "Count", 70), ("mean", "Mean ms", 80), ("p50", "p50 ms", 80),
+                   ("p95", "p95 ms", 80), ("max", "Max ms", 80), ("total", "Total ms", 90),
+                   ("rows", "Rows", 90), ("bytes", "Bytes", 100), ("errors", "Errors", 60)]
+        self.diag_list = create_scrollable_treeview(table_frame, columns=[c[0] for c in columns], height=16)
+        for col, title, w in columns:
+            self.diag_list.heading(col, text=title)
+            self.diag_list.column(col, width=w, anchor="w" if col in ("kind", "name") else "e")
+
+        slow_frame = tk.LabelFrame(frame, text=f"Slow Queries (>= {metrics.slow_ms:g} ms)",
+                                   bg="#1e1e1e", fg="white", font=("Segoe UI", 14, "bold"))
+        slow_frame.pack(fill="x")
+        self.diag_slow = create_scrollable_text(slow_frame, width=150, height=8)
+
+        self.diag_job = None
+
+    def refresh_diagnostics(self):
+        # Refreshes itself while the tab is open; in-memory only, no DB work
+        if self.diag_job:
+            self.root.after_cancel(self.diag_job)
+            self.diag_job = None
+        if self.notebook.select() != str(self.tab_diagnostics):
+            return
+
+        snapshot = metrics.snapshot()
+        order = {"startup": 0, "ui": 1, "sql": 2, "pool": 3}
+        stats = sorted(snapshot["stats"], key=lambda r: (order.get(r["kind"], 4), -r["total_ms"]))
+
+        self.diag_list.delete(*self.diag_list.get_children())
+        for r in stats:
+            self.diag_list.insert("", "end", values=(
+                r["kind"], r["name"], r["count"], f"{r['mean_ms']:.2f}", f"{r['p50_ms']:.2f}",
+                f"{r['p95_ms']:.2f}", f"{r['max_ms']:.2f}", f"{r['total_ms']:.0f}",
+                r["rows"], r["bytes"], r["errors"]))
+
+        self.diag_slow.delete("1.0", tk.END)
+        for q in reversed(snapshot["slow_queries"]):
+            self.diag_slow.insert(tk.END, f"{q['time']}  {q['ms']:>8.1f} ms  {q['rows']:>6} rows  "
+                                          f"{q['statement']}\n")
+
+        caches = "   ".join(f"{name} cache: {c['entries']} rows, {c['hit_rate']:.0%} hits"
+                            for name, c in snapshot["caches"].items())
+        self.diag_summary.config(text=f"Uptime {snapshot['uptime_s']:.0f}s   {caches}")
+
+        self.diag_job = self.root.after(DIAGNOSTICS_REFRESH_MS, self.refresh_diagnostics)
+
+    def reset_diagnostics(self):
+        metrics.reset()
+        self.refresh_diagnostics()
+
+    def export_diagnostics(self):
+        path = filedialog.asksaveasfilename(
+            title="Export Metrics", defaultextension=".json",
+            initialfile="news_metrics.json", filetypes=[("JSON", "*.json")])
+        if not path:
+            return
+        metrics.export(path)
+        messagebox.showinfo("Metrics", f"Metrics written to {path}")
+
+
+    # ====================================================
+    #                    LIVE SYNC
+    # ====================================================
+    # Polls the change log (livesync.py) and patches the rows other clients
+    # changed. Our own writes come back too; applying them again is harmless.
+    def schedule_sync(self):
+        self.root.after(SYNC_POLL_MS, self.sync)
+
+    def sync(self):
+        self.db.submit(self.feed.poll, quiet=True, on_done=self.apply_changes,
+                       on_error=lambda error: self.schedule_sync())
+
+    def apply_changes(self, changes):
+        self.schedule_sync()
+        self.show_changes(changes)
+
+    def show_changes(self, changes):
+        if changes.reload:
+            self.user_pager.reload()
+            if self.news_pager:
+                self.news_pager.reload()
+            return
+
+        for user_id, (user, inserted) in changes.users.items():
+            if user is None:
+                self.remove_user_rows(user_id)
+            elif self.user_list.exists(str(user_id)):
+                self.user_pager.update(user)
+                self.rename_author(user)
+            elif inserted:
+                self.user_pager.add_last(user)      # new ids sort last
+
+        if self.news_pager is None:
+            return                  # built later with fresh rows
+        for news_id, (row, inserted) in changes.news.items():
+            if row is None:
+                self.news_pager.remove(str(news_id))
+            else:
+                self.show_news_row(row, inserted)
+
+    # ====================================================
+    #                 WRITES / JOURNAL
+    # ====================================================
+    # A write goes through self.writes (journal.py). DirectWrites runs on the
+    # worker; WriteJournal only appends to a local file, so it runs right
+    # here and the row shows at once, and a timer flushes it to the
+    # database in the background.
+    def write(self, fn, *args, on_done):
+        if not self.writes.immediate:
+            return self.db.submit(fn, *args, on_done=on_done)
+        on_done(fn(*args))
+        self.show_pending()
+        self.schedule_flush()
+
+    @staticmethod
+    def base_of(row, row_id):
+        # the row the form was filled from, if it is the one being saved
+        return row if row is not None and row[0] == row_id else None
+
+    def schedule_flush(self, delay=FLUSH_MS):
+        if self.ready and self.flush_job is None and not self.flushing:
+            self.flush_job = self.root.after(delay, self.flush)
+
+    def flush(self):
+        self.flush_job = None
+        self.flushing = True
+        self.db.submit(self.writes.flush, quiet=True, on_done=self._flushed,
+                       on_error=self._flush_failed)
+
+    def _flushed(self, result):
+        self.flushing = False
+        self.flush_delay = FLUSH_MS
+        if result is None:
+            return self.show_pending()
+
+        # rows shown under a temporary id come back under the real one
+        for temp_id, user_id in result.user_ids.items():
+            self.user_pager.remove(str(temp_id))
+            if self.news_pager:
+                for iid in self.news_list.tag_has(f"user{temp_id}"):
+                    self.news_list.item(iid, tags=author_tags(user_id))
+        for kind, temp_id in result.dropped:
+            if kind == "user":
+                self.user_pager.remove(str(temp_id))
+            elif self.news_pager:
+                self.news_pager.remove(str(temp_id))
+        if self.news_pager:
+            for temp_id in result.news_ids:
+                self.news_pager.remove(str(temp_id))
+        self.show_changes(result.changes)
+
+        self.show_pending()
+        if result.pending:
+            self.schedule_flush(0)
+        if result.conflicts:
+            messagebox.showwarning("Changes not saved", "\n".join(result.conflicts))
+
+    def _flush_failed(self, error):
+        # database unreachable (or similar): keep the changes, retry later
+        self.flushing = False
+        self.flush_delay = min(self.flush_delay * 2, RETRY_MAX_MS)
+        self.show_pending(f" - database unavailable, retrying in {self.flush_delay // 1000}s")
+        self.schedule_flush(self.flush_delay)
+
+    def show_pending(self, note=""):
+        count = self.writes.pending()
+        self.journal_status.config(text=f"{count} change(s) not yet saved{note}" if count else "")
 
 
 # ====================================================
 #                    RUN APPLICATION
 # ====================================================
 if __name__ == "__main__":
-    insert_sample_data()
-    insert_sample_news()
+    parser = argparse.ArgumentParser(description="News management desktop app.")
+    parser.add_argument("--sample-data", action="store_true",
+                        help="add sample users and news to an empty database")
+    parser.add_argument("--write-behind", action="store_true", default=WRITE_BEHIND,
+                        help="save to a local journal first and write to the database in the background")
+    args = parser.parse_args()
+
     root = tk.Tk()
-    app = NewsApp(root)
-    root.mainloop()
+    app = NewsApp(root, sample_data=args.sample_data, write_behind=args.write_behind)
+    try:
+        root.mainloop()
+    finally:
+        app.db.shutdown()
+        app.writes.close()
+        close_pool()
@@ -0,0 +1,759 @@
+import re
+import weakref
+from collections import namedtuple
+from datetime import datetime
+
+from cache import LRUCache
+
+PAGE_SIZE = 200
+
+# ------------------- Row caches -------------------
+# Shared by every repository instance so writes invalidate what reads cached.
+USER_CACHE_SIZE = 5000
+AUTHOR_CACHE_SIZE = 50000               # username -> user_id, a few bytes each
+NEWS_CACHE_SIZE = 2000
+NEWS_CACHE_BYTES = 16 * 1024 * 1024     # full bodies can be large
+
+default_user_cache = LRUCache(max_entries=USER_CACHE_SIZE)
+default_news_cache = LRUCache(max_entries=NEWS_CACHE_SIZE, max_bytes=NEWS_CACHE_BYTES)
+default_author_cache = LRUCache(max_entries=AUTHOR_CACHE_SIZE, sizeof=lambda user_id: 64)
+
+
+def cache_stats():
+    return {"users": default_user_cache.stats(), "news": default_news_cache.stats(),
+            "authors": default_author_cache.stats()}
+
+class DuplicateUsername(Exception):
+    def __init__(self, username):
+        super().__init__(f"Username '{username}' already exists.")
+        self.username = username
+
+
+def is_integrity_error(error):
+    # mysql.connector and sqlite3 both name it IntegrityError
+    return type(error).__name__ == "IntegrityError"
+
+
+# ------------------- Row objects -------------------
+User = namedtuple("User", "user_id username email age contact_number")
+# List rows also carry the author statistics (user_stats, migration 5)
+UserSummary = namedtuple("UserSummary", User._fields + ("news_count", "last_posted"))
+News = namedtuple("News", "news_id title body created_at user_id username")
+# List rows carry only the start of the body (see PREVIEW_CHARS)
+NewsSummary = namedtuple("NewsSummary", "news_id title preview created_at user_id username")
+
+# Search results also carry their 1-based rank, used as the paging key
+SearchHit = namedtuple("SearchHit", NewsSummary._fields + ("position",))
+
+# One change_log entry (migration 7)
+Change = namedtuple("Change", "seq table_name row_id action")
+
+PREVIEW_CHARS = 150
+
+
+# ------------------- Prepared statements -------------------
+# One server-side prepared cursor per (connection, statement). Re-executing
+# the same SQL text on a MySQLCursorPrepared skips the PREPARE round trip,
+# so hot lookups cost a single EXECUTE on a warm pooled connection.
+_prepared = weakref.WeakKeyDictionary()
+
+
+def prepared_cursor(conn, sql):
+    cursors = _prepared.setdefault(conn, {})
+    cursor = cursors.get(sql)
+    if cursor is None:
+        cursor = cursors[sql] = conn.cursor(prepared=True)
+    return cursor
+
+
+def fetch_one(pool, sql, params=()):
+    with pool.connection() as db:
+        cursor = prepared_cursor(db, sql)
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+        cursor.fetchall()       # drain, a pooled connection must not keep unread rows
+        return row
+
+
+def fetch_all(pool, sql, params=()):
+    with pool.connection() as db:
+        cursor = db.cursor()
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def execute(pool, sql, params=()):
+    with pool.connection() as db:
+        cursor = db.cursor()
+        cursor.execute(sql, params)
+        db.commit()
+        return cursor
+
+
+def stream(pool, sql, params=(), batch=1000):
+    # Rows one at a time from an unbuffered (server-side) cursor, fetched in
+    # batches, so memory stays flat however large the result is. The
+    # connection is held until the generator is exhausted or closed.
+    conn = pool.acquire()
+    finished = False
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch)
+            if not rows:
+                break
+            yield from rows
+        finished = True
+    finally:
+        # abandoned half way: unread rows are still on the wire, drop it
+        pool.release(conn, broken=not finished)
+
+
+# ====================================================
+#                  USER REPOSITORY
+# ====================================================
+USER_COLUMNS = "user_id, username, email, age, contact_number"
+# One primary-key join per listed user, however many articles they have
+USER_SUMMARY_FROM = """
+    SELECT user_info.user_id, username, email, age, contact_number,
+           COALESCE(user_stats.news_count, 0), user_stats.last_posted
+    FROM user_info LEFT JOIN user_stats ON user_stats.user_id = user_info.user_id
+"""
+
+SQL_USER_COUNT = "SELECT COUNT(*) FROM user_info"
+SQL_USER_FIRST_PAGE = f"{USER_SUMMARY_FROM} ORDER BY user_info.user_id LIMIT %s"
+SQL_USER_PAGE_AFTER = f"""
+    {USER_SUMMARY_FROM}
+    WHERE user_info.user_id > %s ORDER BY user_info.user_id LIMIT %s
+"""
+SQL_USER_PAGE_BEFORE = f"""
+    {USER_SUMMARY_FROM}
+    WHERE user_info.user_id < %s ORDER BY user_info.user_id DESC LIMIT %s
+"""
+SQL_USER_SUMMARY_BY_ID = f"{USER_SUMMARY_FROM} WHERE user_info.user_id=%s"
+SQL_USER_BY_ID = f"SELECT {USER_COLUMNS} FROM user_info WHERE user_id=%s"
+SQL_USER_ID_BY_NAME = "SELECT user_id FROM user_info WHERE username=%s"
+SQL_USER_IDS = "SELECT user_id FROM user_info ORDER BY user_id"
+# Type-ahead: a bounded range scan on the unique username index
+SQL_USER_NAME_PREFIX = """
+    SELECT user_id, username FROM user_info
+    WHERE username LIKE %s ESCAPE '!'
+    ORDER BY username LIMIT %s
+"""
+SQL_USER_INSERT = """
+    INSERT INTO user_info(username,email,age,contact_number)
+    VALUES (%s,%s,%s,%s)
+"""
+SQL_USER_UPDATE = """
+    UPDATE user_info SET username=%s,email=%s,age=%s,contact_number=%s
+    WHERE user_id=%s
+"""
+SQL_USER_DELETE = "DELETE FROM user_info WHERE user_id=%s"
+SQL_USER_EXPORT = f"SELECT {USER_COLUMNS} FROM user_info ORDER BY user_id"
+
+
+def user_ids_by_names_sql(count):
+    placeholders = ",".join(["%s"] * count)
+    return f"SELECT user_id, username FROM user_info WHERE username IN ({placeholders})"
+
+
+def user_summaries_sql(count):
+    placeholders = ",".join(["%s"] * count)
+    return f"{USER_SUMMARY_FROM} WHERE user_info.user_id IN ({placeholders})"
+
+
+def users_delete_sql(count):
+    placeholders = ",".join(["%s"] * count)
+    return f"DELETE FROM user_info WHERE user_id IN ({placeholders})"
+
+
+AUTHOR_MATCHES = 20
+NAMES_PER_QUERY = 500       # keeps IN (...) lists well under engine limits
+
+
+def chunks(ids, size=NAMES_PER_QUERY):
+    ids = list(ids)
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+def like_prefix(text):
+    return text.replace("!", "!!").replace("%", "!%").replace("_", "!_") + "%"
+
+
+class UserRepository:
+    def __init__(self, pool, cache=None, news_cache=None, author_cache=None):
+        self.pool = pool
+        self.cache = cache or default_user_cache
+        # username -> user_id, so saving an article needs no author lookup
+        self.author_ids = author_cache or default_author_cache
+        # cached articles embed the author name and vanish with the author
+        self.news_cache = news_cache or default_news_cache
+
+    # ------------------- Reads -------------------
+    def count(self):
+        return fetch_one(self.pool, SQL_USER_COUNT)[0]
+
+    # Keyset pagination on user_id; key = (user_id,)
+    def page(self, after=None, limit=PAGE_SIZE):
+        if after is None:
+            rows = fetch_all(self.pool, SQL_USER_FIRST_PAGE, (limit,))
+        else:
+            rows = fetch_all(self.pool, SQL_USER_PAGE_AFTER, (after[0], limit))
+        return [UserSummary._make(row) for row in rows]
+
+    def page_before(self, before, limit=PAGE_SIZE):
+        rows = fetch_all(self.pool, SQL_USER_PAGE_BEFORE, (before[0], limit))
+        return [UserSummary._make(row) for row in reversed(rows)]
+
+    def summary(self, user_id):
+        # not cached: the statistics change with every article write
+        row = fetch_one(self.pool, SQL_USER_SUMMARY_BY_ID, (user_id,))
+        return UserSummary._make(row) if row else None
+
+    def summaries(self, user_ids):
+        # {user_id: UserSummary}; missing users are left out
+        user_ids = list(user_ids)
+        found = {}
+        for i in range(0, len(user_ids), NAMES_PER_QUERY):
+            chunk = user_ids[i:i + NAMES_PER_QUERY]
+            for row in fetch_all(self.pool, user_summaries_sql(len(chunk)), chunk):
+                found[row[0]] = UserSummary._make(row)
+        return found
+
+    def get(self, user_id):
+        user = self.cache.get(user_id)
+        if user is None:
+            since = self.cache.generation
+            row = fetch_one(self.pool, SQL_USER_BY_ID, (user_id,))
+            if not row:
+                return None
+            user = User._make(row)
+            self.cache.put(user_id, user, since)
+        return user
+
+    def find_id(self, username):
+        user_id = self.author_ids.get(username)
+        if user_id is None:
+            since = self.author_ids.generation
+            row = fetch_one(self.pool, SQL_USER_ID_BY_NAME, (username,))
+            if not row:
+                return None
+            user_id = row[0]
+            self.author_ids.put(username, user_id, since)
+        return user_id
+
+    def remember_author(self, username, user_id):
+        # rows read elsewhere (e.g. an article with its author) prime the map
+        if username and user_id is not None:
+            self.author_ids.put(username, user_id)
+
+    def match_names(self, prefix, limit=AUTHOR_MATCHES):
+        since = self.author_ids.generation
+        rows = fetch_all(self.pool, SQL_USER_NAME_PREFIX, (like_prefix(prefix), limit))
+        for user_id, username in rows:
+            self.author_ids.put(username, user_id, since)
+        return [username for _, username in rows]
+
+    def resolve_ids(self, usernames):
+        # {username: user_id} for many names: cached ones are free, the rest
+        # cost one IN (...) query per NAMES_PER_QUERY names. Unknown names
+        # are left out.
+        found = {}
+        missing = []
+        for username in set(usernames):
+            user_id = self.author_ids.get(username)
+            if user_id is None:
+                missing.append(username)
+            else:
+                found[username] = user_id
+
+        since = self.author_ids.generation
+        for i in range(0, len(missing), NAMES_PER_QUERY):
+            chunk = missing[i:i + NAMES_PER_QUERY]
+            for user_id, username in fetch_all(self.pool, user_ids_by_names_sql(len(chunk)), chunk):
+                self.author_ids.put(username, user_id, since)
+                found[username] = user_id
+        return found
+
+    def ids(self):
+        return [row[0] for row in fetch_all(self.pool, SQL_USER_IDS)]
+
+    def export(self, batch=1000):
+        return (User._make(row) for row in stream(self.pool, SQL_USER_EXPORT, batch=batch))
+
+    # ------------------- Writes -------------------
+    def add(self, username, email, age, contact_number):
+        try:
+            cursor = execute(self.pool, SQL_USER_INSERT, (username, email, age, contact_number))
+        except Exception as e:
+            if is_integrity_error(e):
+                raise DuplicateUsername(username) from e
+            raise
+        self.author_ids.put(username, cursor.lastrowid)
+        return cursor.lastrowid
+
+    def add_many(self, rows):
+        with self.pool.connection() as db:
+            cursor = db.cursor()
+            cursor.executemany(SQL_USER_INSERT, rows)
+            db.commit()
+
+    def update(self, user_id, username, email, age, contact_number):
+        try:
+            execute(self.pool, SQL_USER_UPDATE, (username, email, age, contact_number, user_id))
+        except Exception as e:
+            if is_integrity_error(e):
+                raise DuplicateUsername(username) from e
+            raise
+        self.invalidate(user_id)
+        self.author_ids.put(username, user_id)
+
+    def delete(self, user_id):
+        execute(self.pool, SQL_USER_DELETE, (user_id,))
+        self.invalidate(user_id)
+
+    def delete_many(self, user_ids):
+        with self.pool.connection() as db:
+            db.start_transaction()
+            delete_users(db.cursor(), user_ids)
+            db.commit()
+        self.invalidate(*user_ids)
+
+    def invalidate(self, *user_ids):
+        # drop everything cached about these users, e.g. after another
+        # client's edit; one pass over each cache however many users
+        user_ids = set(user_ids)
+        for user_id in user_ids:
+            self.cache.invalidate(user_id)
+        self.author_ids.invalidate_where(lambda cached_id: cached_id in user_ids)
+        self.news_cache.invalidate_where(lambda news: news.user_id in user_ids)
+
+
+# ====================================================
+#                  NEWS REPOSITORY
+# ====================================================
+NEWS_COLUMNS = """
+    news.news_id, news.title, news.body, news.created_at,
+    news.user_id, user_info.username
+"""
+# One extra character tells the UI whether to add "..." to the preview
+SUMMARY_COLUMNS = f"""
+    news.news_id, news.title, SUBSTR(news.body, 1, {PREVIEW_CHARS + 1}), news.created_at,
+    news.user_id, user_info.username
+"""
+
+SQL_NEWS_COUNT = "SELECT (SELECT COUNT(*) FROM news) + (SELECT COUNT(*) FROM news_archive)"
+
+# Keyset pages ordered newest first on (created_at, news_id). The key
+# comparison is written per engine so each one gets an index range seek:
+# MySQL only range-optimizes row constructors in IN lists, so it gets the
+# comparison spelled out; SQLite (3.15+) seeks on the row-value form but
+# turns the OR form into a walk of the whole index.
+NEWS_AFTER = "(news.created_at < %s OR (news.created_at = %s AND news.news_id < %s))"
+NEWS_BEFORE = "(news.created_at > %s OR (news.created_at = %s AND news.news_id > %s))"
+NEWS_AFTER_ROWS = "(news.created_at, news.news_id) < (%s, %s)"
+NEWS_BEFORE_ROWS = "(news.created_at, news.news_id) > (%s, %s)"
+NEWS_DESC = "ORDER BY news.created_at DESC, news.news_id DESC LIMIT %s"
+NEWS_ASC = "ORDER BY news.created_at ASC, news.news_id ASC LIMIT %s"
+
+
+def news_page_sql(where, order, table="news"):
+    # table="news_archive" gives the same query over the archive tier
+    # (aliased as news, so the columns and conditions are shared)
+    return f"""
+    SELECT {SUMMARY_COLUMNS}
+    FROM {table} news LEFT JOIN user_info ON news.user_id = user_info.user_id
+    {where} {order}
+"""
+
+
+SQL_NEWS_FIRST_PAGE = news_page_sql("", NEWS_DESC)
+SQL_NEWS_PAGE_AFTER = news_page_sql(f"WHERE {NEWS_AFTER}", NEWS_DESC)
+SQL_NEWS_PAGE_BEFORE = news_page_sql(f"WHERE {NEWS_BEFORE}", NEWS_ASC)
+SQL_NEWS_USER_FIRST_PAGE = news_page_sql("WHERE news.user_id=%s", NEWS_DESC)
+SQL_NEWS_USER_PAGE_AFTER = news_page_sql(f"WHERE news.user_id=%s AND {NEWS_AFTER}", NEWS_DESC)
+SQL_NEWS_USER_PAGE_BEFORE = news_page_sql(f"WHERE news.user_id=%s AND {NEWS_BEFORE}", NEWS_ASC)
+SQL_NEWS_PAGE_AFTER_ROWS = news_page_sql(f"WHERE {NEWS_AFTER_ROWS}", NEWS_DESC)
+SQL_NEWS_PAGE_BEFORE_ROWS = news_page_sql(f"WHERE {NEWS_BEFORE_ROWS}", NEWS_ASC)
+SQL_NEWS_USER_PAGE_AFTER_ROWS = news_page_sql(f"WHERE news.user_id=%s AND {NEWS_AFTER_ROWS}", NEWS_DESC)
+SQL_NEWS_USER_PAGE_BEFORE_ROWS = news_page_sql(f"WHERE news.user_id=%s AND {NEWS_BEFORE_ROWS}", NEWS_ASC)
+
+# Archive tier (migration 6). Everything in it is older than the rollover
+# cutoff, so a page only reads it once the hot rows run out or reach the
+# archive's newest article.
+SQL_ARCHIVE_NEWEST = "SELECT created_at FROM news_archive ORDER BY created_at DESC LIMIT 1"
+SQL_ARCHIVE_USER_NEWEST = """
+    SELECT created_at FROM news_archive WHERE user_id=%s
+    ORDER BY created_at DESC LIMIT 1
+"""
+SQL_ARCHIVE_FIRST_PAGE = news_page_sql("", NEWS_DESC, "news_archive")
+SQL_ARCHIVE_PAGE_AFTER = news_page_sql(f"WHERE {NEWS_AFTER}", NEWS_DESC, "news_archive")
+SQL_ARCHIVE_PAGE_BEFORE = news_page_sql(f"WHERE {NEWS_BEFORE}", NEWS_ASC, "news_archive")
+SQL_ARCHIVE_USER_FIRST_PAGE = news_page_sql("WHERE news.user_id=%s", NEWS_DESC, "news_archive")
+SQL_ARCHIVE_USER_PAGE_AFTER = news_page_sql(f"WHERE news.user_id=%s AND {NEWS_AFTER}",
+                                            NEWS_DESC, "news_archive")
+SQL_ARCHIVE_USER_PAGE_BEFORE = news_page_sql(f"WHERE news.user_id=%s AND {NEWS_BEFORE}",
+                                             NEWS_ASC, "news_archive")
+SQL_ARCHIVE_PAGE_AFTER_ROWS = news_page_sql(f"WHERE {NEWS_AFTER_ROWS}", NEWS_DESC, "news_archive")
+SQL_ARCHIVE_PAGE_BEFORE_ROWS = news_page_sql(f"WHERE {NEWS_BEFORE_ROWS}", NEWS_ASC, "news_archive")
+SQL_ARCHIVE_USER_PAGE_AFTER_ROWS = news_page_sql(f"WHERE news.user_id=%s AND {NEWS_AFTER_ROWS}",
+                                                 NEWS_DESC, "news_archive")
+SQL_ARCHIVE_USER_PAGE_BEFORE_ROWS = news_page_sql(f"WHERE news.user_id=%s AND {NEWS_BEFORE_ROWS}",
+                                                  NEWS_ASC, "news_archive")
+
+# (hot, archive) keyset statements per engine:
+# {dialect: {(direction, single author): (hot sql, archive sql)}}
+NEWS_KEYSET = {
+    "mysql": {
+        ("after", False): (SQL_NEWS_PAGE_AFTER, SQL_ARCHIVE_PAGE_AFTER),
+        ("after", True): (SQL_NEWS_USER_PAGE_AFTER, SQL_ARCHIVE_USER_PAGE_AFTER),
+        ("before", False): (SQL_NEWS_PAGE_BEFORE, SQL_ARCHIVE_PAGE_BEFORE),
+        ("before", True): (SQL_NEWS_USER_PAGE_BEFORE, SQL_ARCHIVE_USER_PAGE_BEFORE),
+    },
+    "sqlite": {
+        ("after", False): (SQL_NEWS_PAGE_AFTER_ROWS, SQL_ARCHIVE_PAGE_AFTER_ROWS),
+        ("after", True): (SQL_NEWS_USER_PAGE_AFTER_ROWS, SQL_ARCHIVE_USER_PAGE_AFTER_ROWS),
+        ("before", False): (SQL_NEWS_PAGE_BEFORE_ROWS, SQL_ARCHIVE_PAGE_BEFORE_ROWS),
+        ("before", True): (SQL_NEWS_USER_PAGE_BEFORE_ROWS, SQL_ARCHIVE_USER_PAGE_BEFORE_ROWS),
+    },
+}
+
+# Relevance-ranked full-text search over both tiers (FULLTEXT indexes from
+# migrations 3 and 6); each tier returns at most offset+limit hits
+SEARCH_TIER = f"""
+    SELECT {SUMMARY_COLUMNS}, MATCH(news.title, news.body) AGAINST (%s IN BOOLEAN MODE) AS score
+    FROM {{table}} news LEFT JOIN user_info ON news.user_id = user_info.user_id
+    WHERE MATCH(news.title, news.body) AGAINST (%s IN BOOLEAN MODE)
+    ORDER BY score DESC, news.news_id DESC LIMIT %s
+"""
+SQL_NEWS_SEARCH = f"""
+    SELECT * FROM (
+        ({SEARCH_TIER.format(table="news")})
+        UNION ALL
+        ({SEARCH_TIER.format(table="news_archive")})
+    ) hits
+    ORDER BY score DESC, news_id DESC
+    LIMIT %s OFFSET %s
+"""
+# The same on SQLite, through the FTS5 tables (bm25: lower is better)
+SEARCH_TIER_FTS5 = f"""
+    SELECT {SUMMARY_COLUMNS}, bm25({{table}}_fts) AS score
+    FROM {{table}}_fts JOIN {{table}} news ON news.news_id = {{table}}_fts.rowid
+    LEFT JOIN user_info ON news.user_id = user_info.user_id
+    WHERE {{table}}_fts MATCH %s
+    ORDER BY score, news.news_id DESC LIMIT %s
+"""
+SQL_NEWS_SEARCH_FTS5 = f"""
+    SELECT * FROM (
+        SELECT * FROM ({SEARCH_TIER_FTS5.format(table="news")})
+        UNION ALL
+        SELECT * FROM ({SEARCH_TIER_FTS5.format(table="news_archive")})
+    ) hits
+    ORDER BY score, news_id DESC
+    LIMIT %s OFFSET %s
+"""
+SQL_NEWS_BY_ID = f"""
+    SELECT {NEWS_COLUMNS}
+    FROM news LEFT JOIN user_info ON news.user_id = user_info.user_id
+    WHERE news_id=%s
+"""
+SQL_ARCHIVE_BY_ID = f"""
+    SELECT {NEWS_COLUMNS}
+    FROM news_archive news LEFT JOIN user_info ON news.user_id = user_info.user_id
+    WHERE news_id=%s
+"""
+SQL_NEWS_INSERT = """
+    INSERT INTO news(title,body,user_id)
+    VALUES (%s,%s,%s)
+"""
+SQL_NEWS_INSERT_DATED = """
+    INSERT INTO news(title, body, created_at, user_id)
+    VALUES (%s,%s,%s,%s)
+"""
+SQL_NEWS_UPDATE = """
+    UPDATE news
+    SET title=%s, body=%s, user_id=%s
+    WHERE news_id=%s
+"""
+SQL_NEWS_DELETE = "DELETE FROM news WHERE news_id=%s"
+SQL_ARCHIVE_UPDATE = """
+    UPDATE news_archive
+    SET title=%s, body=%s, user_id=%s
+    WHERE news_id=%s
+"""
+SQL_ARCHIVE_DELETE = "DELETE FROM news_archive WHERE news_id=%s"
+SQL_NEWS_EXPORT = f"""
+    SELECT {NEWS_COLUMNS}
+    FROM news LEFT JOIN user_info ON news.user_id = user_info.user_id
+    ORDER BY news.news_id
+"""
+SQL_ARCHIVE_EXPORT = f"""
+    SELECT {NEWS_COLUMNS}
+    FROM news_archive news LEFT JOIN user_info ON news.user_id = user_info.user_id
+    ORDER BY news.news_id
+"""
+
+
+def search_terms(text):
+    # "solar wat" -> "+solar* +wat*": every word required, prefixes match,
+    # so results narrow as the user types. Operator characters are dropped.
+    return " ".join(f"+{word}*" for word in re.findall(r"\w+", text))
+
+
+def fts5_terms(text):
+    # FTS5 spelling of the same query: '"solar"* "wat"*' (implicit AND)
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text))
+
+
+def news_summaries_sql(table, count):
+    placeholders = ",".join(["%s"] * count)
+    return news_page_sql(f"WHERE news.news_id IN ({placeholders})", "", table)
+
+
+def news_delete_sql(table, count):
+    placeholders = ",".join(["%s"] * count)
+    return f"DELETE FROM {table} WHERE news_id IN ({placeholders})"
+
+
+def news_reassign_sql(table, count):
+    placeholders = ",".join(["%s"] * count)
+    return f"UPDATE {table} SET user_id=%s WHERE news_id IN ({placeholders})"
+
+
+def news_order(news):
+    return (news.created_at, news.news_id)
+
+
+def summary_of(news):
+    return NewsSummary(news.news_id, news.title, (news.body or "")[:PREVIEW_CHARS + 1],
+                       news.created_at, news.user_id, news.username)
+
+
+class NewsRepository:
+    def __init__(self, pool, cache=None):
+        self.pool = pool
+        self.cache = cache or default_news_cache
+        self.dialect = pool.dialect
+        self.keyset = NEWS_KEYSET[self.dialect]
+
+    # ------------------- Reads -------------------
+    def count(self):
+        return fetch_one(self.pool, SQL_NEWS_COUNT)[0]
+
+    # Keyset pagination, newest first; key = (created_at, news_id).
+    # Pass user_id to page through a single author's news.
+    def page(self, after=None, limit=PAGE_SIZE, user_id=None):
+        if after is None:
+            hot, archive = (SQL_NEWS_FIRST_PAGE, SQL_ARCHIVE_FIRST_PAGE) if user_id is None \
+                else (SQL_NEWS_USER_FIRST_PAGE, SQL_ARCHIVE_USER_FIRST_PAGE)
+        else:
+            hot, archive = self.keyset[("after", user_id is not None)]
+        params = self._page_params(after, limit, user_id)
+
+        rows = [NewsSummary._make(row) for row in fetch_all(self.pool, hot, params)]
+        newest = self._archive_newest(user_id)
+        if newest is None or (len(rows) == limit and rows[-1].created_at > newest):
+            return rows             # the page ends before the archive starts
+        rows += [NewsSummary._make(row) for row in fetch_all(self.pool, archive, params)]
+        return sorted(rows, key=news_order, reverse=True)[:limit]
+
+    def page_before(self, before, limit=PAGE_SIZE, user_id=None):
+        hot, archive = self.keyset[("before", user_id is not None)]
+        params = self._page_params(before, limit, user_id)
+
+        rows = [NewsSummary._make(row) for row in fetch_all(self.pool, hot, params)]
+        newest = self._archive_newest(user_id)
+        if newest is not None and newest >= before[0]:
+            rows += [NewsSummary._make(row) for row in fetch_all(self.pool, archive, params)]
+            rows = sorted(rows, key=news_order)[:limit]
+        return rows[::-1]
+
+    def _page_params(self, key, limit, user_id):
+        if key is None:
+            params = (limit,)
+        elif self.dialect == "sqlite":
+            params = (key[0], key[1], limit)
+        else:
+            params = (key[0], key[0], key[1], limit)
+        return params if user_id is None else (user_id,) + params
+
+    def _archive_newest(self, user_id=None):
+        # one index probe; None when there is nothing archived
+        if user_id is None:
+            row = fetch_one(self.pool, SQL_ARCHIVE_NEWEST)
+        else:
+            row = fetch_one(self.pool, SQL_ARCHIVE_USER_NEWEST, (user_id,))
+        return row[0] if row else None
+
+    # Ranked search, paginated by position: rows offset+1 .. offset+limit
+    def search(self, text, limit=PAGE_SIZE, offset=0):
+        if self.dialect == "sqlite":
+            terms = fts5_terms(text)
+            sql, tier = SQL_NEWS_SEARCH_FTS5, (terms, offset + limit)
+        else:
+            terms = search_terms(text)
+            sql, tier = SQL_NEWS_SEARCH, (terms, terms, offset + limit)
+        if not terms or limit <= 0:
+            return []
+        rows = fetch_all(self.pool, sql, tier + tier + (limit, offset))
+        # the last column is the score
+        return [SearchHit(*row[:-1], offset + i + 1) for i, row in enumerate(rows)]
+
+    def search_page(self, text, after=None, limit=PAGE_SIZE):
+        # after = (position,) of the last row shown
+        return self.search(text, limit, after[0] if after else 0)
+
+    def search_page_before(self, text, before, limit=PAGE_SIZE):
+        offset = max(0, before[0] - 1 - limit)
+        return self.search(text, before[0] - 1 - offset, offset)
+
+    def summaries(self, news_ids):
+        # {news_id: NewsSummary} from both tiers; missing articles are left out
+        news_ids = list(news_ids)
+        found = {}
+        for i in range(0, len(news_ids), NAMES_PER_QUERY):
+            chunk = news_ids[i:i + NAMES_PER_QUERY]
+            for table in ("news", "news_archive"):
+                for row in fetch_all(self.pool, news_summaries_sql(table, len(chunk)), chunk):
+                    found[row[0]] = NewsSummary._make(row)
+        return found
+
+    def export(self, batch=1000):
+        # hot tier, then archive: one server-side cursor at a time
+        for sql in (SQL_NEWS_EXPORT, SQL_ARCHIVE_EXPORT):
+            for row in stream(self.pool, sql, batch=batch):
+                yield News._make(row)
+
+    def get(self, news_id):
+        news = self.cache.get(news_id)
+        if news is None:
+            since = self.cache.generation
+            row = fetch_one(self.pool, SQL_NEWS_BY_ID, (news_id,)) \
+                or fetch_one(self.pool, SQL_ARCHIVE_BY_ID, (news_id,))
+            if not row:
+                return None
+            news = News._make(row)
+            self.cache.put(news_id, news, since)
+        return news
+
+    # ------------------- Writes -------------------
+    def add(self, title, body, user_id, created_at=None):
+        if created_at is None:
+            cursor = execute(self.pool, SQL_NEWS_INSERT, (title, body, user_id))
+        else:
+            cursor = execute(self.pool, SQL_NEWS_INSERT_DATED, (title, body, created_at, user_id))
+        return cursor.lastrowid
+
+    def add_many(self, rows):
+        # rows = (title, body, created_at, user_id)
+        with self.pool.connection() as db:
+            cursor = db.cursor()
+            cursor.executemany(SQL_NEWS_INSERT_DATED, rows)
+            db.commit()
+
+    # An article is in exactly one tier; try the hot one first
+    def update(self, news_id, title, body, user_id):
+        params = (title, body, user_id, news_id)
+        if execute(self.pool, SQL_NEWS_UPDATE, params).rowcount == 0:
+            execute(self.pool, SQL_ARCHIVE_UPDATE, params)
+        self.cache.invalidate(news_id)
+
+    def delete(self, news_id):
+        if execute(self.pool, SQL_NEWS_DELETE, (news_id,)).rowcount == 0:
+            execute(self.pool, SQL_ARCHIVE_DELETE, (news_id,))
+        self.cache.invalidate(news_id)
+
+    def delete_many(self, news_ids):
+        with self.pool.connection() as db:
+            db.start_transaction()
+            delete_news(db.cursor(), news_ids)
+            db.commit()
+        for news_id in news_ids:
+            self.cache.invalidate(news_id)
+
+    def reassign(self, news_ids, user_id):
+        with self.pool.connection() as db:
+            db.start_transaction()
+            reassign_news(db.cursor(), news_ids, user_id)
+            db.commit()
+        for news_id in news_ids:
+            self.cache.invalidate(news_id)
+
+
+# ------------------- Saving an article -------------------
+# Shared by the desktop app and the HTTP API: resolve the author by name,
+# then insert (news_id None) or update. Returns None if the author does
+# not exist.
+def save_news(users, news, news_id, title, body, author):
+    user_id = users.find_id(author)
+    if user_id is None:
+        return None
+
+    if news_id is None:
+        # timestamp set here so the new row can be shown without a re-read
+        created_at = datetime.now().replace(microsecond=0)
+        news_id = news.add(title, body, user_id, created_at)
+    else:
+        # the article is normally still cached from when it was opened
+        old = news.get(news_id)
+        created_at = old.created_at if old else None
+        news.update(news_id, title, body, user_id)
+    return News(news_id, title, body, created_at, user_id, author)
+
+
+# ------------------- Bulk writes -------------------
+# Set-based: one IN (...) statement per NAMES_PER_QUERY ids, all on the
+# caller's cursor so a whole selection is one transaction (the journal
+# flush runs them inside its own).
+def delete_users(cursor, user_ids):
+    # their news goes with them (ON DELETE CASCADE)
+    for chunk in chunks(user_ids):
+        cursor.execute(users_delete_sql(len(chunk)), chunk)
+
+
+def delete_news(cursor, news_ids):
+    # an article is in one tier or the other
+    for chunk in chunks(news_ids):
+        for table in ("news", "news_archive"):
+            cursor.execute(news_delete_sql(table, len(chunk)), chunk)
+
+
+def reassign_news(cursor, news_ids, user_id):
+    for chunk in chunks(news_ids):
+        for table in ("news", "news_archive"):
+            cursor.execute(news_reassign_sql(table, len(chunk)), [user_id] + chunk)
+
+
+def move_news(users, news, news_ids, author):
+    # Give articles a new author by name; the author's id, None if unknown
+    user_id = users.find_id(author)
+    if user_id is not None:
+        news.reassign(news_ids, user_id)
+    return user_id
+
+
+# ====================================================
+#                    CHANGE LOG
+# ====================================================
+# Written by triggers (migration 7); read by livesync.ChangeFeed
+SQL_CHANGES_LATEST = "SELECT MAX(seq) FROM change_log"
+SQL_CHANGES_SINCE = """
+    SELECT seq, table_name, row_id, action FROM change_log
+    WHERE seq > %s ORDER BY seq LIMIT %s
+"""
+SQL_CHANGES_PRUNE = "DELETE FROM change_log WHERE changed_at < %s"
+
+
+class ChangeLogRepository:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def latest(self):
+        return fetch_one(self.pool, SQL_CHANGES_LATEST)[0] or 0
+
+    def since(self, seq, limit):
+        return [Change._make(row) for row in fetch_all(self.pool, SQL_CHANGES_SINCE, (seq, limit))]
+
+    def prune(self, before):
+        return execute(self.pool, SQL_CHANGES_PRUNE, (before,)).rowcount
@@ -0,0 +1,110 @@
+import sys
+from array import array
+from datetime import datetime
+
+# ====================================================
+#                  COMPACT ROW STORE
+# ====================================================
+# Column-wise copy of the rows a PagedTreeview has loaded, so sorting and
+# filtering them needs neither the database nor a read-back of every
+# Treeview cell. Numbers and timestamps live in typed arrays (8 bytes a
+# value, no object per cell), author names are interned so repeated
+# authors share one string, and removed rows leave a free slot that the
+# next insert reuses.
+#
+# Column kinds:
+#   "text" -> str, sorted case-insensitively, searched by filters
+#   "name" -> like text, interned (few distinct values)
+#   "int"  -> signed 64-bit, None sorts first
+#   "time" -> datetime kept as epoch seconds, None sorts first
+MISSING_INT = -2 ** 63
+MISSING_TIME = float("-inf")
+
+
+class RowStore:
+    __slots__ = ("names", "kinds", "_columns", "_slots", "_iids", "_free", "_folded")
+
+    def __init__(self, columns):
+        # columns: [(name, kind)] in the order fields(row) returns them
+        self.names = [name for name, _ in columns]
+        self.kinds = dict(columns)
+        self._columns = {name: array("q") if kind == "int" else array("d") if kind == "time" else []
+                         for name, kind in columns}
+        self._slots = {}            # iid -> slot
+        self._iids = []             # slot -> iid (None if free)
+        self._free = []
+        self._folded = None         # slot -> casefolded text of the row, built on first filter
+
+    def __len__(self):
+        return len(self._slots)
+
+    # ------------------- Writes -------------------
+    def put(self, iid, values):
+        slot = self._slots.get(iid)
+        if slot is None:
+            slot = self._free.pop() if self._free else self._grow()
+            self._slots[iid] = slot
+            self._iids[slot] = iid
+        for name, value in zip(self.names, values):
+            self._columns[name][slot] = self._encode(name, value)
+        if self._folded is not None:
+            self._folded[slot] = self._fold(slot)
+
+    def set(self, iid, name, value):
+        slot = self._slots.get(iid)
+        if slot is not None:
+            self._columns[name][slot] = self._encode(name, value)
+            if self._folded is not None:
+                self._folded[slot] = self._fold(slot)
+
+    def discard(self, iid):
+        slot = self._slots.pop(iid, None)
+        if slot is not None:
+            self._iids[slot] = None
+            self._free.append(slot)
+
+    def clear(self):
+        for name in self.names:
+            del self._columns[name][:]
+        self._slots.clear()
+        self._iids.clear()
+        self._free.clear()
+        self._folded = None
+
+    def _grow(self):
+        for name, column in self._columns.items():
+            column.append(0 if isinstance(column, array) else None)
+        self._iids.append(None)
+        if self._folded is not None:
+            self._folded.append("")
+        return len(self._iids) - 1
+
+    def _encode(self, name, value):
+        kind = self.kinds[name]
+        if kind == "int":
+            return MISSING_INT if value is None else int(value)
+        if kind == "time":
+            return value.timestamp() if isinstance(value, datetime) else MISSING_TIME
+        value = "" if value is None else str(value)
+        return sys.intern(value) if kind == "name" else value
+
+    # ------------------- Reads -------------------
+    def sort(self, iids, name, descending=False):
+        # iids (all stored) sorted by one column; ties keep the given order
+        column, slots = self._columns[name], self._slots
+        if self.kinds[name] in ("text", "name"):
+            key = lambda iid: column[slots[iid]].casefold()
+        else:
+            key = lambda iid: column[slots[iid]]
+        return sorted(iids, key=key, reverse=descending)
+
+    def matching(self, text):
+        # iids of the rows with text (any case) in one of their text columns
+        if self._folded is None:
+            self._folded = [self._fold(slot) if iid is not None else "" for slot, iid in enumerate(self._iids)]
+        text = text.casefold()
+        return {iid for iid, slot in self._slots.items() if text in self._folded[slot]}
+
+    def _fold(self, slot):
+        return "\t".join(self._columns[name][slot] for name in self.names
+                         if self.kinds[name] in ("text", "name")).casefold()
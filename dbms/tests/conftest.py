@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+# the modules live flat in dbms/, as when the app is run from there
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import repository
+from backends import SQLiteBackend
+from migrations import migrate
+
+
+@pytest.fixture
+def pool(tmp_path):
+    # a fresh, fully migrated SQLite database per test
+    db.set_backend(SQLiteBackend(str(tmp_path / "news.db")))
+    migrate()
+    for cache in (repository.default_user_cache, repository.default_news_cache,
+                  repository.default_author_cache):
+        cache.clear()
+    yield db.get_pool()
+    db.close_pool()
+
+
+@pytest.fixture
+def users(pool):
+    return repository.UserRepository(pool)
+
+
+@pytest.fixture
+def news(pool):
+    return repository.NewsRepository(pool)
@@ -0,0 +1,50 @@
+import json
+import threading
+import time
+from http.client import HTTPConnection
+
+import pytest
+
+from api import ApiServer
+
+
+@pytest.fixture
+def server(pool):
+    server = ApiServer(("127.0.0.1", 0), workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get(connection, path):
+    connection.request("GET", path)
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def test_idle_keep_alive_connections_do_not_block_others(server):
+    port = server.server_address[1]
+    idle = [HTTPConnection("127.0.0.1", port, timeout=5) for _ in range(4)]
+    for connection in idle:
+        assert get(connection, "/users")[0] == 200      # stays open afterwards
+
+    started = time.monotonic()
+    status, body = get(HTTPConnection("127.0.0.1", port, timeout=5), "/users")
+
+    assert status == 200 and body == {"items": [], "next": None}
+    assert time.monotonic() - started < 1
+
+
+def test_shutdown_does_not_wait_for_idle_connections(pool):
+    server = ApiServer(("127.0.0.1", 0), workers=1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    idle = HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+    assert get(idle, "/users")[0] == 200
+
+    started = time.monotonic()
+    server.shutdown()
+    server.server_close()
+
+    assert time.monotonic() - started < 1
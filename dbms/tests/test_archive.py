@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import archive
+from repository import save_news
+
+
+def old_article(users, news, username="alice"):
+    user_id = users.add(username, None, None, None)
+    news_id = news.add("old title", "old body", user_id, datetime(2020, 1, 1))
+    return user_id, news_id
+
+
+def test_edit_of_archived_article_replaces_cached_row(users, news):
+    user_id, news_id = old_article(users, news)
+    assert news.get(news_id).title == "old title"      # now cached
+    assert archive.rollover(days=30) == 1
+
+    save_news(users, news, news_id, "new title", "new body", "alice")
+
+    assert news.cache.get(news_id) is None
+    assert news.get(news_id).title == "new title"
+
+
+def test_rename_updates_cached_articles_of_author(users, news):
+    user_id, news_id = old_article(users, news)
+    archive.rollover(days=30)
+    assert news.get(news_id).username == "alice"
+
+    users.update(user_id, "alicia", None, None, None)
+
+    assert news.get(news_id).username == "alicia"
+    assert users.find_id("alice") is None
+    assert users.find_id("alicia") == user_id
+
+
+def test_delete_of_archived_article_drops_cached_row(users, news):
+    user_id, news_id = old_article(users, news)
+    archive.rollover(days=30)
+    news.get(news_id)
+
+    news.delete(news_id)
+
+    assert news.get(news_id) is None
+
+
+def test_load_that_raced_an_invalidation_is_not_cached(users, news):
+    user_id, news_id = old_article(users, news)
+    since = news.cache.generation
+    loaded = news.get(news_id)
+    news.cache.invalidate(news_id)                     # a write landed meanwhile
+
+    news.cache.put(news_id, loaded, since)
+
+    assert news.cache.get(news_id) is None
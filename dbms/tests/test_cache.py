@@ -0,0 +1,62 @@
+import cache
+from cache import LRUCache
+
+
+def test_invalidating_another_key_keeps_an_in_flight_load():
+    rows = LRUCache()
+    since = rows.generation
+    rows.invalidate("other")
+
+    rows.put("row", "loaded", since)
+
+    assert rows.get("row") == "loaded"
+
+
+def test_invalidating_the_same_key_drops_an_in_flight_load():
+    rows = LRUCache()
+    since = rows.generation
+    rows.invalidate("row")
+
+    rows.put("row", "loaded", since)
+    assert rows.get("row") is None
+
+    rows.put("row", "reloaded", rows.generation)        # a load started afterwards
+    assert rows.get("row") == "reloaded"
+
+
+def test_invalidate_where_drops_in_flight_loads_it_matches():
+    author_ids = LRUCache(sizeof=lambda user_id: 64)
+    since = author_ids.generation
+    author_ids.invalidate_where(lambda user_id: user_id == 7)
+
+    author_ids.put("alice", 7, since)
+    author_ids.put("bob", 8, since)
+
+    assert author_ids.get("alice") is None
+    assert author_ids.get("bob") == 8
+
+
+def test_clear_drops_every_in_flight_load():
+    rows = LRUCache()
+    since = rows.generation
+    rows.clear()
+
+    rows.put("row", "loaded", since)
+
+    assert rows.get("row") is None
+
+
+def test_forgotten_stamps_refuse_older_loads(monkeypatch):
+    monkeypatch.setattr(cache, "STAMPS_KEPT", 2)
+    rows = LRUCache()
+    since = rows.generation
+    for key in ("a", "b", "c"):                         # "a" is no longer remembered
+        rows.invalidate(key)
+
+    rows.put("a", "loaded", since)
+    rows.put("z", "loaded", since)                      # refused too: cannot tell
+    assert rows.get("a") is None and rows.get("z") is None
+
+    since = rows.generation
+    rows.put("a", "loaded", since)
+    assert rows.get("a") == "loaded"
@@ -0,0 +1,91 @@
+import pytest
+
+from journal import WriteJournal
+from repository import User, execute
+
+
+@pytest.fixture
+def journal(pool, users, news, tmp_path):
+    writes = WriteJournal(pool, users, news, path=str(tmp_path / "journal.db"))
+    yield writes
+    writes.close()
+
+
+def test_flush_maps_temporary_ids_to_real_ones(journal, users, news):
+    temp_user = journal.add_user("alice", "a@example.com", 30, None)
+    article = journal.save_news(None, "title", "body", "alice")
+    journal.update_user(User(temp_user, "alice", "alice@example.com", 31, None))
+
+    # shown at once under temporary ids, the author's included
+    assert temp_user < 0 and article.news_id < 0
+    assert article.user_id == temp_user
+
+    result = journal.flush()
+
+    user_id, news_id = result.user_ids[temp_user], result.news_ids[article.news_id]
+    assert user_id > 0 and news_id > 0
+    assert users.get(user_id).email == "alice@example.com"
+    assert news.get(news_id).user_id == user_id
+    assert result.changes.news[news_id][0].username == "alice"
+    assert result.conflicts == [] and result.pending == 0
+
+    # a later edit of the row still known by its temporary id
+    journal.update_user(User(temp_user, "alice", "alice@example.com", 32, None))
+    journal.flush()
+    assert users.get(user_id).age == 32
+
+
+def test_mappings_are_pruned_once_the_journal_drains(journal, users):
+    alice = journal.add_user("alice", None, None, None)
+    journal.add_user("bob", None, None, None)
+    journal.update_user(User(alice, "alice", "a@example.com", None, None))
+    first = journal.flush(limit=2)                  # the edit of alice is still queued
+    assert temp_ids(journal) == 2
+
+    journal.flush()
+
+    assert users.get(first.user_ids[alice]).email == "a@example.com"
+    assert temp_ids(journal) == 0                   # drained, nothing learned this time
+
+    journal.add_user("carol", None, None, None)
+    journal.flush()
+    assert temp_ids(journal) == 1                   # kept until the next flush
+
+
+def temp_ids(journal):
+    return journal._db.execute("SELECT COUNT(*) FROM temp_ids").fetchone()[0]
+
+
+def test_stale_edit_is_skipped_and_the_rest_applied(journal, users, news):
+    user_id = users.add("alice", None, None, None)
+    mine, other = news.add("one", "body", user_id), news.add("two", "body", user_id)
+    loaded = news.get(mine)
+    execute(news.pool, "UPDATE news SET title=%s WHERE news_id=%s", ("theirs", mine))
+    news.cache.invalidate(mine)
+
+    journal.save_news(mine, "mine", loaded.body, "alice", loaded)
+    journal.save_news(other, "edited", "body", "alice", news.get(other))
+    temp_user = journal.add_user("alice", None, None, None)         # duplicate username
+    result = journal.flush()
+
+    assert news.get(mine).title == "theirs"
+    assert news.get(other).title == "edited"
+    assert len(result.conflicts) == 2
+    assert "changed by someone else" in result.conflicts[0]
+    assert "already taken" in result.conflicts[1]
+    assert result.dropped == [("user", temp_user)]
+    assert result.changes.news[mine][0].title == "theirs"           # shown again
+    assert result.pending == 0
+
+
+def test_batch_committed_before_a_crash_is_not_applied_twice(journal, users, news):
+    users.add("alice", None, None, None)
+    journal.save_news(None, "once", "body", "alice")
+    # the primary committed the batch, the journal was not trimmed
+    execute(news.pool, "INSERT INTO import_progress(source, records) VALUES (%s, 1)",
+            (journal.source,))
+
+    result = journal.flush()
+
+    assert result.news_ids == {} and result.pending == 0
+    assert news.count() == 0
@@ -0,0 +1,88 @@
+import livesync
+from livesync import ChangeFeed
+from repository import Change, execute
+
+
+class ScriptedLog:
+    # stands in for ChangeLogRepository with a fixed list of entries
+    def __init__(self, entries, latest=0):
+        self.entries = entries
+        self._latest = latest
+
+    def latest(self):
+        return self._latest
+
+    def since(self, seq, limit):
+        return [c for c in self.entries if c.seq > seq][:limit]
+
+
+def scripted_feed(pool, users, news, entries):
+    feed = ChangeFeed(pool, users, news)
+    feed.log = ScriptedLog(entries)
+    return feed
+
+
+def test_edit_by_other_client_is_patched_and_uncached(pool, users, news):
+    user_id = users.add("alice", None, None, None)
+    news_id = news.add("title", "body", user_id)
+    feed = ChangeFeed(pool, users, news)
+    feed.start()
+    news.get(news_id)
+
+    # another client's write: straight SQL, so nothing here invalidated it
+    execute(pool, "UPDATE news SET title=%s WHERE news_id=%s", ("theirs", news_id))
+    changes = feed.poll()
+
+    assert not changes.reload
+    row, inserted = changes.news[news_id]
+    assert row.title == "theirs" and not inserted
+    assert news.cache.get(news_id) is None
+    assert feed.poll() == (False, {}, {})
+
+
+def test_reload_entry_asks_for_a_reload(pool, users, news):
+    feed = ChangeFeed(pool, users, news)
+    feed.start()
+    users.add("alice", None, None, None)
+    execute(pool, "INSERT INTO change_log(table_name, row_id, action) VALUES ('news', 0, 'R')")
+
+    assert feed.poll().reload
+    assert feed.poll() == (False, {}, {})       # the reload covered everything up to it
+
+
+def test_more_changes_than_one_poll_asks_for_a_reload(pool, users, news):
+    feed = ChangeFeed(pool, users, news, limit=3)
+    feed.start()
+    for name in ("a", "b", "c"):
+        users.add(name, None, None, None)
+
+    assert feed.poll().reload
+    assert feed.seen == feed.log.latest()
+
+
+def test_gap_holds_the_watermark_until_it_fills(pool, users, news):
+    entries = [Change(1, "user_info", 10, "U"), Change(3, "user_info", 30, "U")]
+    feed = scripted_feed(pool, users, news, entries)
+
+    assert set(feed.poll().users) == {10, 30}
+    assert feed.seen == 1                       # 2 may still commit
+
+    entries.insert(1, Change(2, "user_info", 20, "U"))
+    changes = feed.poll()
+
+    assert set(changes.users) == {20}           # 3 is not reported twice
+    assert feed.seen == 3
+
+
+def test_gap_is_skipped_after_gap_wait_without_a_reload(pool, users, news, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(livesync.time, "monotonic", lambda: now[0])
+    feed = scripted_feed(pool, users, news, [Change(1, "user_info", 10, "U"),
+                                             Change(3, "user_info", 30, "U")])
+    feed.poll()
+
+    now[0] += livesync.GAP_WAIT + 1             # 2 was rolled back, it never appears
+    changes = feed.poll()
+
+    assert changes == (False, {}, {})
+    assert feed.seen == 3
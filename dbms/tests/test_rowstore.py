@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from rowstore import RowStore
+
+COLUMNS = [("title", "text"), ("user", "name"), ("created", "time"), ("count", "int")]
+
+
+def store_of(rows):
+    store = RowStore(COLUMNS)
+    for iid, values in rows:
+        store.put(iid, values)
+    return store
+
+
+ROWS = [
+    ("1", ("Banana", "bob", datetime(2024, 1, 2), 5)),
+    ("2", ("apple", "alice", datetime(2024, 1, 1), 5)),
+    ("3", ("cherry", "bob", None, None)),
+    ("4", ("Apple", "carol", datetime(2024, 1, 1), 7)),
+]
+ORDER = ["1", "2", "3", "4"]
+
+
+def test_equal_keys_keep_the_given_order_both_ways():
+    store = store_of(ROWS)
+
+    assert store.sort(ORDER, "user") == ["2", "1", "3", "4"]
+    assert store.sort(ORDER, "user", descending=True) == ["4", "1", "3", "2"]
+    assert store.sort(["4", "3", "2", "1"], "count") == ["3", "2", "1", "4"]
+    assert store.sort(ORDER, "created", descending=True) == ["1", "2", "4", "3"]
+
+
+def test_text_sorts_without_case_and_missing_values_first():
+    store = store_of(ROWS)
+
+    assert store.sort(ORDER, "title") == ["2", "4", "1", "3"]
+    assert store.sort(ORDER, "count")[0] == "3"
+    assert store.sort(ORDER, "created")[0] == "3"
+
+
+def test_filter_matches_any_text_column_and_follows_writes():
+    store = store_of(ROWS)
+    assert store.matching("APPLE") == {"2", "4"}
+    assert store.matching("bob") == {"1", "3"}
+
+    store.set("1", "title", "apple pie")
+    store.discard("2")
+    store.put("5", ("crab apple", "dave", None, 1))
+
+    assert store.matching("apple") == {"1", "4", "5"}
+    assert store.matching("2024") == set()              # only text columns are searched
+
+
+def test_removed_rows_free_their_slot():
+    store = store_of(ROWS)
+    store.discard("2")
+    store.put("5", ("date", "erin", None, 1))
+
+    assert len(store) == 4
+    assert len(store._iids) == 4
+    assert store.sort(["1", "3", "4", "5"], "title") == ["4", "1", "3", "5"]
@@ -0,0 +1,54 @@
+import threading
+
+from worker import DbExecutor
+
+
+class FakeRoot:
+    # after() callbacks are run by the test instead of a Tk main loop
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, ms, callback):
+        self.callbacks.append(callback)
+
+    def run_pending(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+def test_work_submitted_while_held_waits_for_release():
+    root = FakeRoot()
+    executor = DbExecutor(root, workers=4)
+    migrated = threading.Event()
+    order = []
+
+    def migrate():
+        migrated.wait(5)
+        order.append("migrate")
+
+    preparing = executor.submit(migrate, quiet=True)
+    executor.hold()
+    held = [executor.submit(order.append, "crud", quiet=True) for _ in range(6)]
+
+    migrated.set()
+    preparing.result(5)
+    assert not any(future.done() for future in held)
+
+    executor.release()
+    for future in held:
+        future.result(5)
+    root.run_pending()
+    assert order == ["migrate"] + ["crud"] * 6
+    executor.shutdown()
+
+
+def test_shutdown_drops_held_work():
+    executor = DbExecutor(FakeRoot(), workers=1)
+    executor.hold()
+    calls = []
+    future = executor.submit(calls.append, "late", quiet=True)
+
+    executor.shutdown()
+
+    assert calls == [] and (future.cancelled() or future.result() is None)
@@ -0,0 +1,114 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import messagebox
+
+from metrics import acting, current_action
+
+# ====================================================
+#            BACKGROUND DATABASE EXECUTOR
+# ====================================================
+# Repository calls run on a small thread pool. Tk is not thread safe, so
+# workers never touch widgets: finished futures are queued and the Tk main
+# loop drains the queue with root.after() and runs the callbacks itself.
+POLL_MS = 16        # ~60 fps while work is in flight, idle otherwise
+
+
+class DbExecutor:
+    def __init__(self, root, workers=4, on_busy=None):
+        self.root = root
+        self.on_busy = on_busy          # on_busy(True/False) toggles the indicator
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+        self._done = queue.SimpleQueue()
+        self._pending = 0
+        self._shown = 0                 # pending work that shows the indicator
+        self._polling = False
+        self._open = threading.Event()  # cleared while submissions are held
+        self._open.set()
+        self._closing = False
+
+    def submit(self, fn, *args, on_done=None, on_error=None, quiet=False):
+        # Must be called from the Tk thread. quiet=True is for background
+        # work (e.g. live sync polls) that should not show the indicator.
+        self._pending += 1
+        if not quiet:
+            self._shown += 1
+            if self._shown == 1 and self.on_busy:
+                self.on_busy(True)
+
+        # callbacks run as part of the UI action that submitted the work
+        action = current_action()
+        if action:
+            action.begin()
+
+        if not self._open.is_set():
+            fn, args = self._when_open, (fn,) + args
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(lambda f: self._done.put((f, on_done, on_error, action, quiet)))
+
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_MS, self._poll)
+        return future
+
+    @property
+    def busy(self):
+        return self._shown > 0
+
+    # Work submitted between hold() and release() waits for release(),
+    # e.g. the UI's reads and writes until the schema is migrated; work
+    # submitted before hold() runs as usual
+    def hold(self):
+        self._open.clear()
+
+    def release(self):
+        self._open.set()
+
+    def _when_open(self, fn, *args):
+        self._open.wait()
+        if self._closing:
+            return None
+        return fn(*args)
+
+    def shutdown(self):
+        self._closing = True
+        self._open.set()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    # ------------------- Tk side -------------------
+    def _poll(self):
+        while True:
+            try:
+                future, on_done, on_error, action, quiet = self._done.get_nowait()
+            except queue.Empty:
+                break
+
+            try:
+                if future.cancelled():
+                    continue
+                with acting(action):
+                    error = future.exception()
+                    if error is not None:
+                        (on_error or show_db_error)(error)
+                    elif on_done:
+                        on_done(future.result())
+            except Exception as e:
+                show_db_error(e)
+            finally:
+                # decrement last, so follow-up work keeps the indicator on
+                self._pending -= 1
+                if not quiet:
+                    self._shown -= 1
+                    if self._shown == 0 and self.on_busy:
+                        self.on_busy(False)
+                if action:
+                    action.done()
+
+        if self._pending:
+            self.root.after(POLL_MS, self._poll)
+        else:
+            self._polling = False
+
+
+def show_db_error(error):
+    messagebox.showerror("Database Error", str(error))